@@ -25,28 +25,39 @@ const PROJECT_ROOT = resolve(__dirname, '../../../..')
 const DEFAULT_PHASE0_PATH = join(PROJECT_ROOT, 'artifacts/phase-0')
 const DEFAULT_OUTPUT_PATH = join(PROJECT_ROOT, 'artifacts/phase-1/clustering')
 
+/**
+ * Whether a Phase 0 cluster artifact exists, falling back to the old v1
+ * layout like the production clusterer does
+ */
+function clusterArtifactExists(phase0Path: string, file: string): boolean {
+  return (
+    existsSync(join(phase0Path, 'clusters/latest', file)) ||
+    existsSync(join(phase0Path, 'clusters/v1', file))
+  )
+}
+
 /**
  * Validate paths exist
  */
 function validatePaths(phase0Path: string): void {
-  const assignmentsPath = join(phase0Path, 'clusters/v1/assignments.json')
-  const labelsPath = join(phase0Path, 'clusters/v1/labels.json')
-  const metricsPath = join(phase0Path, 'clusters/v1/metrics.json')
+  const assignmentsPath = join(phase0Path, 'clusters/latest/assignments.json')
+  const labelsPath = join(phase0Path, 'clusters/latest/labels.json')
+  const metricsPath = join(phase0Path, 'clusters/latest/metrics.json')
 
-  if (!existsSync(assignmentsPath)) {
+  if (!clusterArtifactExists(phase0Path, 'assignments.json')) {
     throw new CLIError({
       userMessage: `Phase 0 assignments not found at ${assignmentsPath}.`,
       suggestion:
         'Run Phase 0 clustering first or specify the correct --phase0-path.',
     })
   }
-  if (!existsSync(labelsPath)) {
+  if (!clusterArtifactExists(phase0Path, 'labels.json')) {
     throw new CLIError({
       userMessage: `Phase 0 labels not found at ${labelsPath}.`,
       suggestion: 'Verify the --phase0-path points to valid artifacts.',
     })
   }
-  if (!existsSync(metricsPath)) {
+  if (!clusterArtifactExists(phase0Path, 'metrics.json')) {
     throw new CLIError({
       userMessage: `Phase 0 metrics not found at ${metricsPath}.`,
       suggestion: 'Verify the --phase0-path points to valid artifacts.',
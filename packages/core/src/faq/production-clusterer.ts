@@ -48,14 +48,14 @@ interface Phase0Metrics {
 function readPhase0Assignments(
   phase0Path: string
 ): Record<string, Phase0Assignment> {
-  const assignmentsPath = join(phase0Path, 'clusters/v1/assignments.json')
+  // latest points at the current content-addressed run; v1 is the old fixed layout
+  const assignmentsPath = join(phase0Path, 'clusters/latest/assignments.json')
   if (!existsSync(assignmentsPath)) {
-    // Try latest symlink
-    const latestPath = join(phase0Path, 'clusters/latest/assignments.json')
-    if (!existsSync(latestPath)) {
+    const legacyPath = join(phase0Path, 'clusters/v1/assignments.json')
+    if (!existsSync(legacyPath)) {
       throw new Error(`Phase 0 assignments not found at ${assignmentsPath}`)
     }
-    const content = readFileSync(latestPath, 'utf-8')
+    const content = readFileSync(legacyPath, 'utf-8')
     return JSON.parse(content)
   }
   const content = readFileSync(assignmentsPath, 'utf-8')
@@ -66,13 +66,13 @@ function readPhase0Assignments(
  * Read and parse Phase 0 labels
  */
 function readPhase0Labels(phase0Path: string): Phase0ClusterLabel[] {
-  const labelsPath = join(phase0Path, 'clusters/v1/labels.json')
+  const labelsPath = join(phase0Path, 'clusters/latest/labels.json')
   if (!existsSync(labelsPath)) {
-    const latestPath = join(phase0Path, 'clusters/latest/labels.json')
-    if (!existsSync(latestPath)) {
+    const legacyPath = join(phase0Path, 'clusters/v1/labels.json')
+    if (!existsSync(legacyPath)) {
       throw new Error(`Phase 0 labels not found at ${labelsPath}`)
     }
-    const content = readFileSync(latestPath, 'utf-8')
+    const content = readFileSync(legacyPath, 'utf-8')
     const parsed = JSON.parse(content)
     return parsed.clusters || []
   }
@@ -85,13 +85,13 @@ function readPhase0Labels(phase0Path: string): Phase0ClusterLabel[] {
  * Read Phase 0 metrics
  */
 function readPhase0Metrics(phase0Path: string): Phase0Metrics {
-  const metricsPath = join(phase0Path, 'clusters/v1/metrics.json')
+  const metricsPath = join(phase0Path, 'clusters/latest/metrics.json')
   if (!existsSync(metricsPath)) {
-    const latestPath = join(phase0Path, 'clusters/latest/metrics.json')
-    if (!existsSync(latestPath)) {
+    const legacyPath = join(phase0Path, 'clusters/v1/metrics.json')
+    if (!existsSync(legacyPath)) {
       throw new Error(`Phase 0 metrics not found at ${metricsPath}`)
     }
-    return JSON.parse(readFileSync(latestPath, 'utf-8'))
+    return JSON.parse(readFileSync(legacyPath, 'utf-8'))
   }
   return JSON.parse(readFileSync(metricsPath, 'utf-8'))
 }
@@ -51,3 +51,43 @@ CREATE TABLE IF NOT EXISTS templates (
   confidence DOUBLE NOT NULL,
   FOREIGN KEY (conversation_id) REFERENCES conversations(id)
 );
+
+-- Summary aggregates read by generate-gold-summary.py. Maintained by
+-- scripts/gold_aggregates.py refresh, which applies only the difference for
+-- conversations and classifications that changed since the last refresh.
+-- The report only trusts them while summary_source_fingerprint still
+-- matches the source tables.
+
+CREATE TABLE IF NOT EXISTS summary_product_tiers (
+  product VARCHAR NOT NULL,
+  tier VARCHAR NOT NULL,
+  count BIGINT NOT NULL,
+  PRIMARY KEY (product, tier)
+);
+
+CREATE TABLE IF NOT EXISTS summary_request_types (
+  product VARCHAR NOT NULL,
+  request_type VARCHAR NOT NULL,
+  count BIGINT NOT NULL,
+  PRIMARY KEY (product, request_type)
+);
+
+-- What each conversation contributed at the last refresh
+CREATE TABLE IF NOT EXISTS summary_conversation_state (
+  conversation_id VARCHAR PRIMARY KEY,
+  product VARCHAR NOT NULL,
+  tier VARCHAR NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS summary_classification_state (
+  conversation_id VARCHAR NOT NULL,
+  request_type VARCHAR NOT NULL,
+  product VARCHAR NOT NULL,
+  count BIGINT NOT NULL,
+  PRIMARY KEY (conversation_id, request_type)
+);
+
+-- Fingerprint of conversations and classifications as of the last refresh
+CREATE TABLE IF NOT EXISTS summary_source_fingerprint (
+  fingerprint VARCHAR NOT NULL
+);
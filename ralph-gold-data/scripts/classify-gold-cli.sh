@@ -65,6 +65,9 @@ Reply with ONLY the category name, nothing else."
   sleep 0.3
 done
 
+# Keep the summary aggregates in step with the reclassifications
+python3 scripts/gold_aggregates.py refresh
+
 echo ""
 echo "=== Final Distribution ==="
 duckdb gold.duckdb -c "SELECT request_type, COUNT(*) as count FROM conversations WHERE is_gold = true GROUP BY request_type ORDER BY count DESC"
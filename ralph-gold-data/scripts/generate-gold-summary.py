@@ -1,65 +1,270 @@
 #!/usr/bin/env python3
+import argparse
 import json
-import subprocess
+import os
+import sys
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import Optional
+
+import duckdb
 
 ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = ROOT / "gold.duckdb"
 REPORTS_DIR = ROOT / "reports"
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+TREND_CACHE_DIR = REPORTS_DIR / ".trend-cache"
 
+# Shared stage timing helper from the FAQ mining scripts
+sys.path.insert(0, str(ROOT.parent / "scripts"))
+from stage_metrics import StageRecorder  # noqa: E402
+from gold_aggregates import FINGERPRINT_COLUMNS, TIER_SQL, is_built, is_current  # noqa: E402
 
-def export_query(query: str, out_path: Path) -> list[dict]:
-    if out_path.exists():
-        out_path.unlink()
-    sql = f"COPY ({query}) TO '{out_path}' (FORMAT JSON);"
-    subprocess.run(["duckdb", str(DB_PATH), "-c", sql], check=True, cwd=ROOT)
-    rows: list[dict] = []
-    if out_path.exists():
-        with out_path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                rows.append(json.loads(line))
-    return rows
 
+# Per-(product, tier) counts plus per-product totals and gold ratio, told
+# apart by GROUPING(tier). {source} is either the summary_product_tiers
+# aggregate (a few hundred rows) or a full scan of conversations.
+CONVERSATION_AGGREGATES_SQL = """
+SELECT
+  product,
+  tier,
+  GROUPING(tier) = 1 AS is_product_total,
+  SUM(count)::BIGINT AS count,
+  COALESCE(SUM(count) FILTER (WHERE tier = 'gold'), 0)::BIGINT AS gold,
+  ROUND(COALESCE(SUM(count) FILTER (WHERE tier = 'gold'), 0)::DOUBLE / SUM(count), 4) AS gold_ratio
+FROM {source}
+GROUP BY GROUPING SETS ((product, tier), (product))
+"""
 
-def main() -> None:
-    tmp_dir = Path("/tmp")
-    totals_rows = export_query(
-        "SELECT product, COUNT(*) AS total FROM conversations GROUP BY product ORDER BY total DESC, product",
-        tmp_dir / "gold_totals.json",
+# Per-(product, request_type) counts for the matrix plus per-request_type
+# totals, told apart by GROUPING(product)
+CLASSIFICATION_AGGREGATES_SQL = """
+SELECT
+  product,
+  request_type,
+  GROUPING(product) = 1 AS is_type_total,
+  SUM(count)::BIGINT AS count
+FROM {source}
+GROUP BY GROUPING SETS ((product, request_type), (request_type))
+"""
+
+CONVERSATION_SCAN_SQL = f"""(
+  SELECT product, {TIER_SQL} AS tier, 1 AS count
+  FROM conversations
+)"""
+
+# The LEFT JOIN keeps classifications without a conversation in the totals only
+CLASSIFICATION_SCAN_SQL = """(
+  SELECT c.product, cl.request_type, 1 AS count
+  FROM classifications cl
+  LEFT JOIN conversations c ON c.id = cl.conversation_id
+)"""
+
+
+# Conversations fall into the week/month of their first message. One pass
+# over the windowed conversations gives per-(window, product) totals and gold
+# counts plus per-(window, product, request_type) classification counts;
+# $since skips conversations that started in already cached windows.
+TREND_SQL = f"""
+WITH started AS (
+  -- A conversation that started since the cached windows has all of its
+  -- messages since then, so only those messages are grouped; conversations
+  -- with an earlier message are dropped below
+  SELECT conversation_id, MIN(timestamp) AS first_at
+  FROM messages
+  WHERE timestamp >= $since::TIMESTAMP OR ($since IS NULL AND timestamp IS NOT NULL)
+  GROUP BY conversation_id
+),
+first_message AS (
+  SELECT *
+  FROM started
+  ANTI JOIN (SELECT conversation_id FROM messages WHERE timestamp < $since::TIMESTAMP) USING (conversation_id)
+),
+windowed AS (
+  SELECT
+    c.id,
+    c.product,
+    strftime(date_trunc($window, f.first_at), '%Y-%m-%d') AS window_start,
+    {TIER_SQL} AS tier
+  FROM conversations c
+  JOIN first_message f ON f.conversation_id = c.id
+)
+SELECT
+  w.window_start,
+  w.product,
+  cl.request_type,
+  GROUPING(cl.request_type) = 1 AS is_window_total,
+  COUNT(DISTINCT w.id) AS total,
+  COUNT(DISTINCT w.id) FILTER (WHERE w.tier = 'gold') AS gold,
+  COUNT(cl.conversation_id) AS count
+FROM windowed w
+LEFT JOIN classifications cl ON cl.conversation_id = w.id
+GROUP BY GROUPING SETS ((w.window_start, w.product), (w.window_start, w.product, cl.request_type))
+"""
+
+
+# Closed windows only hold conversations with a message before $closed_before.
+# Back-filling, rescoring or reclassifying any of them moves this fingerprint;
+# conversations started since then, and later messages, don't.
+TREND_FINGERPRINT_SQL = f"""
+WITH closed AS (
+  SELECT DISTINCT conversation_id AS id FROM messages WHERE timestamp < $closed_before::TIMESTAMP
+)
+SELECT 'messages', COUNT(*), COALESCE(SUM(hash({FINGERPRINT_COLUMNS["messages"]})::HUGEINT), 0)
+FROM messages WHERE timestamp < $closed_before::TIMESTAMP
+UNION ALL
+SELECT 'conversations', COUNT(*), COALESCE(SUM(hash({FINGERPRINT_COLUMNS["conversations"]})::HUGEINT), 0)
+FROM conversations WHERE id IN (SELECT id FROM closed)
+UNION ALL
+SELECT 'classifications', COUNT(*), COALESCE(SUM(hash({FINGERPRINT_COLUMNS["classifications"]})::HUGEINT), 0)
+FROM classifications WHERE conversation_id IN (SELECT id FROM closed)
+"""
+
+
+def fetch_rows(conn: duckdb.DuckDBPyConnection, sql: str, params: Optional[dict] = None) -> list[dict]:
+    result = conn.execute(sql, params)
+    # to_arrow_table() replaced fetch_arrow_table() in newer duckdb releases
+    table = result.to_arrow_table() if hasattr(result, "to_arrow_table") else result.fetch_arrow_table()
+    return table.to_pylist()
+
+
+def trend_windows(rows: list[dict]) -> list[dict]:
+    """Nest TREND_SQL rows into one entry per window, products sorted by name."""
+    windows: dict[str, dict[str, dict]] = {}
+    for row in rows:
+        products = windows.setdefault(row["window_start"], {})
+        entry = products.setdefault(row["product"], {"product": row["product"], "request_types": {}})
+        if row["is_window_total"]:
+            total, gold = int(row["total"]), int(row["gold"])
+            entry.update(total=total, gold=gold, gold_ratio=round(gold / total, 4))
+        elif row["request_type"] is not None:
+            entry["request_types"][row["request_type"]] = int(row["count"])
+    return [
+        {"window_start": start, "products": [products[product] for product in sorted(products)]}
+        for start, products in sorted(windows.items())
+    ]
+
+
+def trend_fingerprint(conn: duckdb.DuckDBPyConnection, closed_before: str) -> str:
+    rows = conn.execute(TREND_FINGERPRINT_SQL, {"closed_before": closed_before}).fetchall()
+    return ";".join(f"{table}:{count}:{total}" for table, count, total in sorted(rows))
+
+
+def compute_trends(conn: duckdb.DuckDBPyConnection, window: str, use_cache: bool) -> tuple[list[dict], int]:
+    """All windows, reusing cached closed windows; returns (windows, recomputed window count).
+
+    A window is closed once the current week/month has moved past it, so
+    only conversations that started after the cached ones are aggregated.
+    The cache is dropped when the conversations in its windows changed since
+    it was written (see TREND_FINGERPRINT_SQL).
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+    open_start, = conn.execute(
+        "SELECT strftime(date_trunc($window, $now::TIMESTAMP), '%Y-%m-%d')", {"window": window, "now": now}
+    ).fetchone()
+
+    cache_path = TREND_CACHE_DIR / f"{window}.json"
+    cached: list[dict] = []
+    since = None
+    cache = None
+    if use_cache and cache_path.exists():
+        try:
+            cache = json.loads(cache_path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            pass  # left behind by an interrupted run before writes went through a temp file
+    if cache is not None:
+        if cache["closed_before"] <= open_start and cache.get("fingerprint") == trend_fingerprint(
+            conn, cache["closed_before"]
+        ):
+            cached, since = cache["windows"], cache["closed_before"]
+
+    fresh = trend_windows(fetch_rows(conn, TREND_SQL, {"window": window, "since": since}))
+    windows = cached + fresh
+
+    if since != open_start:
+        TREND_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        closed = [entry for entry in windows if entry["window_start"] < open_start]
+        fingerprint = trend_fingerprint(conn, open_start)
+        # Concurrent runs share the cache, so readers only ever see a complete file
+        tmp = cache_path.with_suffix(f".tmp-{os.getpid()}")
+        tmp.write_text(
+            json.dumps({"closed_before": open_start, "fingerprint": fingerprint, "windows": closed},
+                       indent=2, sort_keys=True) + "\n",
+            encoding="utf-8",
+        )
+        os.replace(tmp, cache_path)
+    return windows, len(fresh)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Write reports/gold-summary.json and gold-summary.md from gold.duckdb.")
+    parser.add_argument(
+        "--recompute",
+        action="store_true",
+        help="Scan conversations and classifications instead of reading the summary aggregates",
     )
-    request_rows = export_query(
-        (
-            "SELECT c.product, cl.request_type, COUNT(*) AS count "
-            "FROM classifications cl "
-            "JOIN conversations c ON c.id = cl.conversation_id "
-            "GROUP BY c.product, cl.request_type "
-            "ORDER BY c.product, count DESC"
-        ),
-        tmp_dir / "gold_request_matrix.json",
+    parser.add_argument(
+        "--window",
+        choices=["week", "month"],
+        help="Add weekly or monthly trends of request types and gold ratio per product",
     )
-    tier_rows = export_query(
-        "SELECT product, CASE WHEN quality_score >= 5 THEN 'gold' WHEN quality_score >= 3 THEN 'silver' ELSE 'noise' END AS tier, COUNT(*) AS count FROM conversations GROUP BY product, tier ORDER BY product, tier",
-        tmp_dir / "gold_tiers.json",
+    parser.add_argument(
+        "--refresh-trend-cache",
+        action="store_true",
+        help="Recompute closed trend windows too (changes to their conversations are detected without it)",
     )
-    top_types_rows = export_query(
-        (
-            "SELECT cl.request_type, COUNT(*) AS count "
-            "FROM classifications cl "
-            "GROUP BY cl.request_type "
-            "ORDER BY count DESC, cl.request_type "
-            "LIMIT 10"
-        ),
-        tmp_dir / "gold_top_types.json",
+    parser.add_argument("--trace", type=Path, help="Append per-stage timing and memory records to this JSONL file and print a stage table")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    recorder = StageRecorder("generate-gold-summary", trace_path=args.trace)
+    stage = recorder.stage
+
+    conn = duckdb.connect(str(DB_PATH), read_only=True)
+    if not args.recompute and is_current(conn):
+        conversation_source, classification_source = "summary_product_tiers", "summary_request_types"
+    else:
+        if not args.recompute and is_built(conn):
+            print("Summary aggregates are behind conversations or classifications; scanning them "
+                  "(run scripts/gold_aggregates.py refresh)")
+        elif not args.recompute:
+            print("Summary aggregates not built; scanning conversations (run scripts/gold_aggregates.py rebuild)")
+        conversation_source, classification_source = CONVERSATION_SCAN_SQL, CLASSIFICATION_SCAN_SQL
+
+    with stage("conversation_aggregates") as record:
+        conversation_rows = fetch_rows(conn, CONVERSATION_AGGREGATES_SQL.format(source=conversation_source))
+        record["rows"] = len(conversation_rows)
+    with stage("classification_aggregates") as record:
+        classification_rows = fetch_rows(conn, CLASSIFICATION_AGGREGATES_SQL.format(source=classification_source))
+        record["rows"] = len(classification_rows)
+    if args.window:
+        with stage(f"{args.window}_trends") as record:
+            trends, recomputed = compute_trends(conn, args.window, use_cache=not args.refresh_trend_cache)
+            record["rows"] = recomputed
+        print(f"Trends: {len(trends)} {args.window}s, {recomputed} recomputed, the rest from {TREND_CACHE_DIR}")
+    conn.close()
+
+    # Split the grouping sets back into the per-report row lists
+    product_rows = [row for row in conversation_rows if row["is_product_total"]]
+    totals_rows = sorted(
+        ({"product": row["product"], "total": row["count"]} for row in product_rows),
+        key=lambda row: (-row["total"], row["product"]),
     )
-    gold_ratio_rows = export_query(
-        "SELECT product, SUM(CASE WHEN quality_score >= 5 THEN 1 ELSE 0 END) AS gold, COUNT(*) AS total, ROUND(SUM(CASE WHEN quality_score >= 5 THEN 1 ELSE 0 END)::DOUBLE / COUNT(*), 4) AS gold_ratio FROM conversations GROUP BY product ORDER BY gold_ratio DESC, total DESC, product",
-        tmp_dir / "gold_ratio.json",
+    tier_rows = [row for row in conversation_rows if not row["is_product_total"]]
+    gold_ratio_rows = sorted(
+        ({"product": row["product"], "gold": row["gold"], "total": row["count"], "gold_ratio": row["gold_ratio"]}
+         for row in product_rows),
+        key=lambda row: (-row["gold_ratio"], -row["total"], row["product"]),
     )
+    request_rows = [
+        row for row in classification_rows if not row["is_type_total"] and row["product"] is not None
+    ]
+    top_types_rows = sorted(
+        (row for row in classification_rows if row["is_type_total"]),
+        key=lambda row: (-row["count"], row["request_type"]),
+    )[:10]
 
     totals_by_product = [
         {"product": row["product"], "total": int(row["total"])} for row in totals_rows
@@ -139,6 +344,8 @@ def main() -> None:
         "top_request_types": top_request_types,
         "gold_ratio_by_product": gold_ratio_by_product,
     }
+    if args.window:
+        summary["trends"] = {"window": args.window, "windows": trends}
 
     json_path = REPORTS_DIR / "gold-summary.json"
     with json_path.open("w", encoding="utf-8") as f:
@@ -195,10 +402,27 @@ def main() -> None:
         )
     md_lines.append("")
 
+    if args.window:
+        md_lines.append(f"## {args.window.capitalize()}ly Trends")
+        md_lines.append(f"| {args.window.capitalize()} of | Product | Conversations | Gold | Gold ratio | Top request types |")
+        md_lines.append("| --- | --- | --- | --- | --- | --- |")
+        for entry in trends:
+            for row in entry["products"]:
+                ratio_pct = f"{row['gold_ratio'] * 100:.1f}%"
+                top_types = sorted(row["request_types"].items(), key=lambda item: (-item[1], item[0]))[:3]
+                top = ", ".join(f"{request_type} ({count})" for request_type, count in top_types)
+                md_lines.append(
+                    f"| {entry['window_start']} | {row['product']} | {row['total']} | {row['gold']} | {ratio_pct} | {top} |"
+                )
+        md_lines.append("")
+
     md_path = REPORTS_DIR / "gold-summary.md"
     with md_path.open("w", encoding="utf-8") as f:
         f.write("\n".join(md_lines))
 
+    if args.trace:
+        recorder.print_summary()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""Maintain the summary aggregate tables in gold.duckdb.
+
+summary_product_tiers and summary_request_types hold the counts behind
+gold-summary.json, so the report reads a few hundred rows instead of scanning
+conversations and classifications. DuckDB has no triggers, so writers run a
+refresh after loading, scoring or reclassifying:
+
+    python3 scripts/gold_aggregates.py refresh   # apply changes since the last refresh
+    python3 scripts/gold_aggregates.py rebuild   # recompute from scratch
+    python3 scripts/gold_aggregates.py verify    # compare against a full recompute
+
+Each refresh compares what every conversation contributes now with what it
+contributed last time (the summary_*_state tables) and applies only the
+difference. Python ingest paths that know which conversations they touched
+pass them to refresh() so it only looks at those.
+
+Most writers (SQL files, shell and TS scripts) never run a refresh, so each
+refresh also stores a fingerprint of the source tables: row counts and an
+order-independent sum of row hashes over the columns the aggregates read.
+is_current() recomputes it in one scan without joins or grouping, and the
+report falls back to scanning the source tables when it has moved.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Iterable, Optional
+
+import duckdb
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_PATH = ROOT / "gold.duckdb"
+SCHEMA_PATH = ROOT / "schemas" / "gold.sql"
+
+TIER_SQL = "CASE WHEN quality_score >= 5 THEN 'gold' WHEN quality_score >= 3 THEN 'silver' ELSE 'noise' END"
+
+AGGREGATE_TABLES = ["summary_product_tiers", "summary_request_types"]
+STATE_TABLES = ["summary_conversation_state", "summary_classification_state"]
+FINGERPRINT_TABLE = "summary_source_fingerprint"
+
+# Columns each source table contributes to the aggregates (and, with
+# messages, to the report's trend windows)
+FINGERPRINT_COLUMNS = {
+    "conversations": "id, product, quality_score",
+    "classifications": "conversation_id, request_type",
+    "messages": "conversation_id, timestamp",
+}
+AGGREGATE_SOURCES = ["conversations", "classifications"]
+
+# Full recomputes of both aggregates, used by rebuild and verify
+PRODUCT_TIERS_SQL = f"""
+SELECT product, {TIER_SQL} AS tier, COUNT(*) AS count
+FROM conversations
+GROUP BY ALL
+"""
+
+REQUEST_TYPES_SQL = """
+SELECT c.product, cl.request_type, COUNT(*) AS count
+FROM classifications cl
+JOIN conversations c ON c.id = cl.conversation_id
+GROUP BY ALL
+"""
+
+
+def ensure_schema(conn: duckdb.DuckDBPyConnection) -> None:
+    conn.execute(SCHEMA_PATH.read_text())
+
+
+def source_fingerprint(conn: duckdb.DuckDBPyConnection, tables: Iterable[str] = AGGREGATE_SOURCES) -> str:
+    """Row count and sum of row hashes of each table, over its FINGERPRINT_COLUMNS.
+
+    Any insert, delete or change to those columns moves it, whatever wrote
+    to the table. hash() may change between DuckDB versions, which only
+    makes a stored fingerprint look stale.
+    """
+    parts = []
+    for table in tables:
+        count, total = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(hash({FINGERPRINT_COLUMNS[table]})::HUGEINT), 0) FROM {table}"
+        ).fetchone()
+        parts.append(f"{table}:{count}:{total}")
+    return ";".join(parts)
+
+
+def is_built(conn: duckdb.DuckDBPyConnection) -> bool:
+    """True once the aggregates exist and have been through a refresh or rebuild."""
+    existing = {row[0] for row in conn.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+    if not set(AGGREGATE_TABLES + STATE_TABLES + [FINGERPRINT_TABLE]) <= existing:
+        return False
+    built, = conn.execute(f"SELECT EXISTS (SELECT 1 FROM {FINGERPRINT_TABLE})").fetchone()
+    return built
+
+
+def is_current(conn: duckdb.DuckDBPyConnection) -> bool:
+    """True when the aggregates are built and the source tables haven't changed since the last refresh."""
+    if not is_built(conn):
+        return False
+    stored, = conn.execute(f"SELECT fingerprint FROM {FINGERPRINT_TABLE}").fetchone()
+    return stored == source_fingerprint(conn)
+
+
+def _apply_deltas(conn: duckdb.DuckDBPyConnection, table: str, keys: str, deltas_sql: str) -> int:
+    """Add signed count deltas into an aggregate table and drop keys that reach zero."""
+    conn.execute(f"""
+    CREATE OR REPLACE TEMP TABLE _deltas AS
+    SELECT {keys}, SUM(delta) AS delta
+    FROM ({deltas_sql})
+    GROUP BY ALL
+    HAVING SUM(delta) <> 0
+    """)
+    conn.execute(f"""
+    INSERT INTO {table} SELECT {keys}, delta FROM _deltas
+    ON CONFLICT DO UPDATE SET count = count + excluded.count
+    """)
+    conn.execute(f"DELETE FROM {table} WHERE count = 0")
+    changed, = conn.execute("SELECT COUNT(*) FROM _deltas").fetchone()
+    return changed
+
+
+def refresh(conn: duckdb.DuckDBPyConnection, conversation_ids: Optional[Iterable[str]] = None) -> dict:
+    """Bring the aggregates up to date with conversations and classifications.
+
+    With conversation_ids, only those conversations are compared (an ingest
+    path that knows what it wrote); otherwise every conversation is. Either
+    way the source fingerprint is stored afterwards, so a scoped refresh
+    must cover everything written since the previous one.
+    Returns how many conversation and classification keys changed.
+    """
+    ensure_schema(conn)
+    conn.execute("BEGIN TRANSACTION")
+    if conversation_ids is not None:
+        conn.execute("CREATE OR REPLACE TEMP TABLE _scope (id VARCHAR)")
+        conn.executemany("INSERT INTO _scope VALUES (?)", [(i,) for i in set(conversation_ids)])
+        scope = "WHERE {column} IN (SELECT id FROM _scope)"
+    else:
+        scope = ""
+
+    # Conversations whose (product, tier) changed, appeared or disappeared
+    conn.execute(f"""
+    CREATE OR REPLACE TEMP TABLE _conv_now AS
+    SELECT id AS conversation_id, product, {TIER_SQL} AS tier
+    FROM conversations {scope.format(column="id")}
+    """)
+    conn.execute(f"""
+    CREATE OR REPLACE TEMP TABLE _conv_changed AS
+    SELECT COALESCE(n.conversation_id, o.conversation_id) AS conversation_id
+    FROM _conv_now n
+    FULL JOIN (SELECT * FROM summary_conversation_state {scope.format(column="conversation_id")}) o
+      ON o.conversation_id = n.conversation_id
+    WHERE n.product IS DISTINCT FROM o.product OR n.tier IS DISTINCT FROM o.tier
+    """)
+    conversations_changed = _apply_deltas(conn, "summary_product_tiers", "product, tier", """
+    SELECT product, tier, 1 AS delta FROM _conv_now WHERE conversation_id IN (SELECT conversation_id FROM _conv_changed)
+    UNION ALL
+    SELECT product, tier, -1 FROM summary_conversation_state WHERE conversation_id IN (SELECT conversation_id FROM _conv_changed)
+    """)
+    conn.execute("DELETE FROM summary_conversation_state WHERE conversation_id IN (SELECT conversation_id FROM _conv_changed)")
+    conn.execute("""
+    INSERT INTO summary_conversation_state
+    SELECT * FROM _conv_now WHERE conversation_id IN (SELECT conversation_id FROM _conv_changed)
+    """)
+
+    # (conversation, request_type) pairs whose count or product changed
+    conn.execute(f"""
+    CREATE OR REPLACE TEMP TABLE _cls_now AS
+    SELECT cl.conversation_id, cl.request_type, c.product, COUNT(*) AS count
+    FROM classifications cl
+    JOIN conversations c ON c.id = cl.conversation_id
+    {scope.format(column="cl.conversation_id")}
+    GROUP BY ALL
+    """)
+    conn.execute(f"""
+    CREATE OR REPLACE TEMP TABLE _cls_changed AS
+    SELECT
+      COALESCE(n.conversation_id, o.conversation_id) AS conversation_id,
+      COALESCE(n.request_type, o.request_type) AS request_type
+    FROM _cls_now n
+    FULL JOIN (SELECT * FROM summary_classification_state {scope.format(column="conversation_id")}) o
+      ON o.conversation_id = n.conversation_id AND o.request_type = n.request_type
+    WHERE n.product IS DISTINCT FROM o.product OR n.count IS DISTINCT FROM o.count
+    """)
+    classifications_changed = _apply_deltas(conn, "summary_request_types", "product, request_type", """
+    SELECT product, request_type, count AS delta FROM _cls_now SEMI JOIN _cls_changed USING (conversation_id, request_type)
+    UNION ALL
+    SELECT product, request_type, -count FROM summary_classification_state SEMI JOIN _cls_changed USING (conversation_id, request_type)
+    """)
+    conn.execute("""
+    DELETE FROM summary_classification_state s
+    WHERE EXISTS (SELECT 1 FROM _cls_changed c WHERE c.conversation_id = s.conversation_id AND c.request_type = s.request_type)
+    """)
+    conn.execute("""
+    INSERT INTO summary_classification_state
+    SELECT conversation_id, request_type, product, count FROM _cls_now SEMI JOIN _cls_changed USING (conversation_id, request_type)
+    """)
+    conn.execute(f"DELETE FROM {FINGERPRINT_TABLE}")
+    conn.execute(f"INSERT INTO {FINGERPRINT_TABLE} VALUES (?)", [source_fingerprint(conn)])
+    conn.execute("COMMIT")
+
+    touched_conversations, = conn.execute("SELECT COUNT(*) FROM _conv_changed").fetchone()
+    touched_classifications, = conn.execute("SELECT COUNT(*) FROM _cls_changed").fetchone()
+    return {
+        "conversations_changed": touched_conversations,
+        "classification_keys_changed": touched_classifications,
+        "tier_counts_updated": conversations_changed,
+        "request_type_counts_updated": classifications_changed,
+    }
+
+
+def rebuild(conn: duckdb.DuckDBPyConnection) -> dict:
+    """Clear the aggregates and their state, then refresh everything."""
+    ensure_schema(conn)
+    for table in AGGREGATE_TABLES + STATE_TABLES + [FINGERPRINT_TABLE]:
+        conn.execute(f"DELETE FROM {table}")
+    return refresh(conn)
+
+
+def verify(conn: duckdb.DuckDBPyConnection) -> list[str]:
+    """Differences between the stored aggregates and a full recompute (empty when in sync)."""
+    problems = []
+    for table, keys, recompute_sql in [
+        ("summary_product_tiers", "product, tier", PRODUCT_TIERS_SQL),
+        ("summary_request_types", "product, request_type", REQUEST_TYPES_SQL),
+    ]:
+        rows = conn.execute(f"""
+        SELECT {keys}, s.count AS stored, r.count AS recomputed
+        FROM {table} s
+        FULL JOIN ({recompute_sql}) r USING ({keys})
+        WHERE s.count IS DISTINCT FROM r.count
+        ORDER BY ALL
+        """).fetchall()
+        for *key, stored, recomputed in rows:
+            problems.append(f"{table} {tuple(key)}: stored {stored}, recomputed {recomputed}")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["refresh", "rebuild", "verify"])
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Path to gold.duckdb")
+    args = parser.parse_args()
+
+    conn = duckdb.connect(str(args.db), read_only=args.command == "verify")
+    if args.command == "verify":
+        try:
+            problems = verify(conn)
+        except duckdb.CatalogException:
+            print("Summary aggregates don't exist yet; run rebuild")
+            return 1
+        for problem in problems[:50]:
+            print(problem)
+        if problems:
+            print(f"{len(problems)} aggregate rows differ from a full recompute; run rebuild")
+            return 1
+        print("Aggregates match a full recompute")
+        return 0
+
+    counts = rebuild(conn) if args.command == "rebuild" else refresh(conn)
+    print(f"{counts['conversations_changed']} conversations and {counts['classification_keys_changed']} "
+          f"classification keys changed; updated {counts['tier_counts_updated']} tier and "
+          f"{counts['request_type_counts_updated']} request type counts")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Bulk-load JSONL/JSON/Parquet files into gold.duckdb.
+
+Input is streamed through Arrow in batches and each batch is written in a
+single transaction:
+
+    python3 scripts/gold_loader.py conversations ../packages/cli/data/merged-conversations.json
+    python3 scripts/gold_loader.py classifications classifications.jsonl
+    python3 scripts/gold_loader.py templates templates.parquet
+
+conversations takes records in the merged-conversations shape (id, source,
+subject, customerEmail, tags, triggerMessage, conversationHistory, and
+optionally conversationId). Like ingest-conversations.sql, only the
+record with the smallest id per conversationId in a file is loaded (a
+record without one stands for itself). Each conversation is upserted by id
+and its conversationHistory is split into messages rows, replacing any
+messages loaded for it before. Re-loading a conversation refreshes its
+content but keeps its product, score and classification: the scoring and
+classification scripts own those columns, and DuckDB can't update a
+foreign key column that other tables reference.
+
+classifications and templates take records with the table's own columns.
+Classifications replace earlier ones for the same conversation and
+classifier_version; templates are upserted by id.
+
+When the summary aggregates are current, they are refreshed once per file
+for the conversations its batches touched (see gold_aggregates.py);
+otherwise one full refresh runs after the last file.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Iterator, Optional
+
+import duckdb
+import pyarrow as pa
+
+from gold_aggregates import DB_PATH, ensure_schema, is_current, refresh
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Shared stage timing helper from the FAQ mining scripts
+sys.path.insert(0, str(ROOT.parent / "scripts"))
+from stage_metrics import StageRecorder  # noqa: E402
+
+BATCH_SIZE = 20_000
+
+# conversations column -> input field, for the optional fields. JSON columns
+# are stored with to_json() like ingest-conversations.sql does.
+CONVERSATION_FIELDS = {
+    "subject": "subject",
+    "customer_email": "customerEmail",
+    "tags": "tags",
+    "trigger_message": "triggerMessage",
+    "conversation_history": "conversationHistory",
+}
+JSON_COLUMNS = {"tags", "trigger_message", "conversation_history"}
+# The parts of a conversationHistory entry that become a messages row
+HISTORY_ENTRY_TYPE = '[{"direction": "VARCHAR", "body": "VARCHAR", "timestamp": "DOUBLE"}]'
+
+TABLE_COLUMNS = {
+    "classifications": ["conversation_id", "request_type", "confidence", "classifier_version"],
+    "templates": ["id", "conversation_id", "pattern", "template", "variables", "category", "confidence"],
+}
+
+
+def _reader_sql(path: Path) -> str:
+    return "read_parquet(?)" if path.suffix == ".parquet" else "read_json(?, maximum_object_size = 1073741824)"
+
+
+def read_batches(path: Path, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Stream a JSONL/JSON/Parquet file as Arrow record batches."""
+    source = duckdb.connect()
+    try:
+        result = source.execute(f"SELECT * FROM {_reader_sql(path)}", [str(path)])
+        # to_arrow_reader() replaced fetch_record_batch() in newer duckdb releases
+        if hasattr(result, "to_arrow_reader"):
+            yield from result.to_arrow_reader(batch_size)
+        else:
+            yield from result.fetch_record_batch(batch_size)
+    finally:
+        source.close()
+
+
+def kept_conversation_ids(path: Path) -> Optional[pa.Table]:
+    """Ids of the records to load from a conversations file, or None to load them all.
+
+    Several records may share a conversationId; the one with the smallest
+    id is kept, as in ingest-conversations.sql. Decided over the whole file
+    so the result doesn't depend on the batch size.
+    """
+    source = duckdb.connect()
+    try:
+        columns = {row[0] for row in source.execute(f"DESCRIBE SELECT * FROM {_reader_sql(path)}", [str(path)]).fetchall()}
+        if "conversationId" not in columns:
+            return None
+        result = source.execute(f"""
+        SELECT min("id") AS id FROM {_reader_sql(path)}
+        GROUP BY COALESCE("conversationId", "id")
+        """, [str(path)])
+        return result.to_arrow_table() if hasattr(result, "to_arrow_table") else result.fetch_arrow_table()
+    finally:
+        source.close()
+
+
+def _json_expr(field: str, arrow_type: pa.DataType) -> str:
+    # Strings are taken to hold JSON already; anything nested is serialized
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return f'json("{field}")'
+    return f'to_json("{field}")'
+
+
+def _conversation_select(schema: pa.Schema) -> str:
+    missing = {"id", "source"} - set(schema.names)
+    if missing:
+        raise ValueError(f"Conversation records need {sorted(missing)}")
+    columns = ['"id" AS id', '"source" AS product']
+    for column, field in CONVERSATION_FIELDS.items():
+        if field not in schema.names:
+            expr = "NULL"
+        elif column in JSON_COLUMNS:
+            expr = _json_expr(field, schema.field(field).type)
+        else:
+            expr = f'"{field}"'
+        columns.append(f"{expr} AS {column}")
+    # One record per conversationId (see kept_conversation_ids()); the last
+    # occurrence of an id in the batch wins
+    kept = 'WHERE "id" IN (SELECT id FROM _kept_ids)' if "conversationId" in schema.names else ""
+    return f"""
+    SELECT {", ".join(columns)}
+    FROM _batch
+    {kept}
+    QUALIFY row_number() OVER (PARTITION BY "id" ORDER BY _row DESC) = 1
+    """
+
+
+def load_conversations(conn: duckdb.DuckDBPyConnection, batch: pa.Table) -> list[str]:
+    conn.execute(f"CREATE OR REPLACE TEMP TABLE _incoming AS {_conversation_select(batch.schema)}")
+    conn.execute("""
+    INSERT INTO products (id, name, has_self_serve)
+    SELECT DISTINCT product, product, FALSE
+    FROM _incoming
+    WHERE product NOT IN (SELECT id FROM products)
+      AND id NOT IN (SELECT id FROM conversations)
+    """)
+    # Fields missing from the input leave the stored values alone
+    updates = ",\n      ".join(
+        f"{column} = excluded.{column}" for column, field in CONVERSATION_FIELDS.items() if field in batch.schema.names
+    )
+    conflict = f"DO UPDATE SET\n      {updates}" if updates else "DO NOTHING"
+    conn.execute(f"""
+    INSERT INTO conversations (
+      id, subject, customer_email, product, request_type, quality_score, is_gold,
+      tags, trigger_message, conversation_history, raw_json
+    )
+    SELECT
+      id, subject, customer_email, product, 'unknown', 0.0, FALSE,
+      tags, trigger_message, conversation_history, NULL
+    FROM _incoming
+    ON CONFLICT (id) {conflict}
+    """)
+    if "conversationHistory" not in batch.schema.names:
+        return [row[0] for row in conn.execute("SELECT id FROM _incoming").fetchall()]
+
+    conn.execute("DELETE FROM messages WHERE conversation_id IN (SELECT id FROM _incoming)")
+    # Front timestamps are epoch seconds (UTC)
+    conn.execute(f"""
+    INSERT INTO messages (conversation_id, role, content, timestamp)
+    SELECT
+      id,
+      CASE WHEN direction = 'out' THEN 'support' ELSE 'customer' END,
+      body,
+      make_timestamp((timestamp * 1000000)::BIGINT)
+    FROM (
+      SELECT id, UNNEST(from_json(conversation_history, '{HISTORY_ENTRY_TYPE}'), recursive := true)
+      FROM _incoming
+    )
+    WHERE body IS NOT NULL
+    """)
+    return [row[0] for row in conn.execute("SELECT id FROM _incoming").fetchall()]
+
+
+def _table_select(table: str, schema: pa.Schema) -> str:
+    columns = TABLE_COLUMNS[table]
+    missing = set(columns) - set(schema.names)
+    if missing:
+        raise ValueError(f"{table} records need {sorted(missing)}")
+    exprs = [_json_expr(c, schema.field(c).type) if c == "variables" else f'"{c}"' for c in columns]
+    return f"SELECT {', '.join(exprs)} FROM _batch"
+
+
+def load_classifications(conn: duckdb.DuckDBPyConnection, batch: pa.Table) -> list[str]:
+    conn.execute(f"CREATE OR REPLACE TEMP TABLE _incoming AS {_table_select('classifications', batch.schema)}")
+    conn.execute("""
+    DELETE FROM classifications
+    WHERE (conversation_id, classifier_version) IN (SELECT (conversation_id, classifier_version) FROM _incoming)
+    """)
+    conn.execute("INSERT INTO classifications SELECT * FROM _incoming")
+    return [row[0] for row in conn.execute("SELECT DISTINCT conversation_id FROM _incoming").fetchall()]
+
+
+def load_templates(conn: duckdb.DuckDBPyConnection, batch: pa.Table) -> list[str]:
+    conn.execute(f"""
+    CREATE OR REPLACE TEMP TABLE _incoming AS
+    SELECT * FROM ({_table_select('templates', batch.schema)})
+    QUALIFY row_number() OVER (PARTITION BY id) = 1
+    """)
+    conn.execute("""
+    INSERT INTO templates SELECT * FROM _incoming
+    ON CONFLICT (id) DO UPDATE SET
+      pattern = excluded.pattern,
+      template = excluded.template,
+      variables = excluded.variables,
+      category = excluded.category,
+      confidence = excluded.confidence
+    """)
+    # Templates don't feed the summary aggregates
+    return []
+
+
+LOADERS = {
+    "conversations": load_conversations,
+    "classifications": load_classifications,
+    "templates": load_templates,
+}
+
+
+def load_file(conn: duckdb.DuckDBPyConnection, table: str, path: Path, batch_size: int,
+              refresh_aggregates: bool) -> int:
+    """Load one file batch by batch; returns the number of input rows.
+
+    With refresh_aggregates, the aggregates are refreshed once at the end
+    for the conversations the file touched, which is only valid when they
+    were current before the load.
+    """
+    kept_ids = kept_conversation_ids(path) if table == "conversations" else None
+    if kept_ids is not None:
+        conn.register("_kept_ids", kept_ids)
+    rows = 0
+    touched: set[str] = set()
+    for record_batch in read_batches(path, batch_size):
+        batch = pa.Table.from_batches([record_batch])
+        batch = batch.append_column("_row", pa.array(range(batch.num_rows), pa.int64()))
+        conn.register("_batch", batch)
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            touched.update(LOADERS[table](conn, batch))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.unregister("_batch")
+        rows += batch.num_rows
+        print(f"  {path.name}: {rows} rows")
+    if kept_ids is not None:
+        conn.unregister("_kept_ids")
+    if refresh_aggregates and touched:
+        refresh(conn, touched)
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("table", choices=list(LOADERS))
+    parser.add_argument("paths", nargs="+", type=Path, help="JSONL, JSON or Parquet files")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Path to gold.duckdb")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per batch and transaction")
+    parser.add_argument("--trace", type=Path, help="Append per-stage timing and memory records to this JSONL file and print a stage table")
+    args = parser.parse_args()
+
+    recorder = StageRecorder("gold_loader", trace_path=args.trace)
+    conn = duckdb.connect(str(args.db))
+    ensure_schema(conn)
+    # Scoped refreshes store the fingerprint of the whole source tables, so
+    # they're only valid on top of current aggregates; otherwise (never
+    # built, or changed by another writer) one full refresh runs at the end
+    aggregates_current = is_current(conn)
+
+    for path in args.paths:
+        with recorder.stage(f"load {path.name}") as record:
+            record["rows"] = load_file(conn, args.table, path, args.batch_size, aggregates_current)
+    if not aggregates_current:
+        with recorder.stage("refresh_aggregates"):
+            refresh(conn)
+    conn.close()
+
+    if args.trace:
+        recorder.print_summary()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -43,9 +43,10 @@ SELECT
   to_json(conversationHistory) AS conversation_history,
   NULL AS raw_json
 FROM (
+  -- One record per conversation, the smallest id; gold_loader.py keeps the same one
   SELECT
     *,
-    row_number() OVER (PARTITION BY conversationId ORDER BY id) AS rn
+    row_number() OVER (PARTITION BY COALESCE(conversationId, id) ORDER BY id) AS rn
   FROM _raw_conversations
 ) deduped
 WHERE rn = 1;
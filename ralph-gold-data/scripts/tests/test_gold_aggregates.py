@@ -0,0 +1,280 @@
+import importlib.util
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+import pytest
+
+import gold_aggregates
+from gold_aggregates import is_current, rebuild, refresh, verify
+
+SUMMARY_PATH = Path(__file__).resolve().parents[1] / "generate-gold-summary.py"
+
+
+@pytest.fixture
+def gold(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "gold.duckdb"))
+    gold_aggregates.ensure_schema(conn)
+    conn.execute("INSERT INTO products VALUES ('ai', 'AI Hero', true, NULL), ('ts', 'Total TypeScript', true, NULL)")
+    add_conversation(conn, "cnv_1", "ai", 6, ["refund"])
+    add_conversation(conn, "cnv_2", "ai", 4, ["refund", "access"])
+    add_conversation(conn, "cnv_3", "ts", 1, ["access"])
+    yield conn
+    conn.close()
+
+
+def add_conversation(conn, conversation_id, product, quality_score, request_types):
+    conn.execute(
+        "INSERT INTO conversations (id, product, request_type, quality_score) VALUES (?, ?, 'support', ?)",
+        [conversation_id, product, quality_score],
+    )
+    for request_type in request_types:
+        conn.execute("INSERT INTO classifications VALUES (?, ?, 0.9, 'v1')", [conversation_id, request_type])
+
+
+def aggregates(conn):
+    return (
+        sorted(conn.execute("SELECT * FROM summary_product_tiers").fetchall()),
+        sorted(conn.execute("SELECT * FROM summary_request_types").fetchall()),
+    )
+
+
+def recomputed(conn):
+    return (
+        sorted(conn.execute(gold_aggregates.PRODUCT_TIERS_SQL).fetchall()),
+        sorted(conn.execute(gold_aggregates.REQUEST_TYPES_SQL).fetchall()),
+    )
+
+
+def test_rebuild_matches_a_full_recompute(gold):
+    rebuild(gold)
+    assert aggregates(gold) == recomputed(gold)
+    assert aggregates(gold)[0] == [("ai", "gold", 1), ("ai", "silver", 1), ("ts", "noise", 1)]
+    assert verify(gold) == []
+
+
+def test_refresh_applies_only_the_changes(gold):
+    rebuild(gold)
+    add_conversation(gold, "cnv_4", "ts", 5, ["refund"])
+    gold.execute("UPDATE conversations SET quality_score = 5 WHERE id = 'cnv_2'")
+    counts = refresh(gold)
+    assert counts["conversations_changed"] == 2
+    assert counts["classification_keys_changed"] == 1  # cnv_2 kept its product
+    assert aggregates(gold) == recomputed(gold)
+    assert ("ai", "gold", 2) in aggregates(gold)[0]
+    assert refresh(gold)["conversations_changed"] == 0
+
+
+def test_keys_reaching_zero_are_dropped(gold):
+    rebuild(gold)
+    gold.execute("DELETE FROM classifications WHERE conversation_id = 'cnv_3'")
+    gold.execute("DELETE FROM conversations WHERE id = 'cnv_3'")
+    refresh(gold)
+    tiers, request_types = aggregates(gold)
+    assert all(product != "ts" for product, *_ in tiers + request_types)
+    assert (tiers, request_types) == recomputed(gold)
+
+
+def test_scoped_refresh_only_looks_at_the_given_conversations(gold):
+    rebuild(gold)
+    add_conversation(gold, "cnv_4", "ts", 5, ["refund"])
+    add_conversation(gold, "cnv_5", "ts", 5, ["refund"])
+    refresh(gold, conversation_ids=["cnv_4"])
+    assert ("ts", "gold", 1) in aggregates(gold)[0]
+    refresh(gold)
+    assert aggregates(gold) == recomputed(gold)
+
+
+def test_verify_catches_drift(gold):
+    rebuild(gold)
+    gold.execute("UPDATE summary_product_tiers SET count = 7 WHERE product = 'ai' AND tier = 'gold'")
+    gold.execute("DELETE FROM summary_request_types WHERE product = 'ts'")
+    assert verify(gold) == [
+        "summary_product_tiers ('ai', 'gold'): stored 7, recomputed 1",
+        "summary_request_types ('ts', 'access'): stored None, recomputed 1",
+    ]
+    rebuild(gold)
+    assert verify(gold) == []
+
+
+def test_aggregates_are_current_until_a_source_table_changes(gold):
+    assert not is_current(gold)
+    rebuild(gold)
+    assert is_current(gold)
+    # A writer that doesn't refresh: rescoring without changing the row count
+    gold.execute("UPDATE conversations SET quality_score = 2 WHERE id = 'cnv_1'")
+    assert not is_current(gold)
+    refresh(gold)
+    assert is_current(gold)
+    gold.execute("INSERT INTO classifications VALUES ('cnv_3', 'refund', 0.5, 'v2')")
+    assert not is_current(gold)
+
+
+def load_summary(tmp_path, monkeypatch):
+    spec = importlib.util.spec_from_file_location("generate_gold_summary", SUMMARY_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "TREND_CACHE_DIR", tmp_path / "reports" / ".trend-cache")
+    return module
+
+
+def run_summary(tmp_path, monkeypatch, *flags):
+    module = load_summary(tmp_path, monkeypatch)
+    monkeypatch.setattr(module, "DB_PATH", tmp_path / "gold.duckdb")
+    monkeypatch.setattr(module, "REPORTS_DIR", tmp_path / "reports")
+    (tmp_path / "reports").mkdir(exist_ok=True)
+    monkeypatch.setattr(sys, "argv", ["generate-gold-summary.py", *flags])
+    module.main()
+    summary = json.loads((tmp_path / "reports" / "gold-summary.json").read_text())
+    del summary["generated_at"]
+    return summary
+
+
+def test_report_scans_when_the_aggregates_are_stale(gold, tmp_path, monkeypatch, capsys):
+    rebuild(gold)
+    add_conversation(gold, "cnv_4", "ts", 5, ["refund"])
+    gold.close()
+
+    stale = run_summary(tmp_path, monkeypatch)
+    assert "behind conversations or classifications" in capsys.readouterr().out
+    assert stale == run_summary(tmp_path, monkeypatch, "--recompute")
+    assert {"product": "ts", "total": 2} in stale["totals_by_product"]
+
+
+def add_message(conn, conversation_id, timestamp):
+    conn.execute("INSERT INTO messages VALUES (?, 'customer', 'Hi', ?)", [conversation_id, timestamp])
+
+
+def trends_at(module, monkeypatch, conn, now, use_cache=True):
+    class Frozen(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromisoformat(now).replace(tzinfo=tz)
+
+    monkeypatch.setattr(module, "datetime", Frozen)
+    return module.compute_trends(conn, "month", use_cache)
+
+
+@pytest.fixture
+def trends(gold, tmp_path, monkeypatch):
+    """The summary module, with January and February cached as closed in mid-March."""
+    add_message(gold, "cnv_1", "2026-01-10 09:00")
+    add_message(gold, "cnv_2", "2026-02-03 09:00")
+    add_message(gold, "cnv_3", "2026-03-05 09:00")
+    add_message(gold, "cnv_3", "2026-04-02 09:00")
+    module = load_summary(tmp_path, monkeypatch)
+    trends_at(module, monkeypatch, gold, "2026-03-15T12:00:00")
+    return module
+
+
+def test_cached_trend_windows_match_a_full_recompute(gold, trends, monkeypatch):
+    add_conversation(gold, "cnv_4", "ts", 5, ["refund"])
+    add_message(gold, "cnv_4", "2026-04-05 09:00")
+    windows, recomputed = trends_at(trends, monkeypatch, gold, "2026-04-20T12:00:00")
+    full, full_recomputed = trends_at(trends, monkeypatch, gold, "2026-04-20T12:00:00", use_cache=False)
+    assert windows == full
+    assert [entry["window_start"] for entry in windows] == ["2026-01-01", "2026-02-01", "2026-03-01", "2026-04-01"]
+    assert recomputed < full_recomputed
+    # March is closed now and comes from the cache written above
+    assert trends_at(trends, monkeypatch, gold, "2026-04-25T12:00:00") == (full, recomputed - 1)
+
+
+@pytest.mark.parametrize("change", [
+    "INSERT INTO messages VALUES ('cnv_3', 'customer', 'Back-filled', '2026-01-20 09:00')",
+    "INSERT INTO classifications VALUES ('cnv_1', 'access', 0.8, 'v2')",
+    "UPDATE conversations SET quality_score = 1 WHERE id = 'cnv_2'",
+])
+def test_trend_cache_is_dropped_when_closed_windows_change(gold, trends, monkeypatch, change):
+    gold.execute(change)
+    windows, recomputed = trends_at(trends, monkeypatch, gold, "2026-03-20T12:00:00")
+    assert (windows, recomputed) == trends_at(trends, monkeypatch, gold, "2026-03-20T12:00:00", use_cache=False)
+
+
+def test_truncated_trend_cache_is_a_miss(gold, trends, tmp_path, monkeypatch):
+    cache_path = tmp_path / "reports" / ".trend-cache" / "month.json"
+    cache_path.write_text(cache_path.read_text()[:40])
+    windows, recomputed = trends_at(trends, monkeypatch, gold, "2026-03-20T12:00:00")
+    assert (windows, recomputed) == trends_at(trends, monkeypatch, gold, "2026-03-20T12:00:00", use_cache=False)
+    # The rewrite replaced the truncated file and left no temp file behind
+    assert [path.name for path in cache_path.parent.iterdir()] == ["month.json"]
+    assert json.loads(cache_path.read_text())["closed_before"] == "2026-03-01"
+
+
+# The queries the report ran through the duckdb CLI before it read everything in two grouped scans
+BASELINE_SQL = {
+    "totals": "SELECT product, COUNT(*) AS total FROM conversations GROUP BY product ORDER BY total DESC, product",
+    "requests": (
+        "SELECT c.product, cl.request_type, COUNT(*) AS count FROM classifications cl "
+        "JOIN conversations c ON c.id = cl.conversation_id GROUP BY c.product, cl.request_type ORDER BY c.product, count DESC"
+    ),
+    "tiers": (
+        "SELECT product, CASE WHEN quality_score >= 5 THEN 'gold' WHEN quality_score >= 3 THEN 'silver' ELSE 'noise' END "
+        "AS tier, COUNT(*) AS count FROM conversations GROUP BY product, tier ORDER BY product, tier"
+    ),
+    "top_types": (
+        "SELECT cl.request_type, COUNT(*) AS count FROM classifications cl "
+        "GROUP BY cl.request_type ORDER BY count DESC, cl.request_type LIMIT 10"
+    ),
+    "gold_ratio": (
+        "SELECT product, SUM(CASE WHEN quality_score >= 5 THEN 1 ELSE 0 END) AS gold, COUNT(*) AS total, "
+        "ROUND(SUM(CASE WHEN quality_score >= 5 THEN 1 ELSE 0 END)::DOUBLE / COUNT(*), 4) AS gold_ratio "
+        "FROM conversations GROUP BY product ORDER BY gold_ratio DESC, total DESC, product"
+    ),
+}
+
+
+def baseline_sections(conn):
+    rows = {}
+    for name, sql in BASELINE_SQL.items():
+        result = conn.execute(sql)
+        columns = [d[0] for d in result.description]
+        rows[name] = [dict(zip(columns, row)) for row in result.fetchall()]
+
+    matrix, overall = {}, {}
+    for row in rows["requests"]:
+        matrix.setdefault(row["product"], {})[row["request_type"]] = row["count"]
+        overall[row["request_type"]] = overall.get(row["request_type"], 0) + row["count"]
+    request_types = [k for k, _ in sorted(overall.items(), key=lambda item: (-item[1], item[0]))]
+    tiers = {}
+    for row in rows["tiers"]:
+        tiers.setdefault(row["product"], {})[row["tier"]] = row["count"]
+    tier_breakdown = []
+    for product in sorted(tiers):
+        counts = {tier: tiers[product].get(tier, 0) for tier in ("gold", "silver", "noise")}
+        total = sum(counts.values())
+        tier_breakdown.append({"product": product, **counts, "total": total, "gold_ratio": round(counts["gold"] / total, 4)})
+    return {
+        "totals_by_product": rows["totals"],
+        "request_type_distribution": {
+            "request_types": request_types,
+            "matrix": [
+                {"product": product, "counts": [matrix[product].get(rt, 0) for rt in request_types]}
+                for product in sorted(matrix)
+            ],
+        },
+        "tier_breakdown_by_product": tier_breakdown,
+        "top_request_types": rows["top_types"],
+        "gold_ratio_by_product": [{**row, "gold_ratio": float(row["gold_ratio"])} for row in rows["gold_ratio"]],
+    }
+
+
+@pytest.mark.parametrize("flags", [[], ["--recompute"]])
+def test_report_sections_match_the_baseline_queries(gold, tmp_path, monkeypatch, flags):
+    gold.execute("INSERT INTO products VALUES ('ep', 'Epic React', false, NULL), ('tj', 'Testing JavaScript', false, NULL)")
+    for i in range(30):
+        product = ["ai", "ts", "ep"][i % 3] if i % 5 else "ai"
+        # Twelve request types, so the top 10 cuts some and ties go by name
+        types = [f"type_{(i * 7 + j) % 12:02d}" for j in range(i % 3)]
+        add_conversation(gold, f"cnv_x{i}", product, i % 7, types)
+    # A product with only noise and no classifications at all
+    for i in range(3):
+        add_conversation(gold, f"cnv_tj{i}", "tj", i, [])
+    expected = baseline_sections(gold)
+    rebuild(gold)
+    gold.close()
+
+    summary = run_summary(tmp_path, monkeypatch, *flags)
+    assert {key: summary[key] for key in expected} == expected
+    assert len(summary["top_request_types"]) == 10
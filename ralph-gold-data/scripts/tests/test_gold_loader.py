@@ -0,0 +1,132 @@
+import json
+import re
+import sys
+from pathlib import Path
+
+import duckdb
+import pytest
+
+import gold_aggregates
+import gold_loader
+from gold_loader import load_file
+
+INGEST_SQL_PATH = Path(__file__).resolve().parents[1] / "ingest-conversations.sql"
+
+
+def record(record_id, conversation_id, subject, source="ai", replies=("Thanks, fixed!",)):
+    history = [{"direction": "in", "body": "Help please", "timestamp": 1767225600}]
+    history += [{"direction": "out", "body": body, "timestamp": 1767229200 + i} for i, body in enumerate(replies)]
+    return {
+        "id": record_id,
+        "conversationId": conversation_id,
+        "source": source,
+        "subject": subject,
+        "customerEmail": "[EMAIL]",
+        "tags": ["support"],
+        "triggerMessage": history[0],
+        "conversationHistory": history,
+    }
+
+
+RECORDS = [
+    record("r2", "cnv_a", "Refund"),
+    record("r1", "cnv_a", "Refund (first copy)"),  # Same conversation, smaller id: this one is kept
+    record("r3", "cnv_b", "Login", source="ts", replies=("Try this link", "Did it work?")),
+    record("r4", None, "No conversation id"),
+]
+
+
+def write_json(path, records):
+    path.write_text(json.dumps(records))
+    return path
+
+
+@pytest.fixture
+def gold(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "gold.duckdb"))
+    gold_aggregates.ensure_schema(conn)
+    yield conn
+    conn.close()
+
+
+def snapshot(conn):
+    return {
+        table: sorted(conn.execute(f"SELECT {columns} FROM {table}").fetchall())
+        for table, columns in [
+            ("conversations", "id, subject, product, request_type, quality_score, tags, trigger_message"),
+            ("messages", "conversation_id, role, content, timestamp"),
+            ("products", "id"),
+        ]
+    }
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 100])
+def test_one_conversation_per_conversation_id(gold, tmp_path, batch_size):
+    load_file(gold, "conversations", write_json(tmp_path / "merged.json", RECORDS), batch_size, refresh_aggregates=False)
+    conversations = snapshot(gold)["conversations"]
+    assert [(c[0], c[1]) for c in conversations] == [
+        ("r1", "Refund (first copy)"), ("r3", "Login"), ("r4", "No conversation id"),
+    ]
+
+
+def test_reloading_is_idempotent(gold, tmp_path):
+    path = write_json(tmp_path / "merged.json", RECORDS)
+    load_file(gold, "conversations", path, 2, refresh_aggregates=False)
+    gold_aggregates.rebuild(gold)
+    first = snapshot(gold)
+    load_file(gold, "conversations", path, 2, refresh_aggregates=True)
+    assert snapshot(gold) == first
+    assert len(first["messages"]) == 7
+    assert gold_aggregates.verify(gold) == []
+
+
+def test_reloading_updates_content_but_keeps_scores(gold, tmp_path):
+    load_file(gold, "conversations", write_json(tmp_path / "merged.json", RECORDS), 100, refresh_aggregates=False)
+    gold_aggregates.rebuild(gold)
+    gold.execute("UPDATE conversations SET quality_score = 6 WHERE id = 'r3'")
+    gold.execute("INSERT INTO classifications VALUES ('r3', 'access', 0.9, 'v1')")
+    gold_aggregates.refresh(gold)
+
+    updated = [record("r3", "cnv_b", "Login (edited)", source="ts", replies=("Try this link",))]
+    load_file(gold, "conversations", write_json(tmp_path / "update.json", updated), 100, refresh_aggregates=True)
+    assert gold.execute("SELECT subject, quality_score FROM conversations WHERE id = 'r3'").fetchall() == [
+        ("Login (edited)", 6.0),
+    ]
+    assert gold.execute("SELECT COUNT(*) FROM messages WHERE conversation_id = 'r3'").fetchone() == (2,)
+    assert gold.execute("SELECT COUNT(*) FROM conversations").fetchone() == (3,)
+    assert gold_aggregates.is_current(gold)
+    assert gold_aggregates.verify(gold) == []
+
+
+def test_loader_keeps_the_same_conversations_as_ingest_sql(gold, tmp_path):
+    path = write_json(tmp_path / "merged.json", RECORDS)
+    load_file(gold, "conversations", path, 2, refresh_aggregates=False)
+    loaded = snapshot(gold)
+
+    ingested = duckdb.connect(str(tmp_path / "ingested.duckdb"))
+    gold_aggregates.ensure_schema(ingested)
+    sql = re.sub(r"read_json_auto\(.*?\);", f"read_json_auto('{path}');", INGEST_SQL_PATH.read_text(), flags=re.DOTALL)
+    ingested.execute(sql)
+    conversations = snapshot(ingested)["conversations"]
+    ingested.close()
+    assert conversations == loaded["conversations"]
+
+
+def test_loader_brings_stale_aggregates_up_to_date(gold, tmp_path, monkeypatch):
+    load_file(gold, "conversations", write_json(tmp_path / "merged.json", RECORDS), 100, refresh_aggregates=False)
+    gold_aggregates.rebuild(gold)
+    # A writer that doesn't refresh
+    gold.execute("INSERT INTO classifications VALUES ('r1', 'refund', 0.9, 'v1')")
+    gold.close()
+
+    updated = [record("r3", "cnv_b", "Login (edited)", source="ts")]
+    path = write_json(tmp_path / "update.json", updated)
+    monkeypatch.setattr(sys, "argv", ["gold_loader.py", "conversations", str(path), "--db", str(tmp_path / "gold.duckdb")])
+    gold_loader.main()
+
+    conn = duckdb.connect(str(tmp_path / "gold.duckdb"))
+    try:
+        assert gold_aggregates.verify(conn) == []
+        assert gold_aggregates.is_current(conn)
+    finally:
+        conn.close()
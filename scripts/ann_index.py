@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+ANN Index - approximate nearest neighbours over conversation embeddings
+
+An IVF (inverted file) index in plain NumPy, built by cluster_analysis.py
+as ann_index.npz next to the other cluster outputs. The coarse lists come
+from the clustering itself: each HDBSCAN cluster (and the noise points) is
+split into lists of about TARGET_LIST_SIZE members around k-means centres
+seeded from the cluster. A query scans only the nprobe lists with the
+closest centres. With product quantization (--ann-pq-subspaces), vectors
+are stored as one uint8 code per subspace and scored with lookup tables.
+
+    python3 scripts/ann_index.py similar cnv_123 -k 10
+    python3 scripts/ann_index.py benchmark --queries 500
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+import numpy as np
+
+ARTIFACTS_DIR = Path("artifacts/phase-0/clusters")
+EMBEDDINGS_PATH = Path("artifacts/phase-0/embeddings/latest/conversations.parquet")
+INDEX_FILENAME = "ann_index.npz"
+# Outside the cluster cache entries, which stay as cluster_analysis.py wrote them
+BENCHMARK_PATH = Path("artifacts/phase-0/reports/ann_benchmark.json")
+
+TARGET_LIST_SIZE = 256  # Clusters bigger than this are split into several lists
+KMEANS_ITERATIONS = 20
+PQ_CODEBOOK_SIZE = 256  # One uint8 code per subspace
+DISTANCE_CHUNK_ROWS = 4096
+DEFAULT_NPROBE = 8
+BENCHMARK_NPROBES = [1, 2, 4, 8, 16, 32, 64]
+
+def _squared_distances(a, b):
+    sq = (a ** 2).sum(axis=1)[:, None] + (b ** 2).sum(axis=1)[None, :] - 2 * a @ b.T
+    return np.maximum(sq, 0)
+
+def _nearest_centre(x, centres):
+    """Index of the closest centre for every row of x, in bounded chunks."""
+    nearest = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), DISTANCE_CHUNK_ROWS):
+        nearest[start:start + DISTANCE_CHUNK_ROWS] = _squared_distances(x[start:start + DISTANCE_CHUNK_ROWS], centres).argmin(axis=1)
+    return nearest
+
+def kmeans(x, k, iterations=KMEANS_ITERATIONS, seed=42):
+    """Lloyd's k-means from a random sample of rows; empty centres keep their position."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centres = x[rng.choice(len(x), size=k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        nearest = _nearest_centre(x, centres)
+        order = np.argsort(nearest, kind="stable")
+        moved, starts, counts = np.unique(nearest[order], return_index=True, return_counts=True)
+        updated = np.add.reduceat(x[order], starts, axis=0) / counts[:, None]
+        if np.allclose(updated, centres[moved]):
+            break
+        centres[moved] = updated
+    return centres
+
+def coarse_centres(embeddings, labels, geometry, target_list_size=TARGET_LIST_SIZE, seed=42):
+    """IVF centres derived from the clustering.
+
+    A cluster up to target_list_size members keeps its centroid; bigger
+    clusters and the noise points get k-means centres in proportion to their
+    size, so list lengths stay even and dense topics aren't one huge list.
+    """
+    centres = []
+    groups = [(cluster_id, centroid) for cluster_id, centroid in zip(geometry["cluster_ids"], geometry["centroids"])]
+    groups.append((-1, None))
+    for cluster_id, centroid in groups:
+        members = np.flatnonzero(labels == cluster_id)
+        if len(members) == 0:
+            continue
+        n_lists = max(1, round(len(members) / target_list_size))
+        if n_lists == 1 and centroid is not None:
+            centres.append(np.asarray(centroid, dtype=np.float32)[None, :])
+        else:
+            centres.append(kmeans(np.asarray(embeddings[members], dtype=np.float32), n_lists, seed=seed))
+    return np.concatenate(centres)
+
+def train_product_quantizer(residuals, n_subspaces, seed=42):
+    """Per-subspace k-means codebooks, shape (n_subspaces, PQ_CODEBOOK_SIZE, sub_dim)."""
+    if residuals.shape[1] % n_subspaces:
+        raise ValueError(f"{residuals.shape[1]} dimensions don't split into {n_subspaces} subspaces")
+    sub_dim = residuals.shape[1] // n_subspaces
+    return np.stack([
+        kmeans(residuals[:, s * sub_dim:(s + 1) * sub_dim], PQ_CODEBOOK_SIZE, seed=seed + s)
+        for s in range(n_subspaces)
+    ])
+
+def encode(residuals, codebooks):
+    n_subspaces, _, sub_dim = codebooks.shape
+    codes = np.empty((len(residuals), n_subspaces), dtype=np.uint8)
+    for s in range(n_subspaces):
+        codes[:, s] = _nearest_centre(residuals[:, s * sub_dim:(s + 1) * sub_dim], codebooks[s])
+    return codes
+
+class AnnIndex:
+    """IVF index with optional product quantization.
+
+    Members are stored grouped by list (CSR layout: list_offsets into rows and
+    vectors or codes), so probing a list is a contiguous slice. rows are
+    positions in the embedding matrix the index was built from.
+    """
+
+    def __init__(self, centres, list_offsets, rows, conversation_ids, vectors=None, codebooks=None, codes=None):
+        self.centres = centres
+        self.list_offsets = list_offsets
+        self.rows = rows
+        self.conversation_ids = conversation_ids
+        self.vectors = vectors
+        self.codebooks = codebooks
+        self.codes = codes
+        if codebooks is not None:
+            # ||q - c - r||^2 = ||q - c||^2 + sum over subspaces of (||r_s||^2 + 2 c_s.r_s - 2 q_s.r_s):
+            # everything but the query term is fixed per list and codeword
+            n_subspaces, _, sub_dim = codebooks.shape
+            split_centres = centres.reshape(len(centres), n_subspaces, 1, sub_dim)
+            self._list_tables = (codebooks ** 2).sum(axis=2) + 2 * (split_centres * codebooks).sum(axis=3)
+
+    @property
+    def quantized(self):
+        return self.codebooks is not None
+
+    @classmethod
+    def build(cls, embeddings, labels, geometry, conversation_ids, pq_subspaces=0, target_list_size=TARGET_LIST_SIZE):
+        """Build over the (reduced) embeddings the clustering ran on."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        centres = coarse_centres(embeddings, labels, geometry, target_list_size)
+        assigned = _nearest_centre(embeddings, centres)
+        rows = np.argsort(assigned, kind="stable")
+        list_offsets = np.searchsorted(assigned[rows], np.arange(len(centres) + 1))
+        vectors = embeddings[rows]
+
+        if not pq_subspaces:
+            return cls(centres, list_offsets, rows, np.asarray(conversation_ids, dtype=str), vectors=vectors)
+        residuals = vectors - centres[assigned[rows]]
+        codebooks = train_product_quantizer(residuals, pq_subspaces)
+        return cls(centres, list_offsets, rows, np.asarray(conversation_ids, dtype=str),
+                   codebooks=codebooks, codes=encode(residuals, codebooks))
+
+    def save(self, path):
+        arrays = {
+            "centres": self.centres,
+            "list_offsets": self.list_offsets,
+            "rows": self.rows,
+            "conversation_ids": self.conversation_ids,
+        }
+        if self.quantized:
+            arrays.update(codebooks=self.codebooks, codes=self.codes)
+        else:
+            arrays["vectors"] = self.vectors
+        np.savez(path, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path=ARTIFACTS_DIR / "latest" / INDEX_FILENAME):
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def _list_distances(self, query, query_tables, list_id):
+        lo, hi = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+        if not self.quantized:
+            return ((self.vectors[lo:hi] - query) ** 2).sum(axis=1)
+        # Asymmetric distance: sum one table lookup per subspace
+        tables = self._list_tables[list_id] - query_tables
+        base = ((query - self.centres[list_id]) ** 2).sum()
+        return base + tables[np.arange(len(tables)), self.codes[lo:hi]].sum(axis=1)
+
+    def search(self, queries, k=10, nprobe=DEFAULT_NPROBE):
+        """(distances, rows) of the k nearest indexed vectors per query, closest first.
+
+        Distances are Euclidean (approximate under PQ); missing neighbours,
+        when the probed lists hold fewer than k vectors, are inf and -1.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe, len(self.centres))
+        probes = np.argpartition(_squared_distances(queries, self.centres), nprobe - 1, axis=1)[:, :nprobe]
+
+        distances = np.full((len(queries), k), np.inf)
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        for q, (query, lists) in enumerate(zip(queries, probes)):
+            query_tables = None
+            if self.quantized:
+                n_subspaces, _, sub_dim = self.codebooks.shape
+                query_tables = 2 * (query.reshape(n_subspaces, 1, sub_dim) * self.codebooks).sum(axis=2)
+            candidate_dists = np.concatenate([self._list_distances(query, query_tables, l) for l in lists])
+            candidate_rows = np.concatenate([self.rows[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists])
+            top = min(k, len(candidate_dists))
+            if top == 0:
+                continue
+            nearest = np.argpartition(candidate_dists, top - 1)[:top]
+            nearest = nearest[np.argsort(candidate_dists[nearest], kind="stable")]
+            distances[q, :top] = np.sqrt(np.maximum(candidate_dists[nearest], 0))
+            rows[q, :top] = candidate_rows[nearest]
+        return distances, rows
+
+def exact_search(queries, embeddings, k=10):
+    """Brute-force k nearest rows, chunked over queries; the benchmark's ground truth."""
+    queries = np.asarray(queries, dtype=np.float32)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    rows = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), DISTANCE_CHUNK_ROWS):
+        dists = _squared_distances(queries[start:start + DISTANCE_CHUNK_ROWS], embeddings)
+        nearest = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(dists, nearest, axis=1), axis=1, kind="stable")
+        rows[start:start + DISTANCE_CHUNK_ROWS] = np.take_along_axis(nearest, order, axis=1)
+    return rows
+
+def benchmark(index, embeddings, n_queries=500, k=10, nprobes=BENCHMARK_NPROBES, seed=42):
+    """Recall@k and per-query latency of the index against exact search, per nprobe."""
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+    queries = np.asarray(embeddings[query_rows], dtype=np.float32)
+
+    started = time.perf_counter()
+    truth = exact_search(queries, embeddings, k)
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    results = []
+    for nprobe in nprobes:
+        if nprobe > len(index.centres):
+            break
+        started = time.perf_counter()
+        _, found = index.search(queries, k, nprobe)
+        latency_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        hits = sum(len(np.intersect1d(f, t)) for f, t in zip(found, truth))
+        results.append({"nprobe": nprobe, "recall": hits / truth.size, "latency_ms": latency_ms})
+
+    return {
+        "queries": len(queries),
+        "k": k,
+        "n_vectors": len(embeddings),
+        "n_lists": len(index.centres),
+        "quantized": index.quantized,
+        "exact_latency_ms": exact_ms,
+        "results": results,
+    }
+
+def _reduced_embeddings(clusters_dir, embeddings_path=EMBEDDINGS_PATH):
+    from cluster_analysis import PROJECTION_FILENAME, load_embedding_matrix, load_projection, project
+    return project(load_embedding_matrix(embeddings_path), load_projection(clusters_dir / PROJECTION_FILENAME))
+
+def _reduced_embedding(clusters_dir, row, embeddings_path=EMBEDDINGS_PATH):
+    """One row of _reduced_embeddings(): only that embedding is read and projected."""
+    from cluster_analysis import PROJECTION_FILENAME, load_projection, project, read_embedding_row
+    embedding = read_embedding_row(row, embeddings_path)
+    return project(embedding[None], load_projection(clusters_dir / PROJECTION_FILENAME))[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clusters", type=Path, default=ARTIFACTS_DIR / "latest",
+                        help="Cluster artifacts directory holding the index and pca.npz")
+    parser.add_argument("--embeddings", type=Path, default=EMBEDDINGS_PATH,
+                        help="conversations.parquet the index was built from")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    similar = subparsers.add_parser("similar", help="Conversations most similar to a given one")
+    similar.add_argument("conversation_id")
+    similar.add_argument("-k", type=int, default=10)
+    similar.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+
+    bench = subparsers.add_parser("benchmark", help="Recall vs latency against exact search")
+    bench.add_argument("--queries", type=int, default=500)
+    bench.add_argument("-k", type=int, default=10)
+    bench.add_argument("-o", "--output", type=Path, default=BENCHMARK_PATH)
+
+    args = parser.parse_args()
+    index = AnnIndex.load(args.clusters / INDEX_FILENAME)
+
+    if args.command == "similar":
+        matches = np.flatnonzero(index.conversation_ids == args.conversation_id)
+        if len(matches) == 0:
+            print(f"Unknown conversation: {args.conversation_id}", file=sys.stderr)
+            return 1
+        query = _reduced_embedding(args.clusters, matches[0], args.embeddings)
+        distances, rows = index.search(query, args.k + 1, args.nprobe)
+        similar_ids = [
+            {"conversation_id": str(index.conversation_ids[row]), "distance": round(float(dist), 4)}
+            for dist, row in zip(distances[0], rows[0])
+            if row != -1 and row != matches[0]
+        ]
+        print(json.dumps(similar_ids[:args.k], indent=2))
+        return 0
+
+    embeddings = _reduced_embeddings(args.clusters, args.embeddings)
+    report = benchmark(index, embeddings, n_queries=args.queries, k=args.k)
+    print(f"{report['n_vectors']} vectors, {report['n_lists']} lists, "
+          f"{'PQ' if report['quantized'] else 'flat'}; exact search {report['exact_latency_ms']:.3f} ms/query")
+    print(f"{'nprobe':>8} {'recall@' + str(report['k']):>10} {'ms/query':>10}")
+    for row in report["results"]:
+        print(f"{row['nprobe']:>8} {row['recall']:>10.3f} {row['latency_ms']:>10.3f}")
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
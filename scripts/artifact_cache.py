@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Artifact Cache - content-addressed output directories for the pipeline stages
+
+Each stage writes its outputs to <root>/<key>, where the key hashes the
+stage's input files (data and the code that processes it) and parameters,
+and <root>/latest points at the most recent entry:
+
+    cache = ArtifactCache(ARTIFACTS_DIR, "cluster_analysis")
+    key, manifest = cache.key(inputs=[EMBEDDINGS_PATH, Path(__file__)], params=params)
+    if cache.lookup(key) is not None:
+        cache.publish(key)              # cache hit: reuse the entry
+    else:
+        out_dir = cache.begin(key)
+        ...write outputs to out_dir...
+        cache.commit(key, manifest)
+
+An entry is built in a staging directory and only appears on commit:
+<root>/<key> is a symlink to the entry's data directory and is swapped in
+atomically, so readers never see a half-written (or, when rebuilt with
+--force, half-removed) entry and an interrupted run never leaves one that
+looks like a hit. Staging directories carry their process id and are only
+cleaned up once that process is gone, so concurrent runs of the same key
+don't remove each other's work.
+
+Committing an entry prunes the stage's older entries, keeping the `keep`
+most recently created ones and whichever entry latest points at.
+
+Input files are hashed by content; the digests are memoized by size and
+mtime in <root>/.digests.json so a hit costs a few stat calls even for
+multi-GB inputs.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+KEY_LENGTH = 16
+MANIFEST_FILENAME = "manifest.json"
+DIGESTS_FILENAME = ".digests.json"
+LATEST_LINK = "latest"
+KEEP_ENTRIES = 5
+HASH_CHUNK_BYTES = 1 << 20
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Someone else's process
+        return True
+    return True
+
+class ArtifactCache:
+    """Content-addressed entries for one pipeline stage under a root directory."""
+
+    def __init__(self, root, stage, keep=KEEP_ENTRIES):
+        self.root = Path(root)
+        self.stage = stage
+        self.keep = keep
+        self._digests_path = self.root / DIGESTS_FILENAME
+        self._digests = None
+
+    def file_digest(self, path):
+        """sha256 of a file's content, rehashed only when its size or mtime changed."""
+        path = Path(path).resolve()
+        if self._digests is None:
+            self._digests = json.loads(self._digests_path.read_text()) if self._digests_path.exists() else {}
+        stat = path.stat()
+        cached = self._digests.get(str(path))
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+        digest = _sha256(path)
+        self._digests[str(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self._digests_path.with_suffix(f".tmp-{os.getpid()}")
+        tmp.write_text(json.dumps(self._digests, indent=2, sort_keys=True))
+        os.replace(tmp, self._digests_path)
+        return digest
+
+    def key(self, inputs, params):
+        """(key, manifest) for these input files and JSON-serializable parameters.
+
+        Missing inputs are skipped, so optional sidecars (e.g. a DuckDB .wal)
+        can be listed unconditionally.
+        """
+        manifest = {
+            "stage": self.stage,
+            "inputs": {str(path): self.file_digest(path) for path in inputs if Path(path).exists()},
+            "params": params,
+        }
+        # Paths are left out of the key so the same files reached through a
+        # different working directory or symlink still hit
+        keyed = {**manifest, "inputs": sorted(manifest["inputs"].values())}
+        blob = json.dumps(keyed, sort_keys=True, default=str).encode()
+        key = hashlib.sha256(blob).hexdigest()[:KEY_LENGTH]
+        return key, {"key": key, **manifest}
+
+    def lookup(self, key):
+        """The entry directory for key, or None if it hasn't been built."""
+        entry = self.root / key
+        return entry if (entry / MANIFEST_FILENAME).exists() else None
+
+    def publish(self, key):
+        """Point <root>/latest at the entry, replacing the link atomically."""
+        link = self.root / LATEST_LINK
+        tmp = self.root / f".{LATEST_LINK}.tmp-{os.getpid()}"
+        tmp.symlink_to(key)
+        os.replace(tmp, link)
+
+    def _staging(self, key):
+        return self.root / f".{key}.partial-{os.getpid()}"
+
+    def _remove_stale(self, key):
+        """Remove what runs of key left behind once their process has exited."""
+        entry = self.root / key
+        current = os.readlink(entry) if entry.is_symlink() else None
+        pattern = re.compile(rf"\.{re.escape(key)}\.(partial|data|link)-(\d+)(?:-\d+)?")
+        for path in self.root.glob(f".{key}.*"):
+            match = pattern.fullmatch(path.name)
+            if match is None or path.name == current:
+                continue
+            pid = int(match.group(2))
+            if pid != os.getpid() and _pid_running(pid):
+                continue
+            if path.is_symlink():
+                path.unlink()
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def begin(self, key):
+        """Empty staging directory to write the entry's outputs into.
+
+        Directories left behind by interrupted runs are removed; those of
+        runs still in progress are left alone.
+        """
+        self._remove_stale(key)
+        staging = self._staging(key)
+        staging.mkdir(parents=True)
+        return staging
+
+    def commit(self, key, manifest):
+        """Swap the staged outputs in as <root>/<key>, write its manifest and point latest at it."""
+        staging = self._staging(key)
+        manifest = {**manifest, "created_at": datetime.now(timezone.utc).isoformat()}
+        (staging / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+        data = self.root / f".{key}.data-{os.getpid()}-{time.time_ns()}"
+        os.replace(staging, data)
+
+        entry = self.root / key
+        previous = None
+        if entry.is_symlink():  # Rebuilt with --force
+            previous = self.root / os.readlink(entry)
+        elif entry.exists():  # Entry from before entries were symlinks
+            previous = self.root / f".{key}.data-{os.getpid()}-0"
+            os.replace(entry, previous)
+        tmp = self.root / f".{key}.link-{os.getpid()}"
+        tmp.symlink_to(data.name)
+        os.replace(tmp, entry)
+        if previous is not None:
+            shutil.rmtree(previous, ignore_errors=True)
+        self.publish(key)
+        if self.keep is not None:
+            self.prune(self.keep)
+        return entry
+
+    def _entries(self):
+        """(created_at, entry) for every committed entry, oldest first."""
+        entries = []
+        for path in self.root.iterdir():
+            if not re.fullmatch(rf"[0-9a-f]{{{KEY_LENGTH}}}", path.name) or self.lookup(path.name) is None:
+                continue
+            manifest = json.loads((path / MANIFEST_FILENAME).read_text())
+            entries.append((manifest.get("created_at", ""), path))
+        return sorted(entries)
+
+    def prune(self, keep):
+        """Remove all but the keep most recent entries (and latest's); returns the removed keys."""
+        latest = self.root / LATEST_LINK
+        current = os.readlink(latest) if latest.is_symlink() else None
+        entries = [path for _, path in self._entries()]
+        others = [path for path in entries if path.name != current]
+        keep_others = max(keep - (len(others) < len(entries)), 0)
+        removed = others[:len(others) - keep_others]
+        for entry in removed:
+            if entry.is_symlink():
+                data = self.root / os.readlink(entry)
+                entry.unlink()
+                shutil.rmtree(data, ignore_errors=True)
+            else:  # Entry from before entries were symlinks
+                shutil.rmtree(entry, ignore_errors=True)
+        return [entry.name for entry in removed]
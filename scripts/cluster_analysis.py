@@ -7,41 +7,238 @@ Uses HDBSCAN to discover natural topic groupings in support conversations.
 Includes PCA dimensionality reduction for performance.
 """
 
+import argparse
+import hashlib
 import json
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from datetime import datetime, timezone
 from pathlib import Path
 import numpy as np
 import pandas as pd
-from sklearn.cluster import HDBSCAN
-from sklearn.decomposition import PCA
-from sklearn.metrics import silhouette_score
-from sklearn.metrics.pairwise import euclidean_distances
+from sklearn.cluster import HDBSCAN, MiniBatchKMeans
+from sklearn.decomposition import PCA, IncrementalPCA
+from columnar_output import write_parquet
+from stage_metrics import StageRecorder
+from cluster_assign import MODEL_FILENAME, build_cluster_model, save_cluster_model
+from ann_index import INDEX_FILENAME, AnnIndex
+from embedding_store import STORE_KINDS, load_reduced, load_store, save_reduced, write_store
+from artifact_cache import ArtifactCache
 
 # Configuration
 ARTIFACTS_DIR = Path("artifacts/phase-0/clusters")
 EMBEDDINGS_PATH = Path("artifacts/phase-0/embeddings/latest/conversations.parquet")
 FRONT_CACHE_DB = Path.home() / "skill" / "data" / "front-cache.db"
+SCRIPT_DIR = Path(__file__).resolve().parent
+# Code whose changes invalidate cached cluster artifacts, besides this script
+CODE_DEPENDENCIES = ["cluster_assign.py", "ann_index.py", "embedding_store.py", "columnar_output.py"]
 
 # Use PCA to reduce dimensions for faster clustering
 PCA_DIMS = 50  # Reduce from 1536 to 50 dims
+PCA_BATCH_SIZE = 10_000  # Rows per partial_fit/transform batch in incremental mode
+PROJECTION_FILENAME = "pca.npz"
+
+# Silhouette scoring
+SILHOUETTE_MEMORY_MB = 1024  # Budget for distance chunks; exact scoring only if the full matrix fits
+SILHOUETTE_SAMPLE_SIZE = 10_000  # Stratified sample size when the dataset is too big for exact scoring
+SILHOUETTE_BOOTSTRAPS = 1000
+
+# Two-stage clustering
+MICRO_CLUSTERS = 2000  # MiniBatchKMeans centroids HDBSCAN runs on in --mode two-stage
+MICRO_BATCH_SIZE = 10_000
+
+# Keyword labelling
+KEYWORDS_PER_CLUSTER = 5
+KEYWORD_MESSAGE_CHARS = 200  # Only the opening of each first message is scored
+LABEL_STOP_WORDS = {
+    'the', 'a', 'an', 'is', 'was', 'are', 'were', 'i', 'you', 'my', 'your', 'to', 'for', 'of', 'and', 'in', 'on',
+    'with', 'this', 'that', 'it', 'be', 'have', 'has', 'had', 'can', 'would', 'like', 'just', 'if', 'me', 'we', 'us',
+    'as', 'at', 'but', 'not', 'so', 'do', 'does', 'did', 'will', 'when', 'what', 'how', 'all', 'from',
+}
+
+def embedding_cache_path(embeddings_path=EMBEDDINGS_PATH):
+    """Path of the float32 .npy sidecar cached next to the parquet file."""
+    return embeddings_path.with_suffix(".embedding.f32.npy")
 
 def load_embeddings():
-    """Load embeddings from parquet file."""
+    """Load conversation metadata (everything but the embedding column) from parquet."""
+    import pyarrow.parquet as pq
+    
     print(f"Loading embeddings from {EMBEDDINGS_PATH}...")
-    df = pd.read_parquet(EMBEDDINGS_PATH)
-    print(f"Loaded {len(df)} conversations with {len(df['embedding'].iloc[0])}-dim embeddings")
+    columns = [name for name in pq.read_schema(EMBEDDINGS_PATH).names if name != "embedding"]
+    df = pd.read_parquet(EMBEDDINGS_PATH, columns=columns)
+    print(f"Loaded {len(df)} conversations")
     return df
 
-def reduce_dimensions(embeddings, n_components=PCA_DIMS):
-    """Reduce dimensionality with PCA for faster clustering."""
-    print(f"\nReducing dimensions from {embeddings.shape[1]} to {n_components} with PCA...")
-    pca = PCA(n_components=n_components, random_state=42)
-    reduced = pca.fit_transform(embeddings)
-    variance_explained = float(pca.explained_variance_ratio_.sum())  # Convert to Python float
+def read_embedding_column(embeddings_path=EMBEDDINGS_PATH, dtype=np.float32):
+    """Read the parquet embedding column as a contiguous (n, dims) matrix of dtype.
+    
+    Reads the column through Arrow as a fixed-size list and views its flat
+    values buffer directly (zero-copy when the file already stores dtype).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    column = pq.read_table(embeddings_path, columns=["embedding"]).column("embedding").combine_chunks()
+    if pa.types.is_fixed_size_list(column.type):
+        dims = column.type.list_size
+    else:
+        dims = len(column[0])
+    value_type = pa.from_numpy_dtype(np.dtype(dtype))
+    if column.type != pa.list_(value_type, dims):
+        column = column.cast(pa.list_(value_type, dims))
+    return column.values.to_numpy(zero_copy_only=False).reshape(len(column), dims)
+
+def _fresh_embedding_cache(embeddings_path):
+    """The memory-mapped sidecar, or None if it's missing, older than the parquet or of another length."""
+    import pyarrow.parquet as pq
+    
+    cache_path = embedding_cache_path(embeddings_path)
+    if cache_path.exists() and cache_path.stat().st_mtime >= embeddings_path.stat().st_mtime:
+        matrix = np.load(cache_path, mmap_mode="r")
+        if matrix.shape[0] == pq.read_metadata(embeddings_path).num_rows:
+            return matrix
+    return None
+
+def read_embedding_row(row, embeddings_path=EMBEDDINGS_PATH):
+    """One float32 embedding by row position, without loading the matrix.
+    
+    Taken from the sidecar when it's fresh, otherwise from the one parquet
+    row group that holds the row.
+    """
+    import pyarrow.parquet as pq
+    
+    cached = _fresh_embedding_cache(embeddings_path)
+    if cached is not None:
+        return np.array(cached[row])
+    parquet = pq.ParquetFile(embeddings_path)
+    for group in range(parquet.num_row_groups):
+        group_rows = parquet.metadata.row_group(group).num_rows
+        if row < group_rows:
+            column = parquet.read_row_group(group, columns=["embedding"]).column("embedding")
+            return column[row].values.to_numpy(zero_copy_only=False).astype(np.float32)
+        row -= group_rows
+    raise IndexError(f"Embedding row out of range for {embeddings_path}")
+
+def load_embedding_matrix(embeddings_path=EMBEDDINGS_PATH):
+    """Load the embedding column as a contiguous float32 (n, dims) matrix.
+    
+    Reads it with read_embedding_column() and caches it as a .npy sidecar.
+    Later runs memory-map the sidecar, so they start instantly without
+    copying the matrix at all.
+    """
+    cache_path = embedding_cache_path(embeddings_path)
+    matrix = _fresh_embedding_cache(embeddings_path)
+    if matrix is not None:
+        print(f"Memory-mapped {matrix.shape[0]} x {matrix.shape[1]} embeddings from {cache_path.name}")
+        return matrix
+    
+    matrix = read_embedding_column(embeddings_path)
+    
+    np.save(cache_path, matrix)
+    print(f"Loaded {matrix.shape[0]} x {matrix.shape[1]} embeddings (cached to {cache_path.name})")
+    return np.load(cache_path, mmap_mode="r")
+
+def reduction_params(method="full", batch_size=PCA_BATCH_SIZE, projection=None):
+    """The PCA settings a reduced matrix depends on, as saved with the reduced store.
+    
+    A reused projection is identified by a digest of its weights; a fitted
+    one by the method and dims (and batch size, which shapes an incremental
+    fit).
+    """
+    if projection is not None:
+        digest = hashlib.sha256()
+        for key in ("components", "mean"):
+            digest.update(np.ascontiguousarray(projection[key]).tobytes())
+        return {"projection": digest.hexdigest()}
+    return {"method": method, "dims": PCA_DIMS, "batch_size": batch_size if method == "incremental" else None}
+
+def load_embedding_store(kind="float32", embeddings_path=EMBEDDINGS_PATH, pca_params=None):
+    """(matrix, reduced, projection) from the chosen embedding store.
+    
+    float16 and int8 stores are memory-mapped and dequantized batch by batch;
+    they are written from the float32 sidecar on first use. A fresh reduced
+    store saved with the same pca_params (default: reduction_params())
+    returns the PCA-reduced matrix and its projection with no raw matrix;
+    otherwise reduced and projection are None and the caller reduces (and,
+    for kind="reduced", saves the result).
+    """
+    if kind == "reduced":
+        stored = load_reduced(pca_params or reduction_params(), embeddings_path)
+        if stored is not None:
+            reduced, projection = stored
+            print(f"Loaded {reduced.shape[0]} x {reduced.shape[1]} reduced embeddings")
+            return None, reduced, projection
+    elif kind != "float32":
+        matrix = load_store(kind, embeddings_path)
+        if matrix is None:
+            path = write_store(kind, load_embedding_matrix(embeddings_path), embeddings_path)
+            print(f"Wrote {kind} embedding store {path.name}")
+            matrix = load_store(kind, embeddings_path)
+        print(f"Memory-mapped {matrix.shape[0]} x {matrix.shape[1]} {kind} embeddings")
+        return matrix, None, None
+    return load_embedding_matrix(embeddings_path), None, None
+
+def _row_batches(n_rows, batch_size, min_size=1):
+    """(start, end) row ranges; a short tail is folded into the previous batch."""
+    bounds = list(range(0, n_rows, batch_size)) + [n_rows]
+    if len(bounds) > 2 and bounds[-1] - bounds[-2] < min_size:
+        bounds.pop(-2)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def project(embeddings, projection, batch_size=PCA_BATCH_SIZE, dtype=np.float32):
+    """Apply a fitted PCA projection batch by batch into a float32 (or dtype) matrix."""
+    components = np.asarray(projection["components"], dtype=dtype)
+    mean = np.asarray(projection["mean"], dtype=dtype)
+    reduced = np.empty((embeddings.shape[0], components.shape[0]), dtype=dtype)
+    for start, end in _row_batches(embeddings.shape[0], batch_size):
+        reduced[start:end] = (np.asarray(embeddings[start:end], dtype=dtype) - mean) @ components.T
+    return reduced
+
+def save_projection(path, projection):
+    """Save a fitted projection so later runs can transform without refitting."""
+    np.savez(path, **projection)
+
+def load_projection(path):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+def reduce_dimensions(embeddings, n_components=PCA_DIMS, method="full", batch_size=PCA_BATCH_SIZE, projection=None,
+                      dtype=np.float32):
+    """Reduce dimensionality with PCA for faster clustering.
+    
+    method="full" fits sklearn PCA on the whole matrix; method="incremental"
+    streams row batches through IncrementalPCA so only one batch is in memory
+    at a time (pair it with the memory-mapped embedding sidecar). A previously
+    saved projection skips fitting entirely. Returns the reduced float32
+    matrix, the variance explained and the projection; dtype=np.float64
+    keeps the fit, projection and result in double precision instead.
+    """
+    if projection is not None:
+        print(f"\nProjecting {embeddings.shape[1]} dims to {projection['components'].shape[0]} with saved {projection['method']}...")
+    elif method == "incremental":
+        print(f"\nReducing dimensions from {embeddings.shape[1]} to {n_components} with IncrementalPCA (batches of {batch_size})...")
+        pca = IncrementalPCA(n_components=n_components, batch_size=batch_size)
+        for start, end in _row_batches(embeddings.shape[0], batch_size, min_size=n_components):
+            pca.partial_fit(np.asarray(embeddings[start:end], dtype=dtype))
+    else:
+        print(f"\nReducing dimensions from {embeddings.shape[1]} to {n_components} with PCA...")
+        pca = PCA(n_components=n_components, random_state=42)
+        pca.fit(embeddings if dtype == np.float32 else np.asarray(embeddings, dtype=dtype))
+    
+    if projection is None:
+        projection = {
+            "method": np.array("IncrementalPCA" if method == "incremental" else "PCA"),
+            "components": pca.components_.astype(dtype),
+            "mean": pca.mean_.astype(dtype),
+            "explained_variance_ratio": pca.explained_variance_ratio_,
+        }
+    reduced = project(embeddings, projection, batch_size, dtype)
+    variance_explained = float(projection["explained_variance_ratio"].sum())  # Convert to Python float
     print(f"Variance explained: {variance_explained:.1%}")
-    return reduced, variance_explained
+    return reduced, variance_explained, projection
 
 def run_clustering(embeddings, min_cluster_size=50, min_samples=10):
     """Run HDBSCAN clustering on embeddings."""
@@ -64,7 +261,219 @@ def run_clustering(embeddings, min_cluster_size=50, min_samples=10):
     
     return labels, clusterer
 
-def calculate_metrics(embeddings, labels):
+def micro_cluster(embeddings, n_micro=MICRO_CLUSTERS, batch_size=MICRO_BATCH_SIZE):
+    """Compress embeddings into micro-clusters with MiniBatchKMeans, one batch in memory at a time.
+    
+    One pass of partial_fit over row batches, then a second pass assigns
+    every row to its micro-cluster. Returns the non-empty centroids, how many
+    conversations each one stands for, and each row's micro-cluster.
+    """
+    n_micro = min(n_micro, embeddings.shape[0])
+    batch_size = max(batch_size, n_micro)  # partial_fit needs at least n_clusters rows per batch
+    print(f"\nCompressing {embeddings.shape[0]} conversations into {n_micro} micro-clusters (batches of {batch_size})...")
+    
+    kmeans = MiniBatchKMeans(n_clusters=n_micro, batch_size=batch_size, random_state=42, n_init=1)
+    batches = _row_batches(embeddings.shape[0], batch_size, min_size=n_micro)
+    for start, end in batches:
+        kmeans.partial_fit(np.asarray(embeddings[start:end], dtype=np.float32))
+    
+    assignment = np.empty(embeddings.shape[0], dtype=np.int64)
+    for start, end in batches:
+        assignment[start:end] = kmeans.predict(np.asarray(embeddings[start:end], dtype=np.float32))
+    
+    # Drop centroids no conversation landed in and renumber the rest
+    used, assignment = np.unique(assignment, return_inverse=True)
+    weights = np.bincount(assignment)
+    print(f"Kept {len(used)} non-empty micro-clusters ({weights.mean():.1f} conversations each on average)")
+    return kmeans.cluster_centers_[used].astype(np.float32), weights, assignment
+
+def run_two_stage_clustering(micro, min_cluster_size=50, min_samples=10):
+    """HDBSCAN over micro-cluster centroids, with labels mapped back to every conversation.
+    
+    sklearn's HDBSCAN takes no sample weights, so min_cluster_size and
+    min_samples are converted from conversations to micro-clusters using the
+    average micro-cluster weight, and clusters whose total weight is still
+    under min_cluster_size conversations are turned into noise.
+    """
+    centroids, weights, assignment = micro
+    scale = weights.mean()
+    micro_min_cluster_size = max(2, int(round(min_cluster_size / scale)))
+    micro_min_samples = max(1, int(round(min_samples / scale)))
+    print(f"\nRunning HDBSCAN on {len(centroids)} micro-clusters with min_cluster_size={micro_min_cluster_size}, "
+          f"min_samples={micro_min_samples} (from {min_cluster_size}/{min_samples} conversations)...")
+    
+    clusterer = HDBSCAN(
+        min_cluster_size=micro_min_cluster_size,
+        min_samples=micro_min_samples,
+        metric='euclidean',
+        n_jobs=-1
+    )
+    micro_labels = clusterer.fit_predict(centroids)
+    
+    clustered = micro_labels != -1
+    if clustered.any():  # Otherwise every conversation is already noise
+        cluster_weights = np.bincount(micro_labels[clustered], weights=weights[clustered], minlength=micro_labels.max() + 1)
+        micro_labels[clustered & (cluster_weights[np.maximum(micro_labels, 0)] < min_cluster_size)] = -1
+        _, micro_labels[micro_labels != -1] = np.unique(micro_labels[micro_labels != -1], return_inverse=True)
+    
+    labels = micro_labels[assignment]
+    n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
+    n_noise = (labels == -1).sum()
+    noise_pct = n_noise / len(labels) * 100
+    
+    print(f"Found {n_clusters} clusters, {n_noise} noise points ({noise_pct:.1f}%)")
+    
+    return labels, clusterer
+
+def _tree_to_labels():
+    """sklearn's condensed-tree label extraction (renamed across releases), if available."""
+    from sklearn.cluster._hdbscan import hdbscan as sk_hdbscan
+    return getattr(sk_hdbscan, "tree_to_labels", None) or getattr(sk_hdbscan, "_tree_to_labels", None)
+
+def _sweep_min_samples(shm_name, shape, dtype, min_samples, min_cluster_sizes, n_jobs):
+    """Sweep worker: one HDBSCAN fit per min_samples, labels for every min_cluster_size.
+    
+    The mutual-reachability MST (single linkage tree) only depends on
+    min_samples, so it is built once and each min_cluster_size just re-extracts
+    clusters from it. Embeddings are read from shared memory, not pickled.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        embeddings = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        results = {}
+        tree_to_labels = _tree_to_labels()
+        clusterer = None
+        for min_cluster_size in min_cluster_sizes:
+            if clusterer is None or tree_to_labels is None:
+                clusterer = HDBSCAN(min_cluster_size=min_cluster_size, min_samples=min_samples,
+                                    metric='euclidean', n_jobs=n_jobs)
+                labels = clusterer.fit_predict(embeddings)
+            else:
+                labels, _ = tree_to_labels(clusterer._single_linkage_tree_, min_cluster_size)
+            results[(min_cluster_size, min_samples)] = np.asarray(labels, dtype=np.int64)
+        del embeddings
+        return results
+    finally:
+        shm.close()
+
+def sweep_clustering(embeddings, param_sets, workers=None):
+    """Run HDBSCAN for every parameter set, sharing work across the grid.
+    
+    Parameter sets are grouped by min_samples; each group runs in its own
+    process (one tree build, many extractions) against a single shared-memory
+    copy of the embeddings. Returns {(min_cluster_size, min_samples): labels}.
+    """
+    by_min_samples = {}
+    for params in param_sets:
+        sizes = by_min_samples.setdefault(params["min_samples"], [])
+        if params["min_cluster_size"] not in sizes:
+            sizes.append(params["min_cluster_size"])
+    
+    workers = min(workers or os.cpu_count() or 1, len(by_min_samples))
+    print(f"\nSweeping {len(param_sets)} HDBSCAN parameter sets "
+          f"({len(by_min_samples)} tree builds, {workers} workers)...")
+    
+    embeddings = np.ascontiguousarray(embeddings)
+    shm = shared_memory.SharedMemory(create=True, size=embeddings.nbytes)
+    try:
+        np.ndarray(embeddings.shape, dtype=embeddings.dtype, buffer=shm.buf)[:] = embeddings
+        # Split the cores between worker processes and HDBSCAN's own threads
+        n_jobs = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_sweep_min_samples, shm.name, embeddings.shape, embeddings.dtype,
+                            min_samples, sizes, n_jobs)
+                for min_samples, sizes in by_min_samples.items()
+            ]
+            labels_by_params = {}
+            for future in futures:
+                labels_by_params.update(future.result())
+    finally:
+        shm.close()
+        shm.unlink()
+    
+    return labels_by_params
+
+def silhouette_values(embeddings, labels, rows, memory_mb=SILHOUETTE_MEMORY_MB):
+    """Exact silhouette of the given rows against every clustered point.
+    
+    Distances are computed in row chunks sized to the memory budget and summed
+    per cluster with np.add.reduceat over label-sorted columns, so memory is
+    O(chunk x n) and time O(len(rows) x n) instead of O(n^2) for a sample.
+    Noise points must already be excluded from embeddings/labels.
+    """
+    order = np.argsort(labels, kind="stable")
+    sorted_embeddings = np.asarray(embeddings[order], dtype=np.float64)
+    cluster_ids, starts, sizes = np.unique(labels[order], return_index=True, return_counts=True)
+    sorted_sq_norms = (sorted_embeddings ** 2).sum(axis=1)
+    own_cluster = np.searchsorted(cluster_ids, labels[rows])
+    
+    chunk_rows = max(1, int(memory_mb * 2**20 // (8 * len(order) * 2)))
+    values = np.empty(len(rows))
+    for start in range(0, len(rows), chunk_rows):
+        chunk = np.asarray(embeddings[rows[start:start + chunk_rows]], dtype=np.float64)
+        sq_dists = (chunk ** 2).sum(axis=1)[:, None] + sorted_sq_norms[None, :] - 2 * chunk @ sorted_embeddings.T
+        dists = np.sqrt(np.maximum(sq_dists, 0))
+        cluster_sums = np.add.reduceat(dists, starts, axis=1)
+        
+        own = own_cluster[start:start + chunk_rows]
+        own_sizes = sizes[own]
+        idx = np.arange(len(chunk))
+        a = cluster_sums[idx, own] / np.maximum(own_sizes - 1, 1)
+        mean_dists = cluster_sums / sizes[None, :]
+        mean_dists[idx, own] = np.inf
+        b = mean_dists.min(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            chunk_values = np.nan_to_num((b - a) / np.maximum(a, b))
+        chunk_values[own_sizes == 1] = 0.0  # Singleton clusters score 0, like sklearn
+        values[start:start + chunk_rows] = chunk_values
+    return values
+
+def calculate_silhouette(embeddings, labels, mode="auto", sample_size=SILHOUETTE_SAMPLE_SIZE,
+                         memory_mb=SILHOUETTE_MEMORY_MB, seed=42):
+    """Silhouette score of clustered points, exact or from a stratified sample.
+    
+    mode="exact" scores every point (chunked, so memory stays within the
+    budget). mode="sampled" scores a per-cluster stratified sample exactly
+    against all points and reports the size-weighted mean with a bootstrap
+    95% confidence interval. mode="auto" is exact when the full distance
+    matrix would fit in memory_mb, sampled otherwise.
+    """
+    n = len(labels)
+    if mode == "auto":
+        mode = "exact" if n * n * 8 <= memory_mb * 2**20 or n <= sample_size else "sampled"
+    
+    if mode == "exact":
+        score = float(silhouette_values(embeddings, labels, np.arange(n), memory_mb).mean())
+        return score, {"mode": "exact", "sample_size": n}
+    
+    rng = np.random.default_rng(seed)
+    cluster_ids, sizes = np.unique(labels, return_counts=True)
+    weights = sizes / n
+    strata = []
+    for cluster_id, size in zip(cluster_ids, sizes):
+        take = min(size, max(2, int(round(sample_size * size / n))))
+        strata.append(rng.choice(np.flatnonzero(labels == cluster_id), size=take, replace=False))
+    
+    values = silhouette_values(embeddings, labels, np.concatenate(strata), memory_mb)
+    bounds = np.cumsum([0] + [len(s) for s in strata])
+    stratum_values = [values[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+    score = float(sum(w * v.mean() for w, v in zip(weights, stratum_values)))
+    
+    # Bootstrap: resample within each cluster, recombine with the same weights
+    boot = np.zeros(SILHOUETTE_BOOTSTRAPS)
+    for w, v in zip(weights, stratum_values):
+        boot += w * v[rng.integers(0, len(v), size=(SILHOUETTE_BOOTSTRAPS, len(v)))].mean(axis=1)
+    ci_low, ci_high = np.percentile(boot, [2.5, 97.5])
+    return score, {
+        "mode": "sampled",
+        "sample_size": int(len(values)),
+        "ci_95": [float(ci_low), float(ci_high)],
+        "bootstraps": SILHOUETTE_BOOTSTRAPS,
+    }
+
+def calculate_metrics(embeddings, labels, silhouette_mode="auto", sample_size=SILHOUETTE_SAMPLE_SIZE,
+                      memory_mb=SILHOUETTE_MEMORY_MB):
     """Calculate clustering quality metrics."""
     print("\nCalculating metrics...")
     
@@ -75,9 +484,11 @@ def calculate_metrics(embeddings, labels):
     # Calculate silhouette score (excluding noise)
     mask = labels != -1
     if mask.sum() > 1 and n_clusters > 1:
-        sil_score = silhouette_score(embeddings[mask], labels[mask])
+        sil_score, sil_method = calculate_silhouette(
+            embeddings[mask], labels[mask], silhouette_mode, sample_size, memory_mb
+        )
     else:
-        sil_score = 0.0
+        sil_score, sil_method = 0.0, {"mode": "skipped", "sample_size": 0}
     
     # Cluster size distribution
     unique, counts = np.unique(labels[labels != -1], return_counts=True)
@@ -86,12 +497,17 @@ def calculate_metrics(embeddings, labels):
     largest_cluster_size = max(counts) if len(counts) > 0 else 0
     largest_cluster_pct = largest_cluster_size / len(labels) * 100
     
-    print(f"Silhouette score: {sil_score:.3f}")
+    if "ci_95" in sil_method:
+        low, high = sil_method["ci_95"]
+        print(f"Silhouette score: {sil_score:.3f} (sampled {sil_method['sample_size']}, 95% CI {low:.3f}-{high:.3f})")
+    else:
+        print(f"Silhouette score: {sil_score:.3f}")
     print(f"Largest cluster: {largest_cluster_pct:.1f}% of data")
     print(f"Noise points: {noise_pct:.1f}%")
     
     return {
         "silhouette_score": float(sil_score),
+        "silhouette_method": sil_method,
         "num_clusters": n_clusters,
         "noise_points": int(n_noise),
         "noise_pct": float(noise_pct),
@@ -114,87 +530,149 @@ def check_quality_gates(metrics):
     
     return len(issues) == 0, issues
 
-def get_cluster_representatives(df, labels, embeddings, n_samples=5):
+def compute_cluster_geometry(labels, embeddings, n_samples=5):
+    """Centroids, distances to own centroid and closest members for all clusters at once.
+    
+    Points are sorted by label once so every centroid comes out of a single
+    np.add.reduceat; all point-to-centroid distances are then one batched
+    norm, and each cluster's n_samples closest members are picked with
+    argpartition. Noise points get a NaN distance. The label-sorted row order
+    and each cluster's start in it are returned too, for per-cluster passes.
+    """
+    clustered = np.flatnonzero(labels != -1)
+    order = clustered[np.argsort(labels[clustered], kind="stable")]
+    sorted_labels = labels[order]
+    cluster_ids = np.unique(sorted_labels)
+    starts = np.searchsorted(sorted_labels, cluster_ids)
+    sizes = np.diff(np.append(starts, len(order)))
+    
+    sorted_embeddings = np.asarray(embeddings[order], dtype=np.float64)
+    centroids = np.add.reduceat(sorted_embeddings, starts, axis=0) / sizes[:, None] if len(order) else np.empty((0, embeddings.shape[1]))
+    
+    sorted_distances = np.linalg.norm(sorted_embeddings - np.repeat(centroids, sizes, axis=0), axis=1)
+    distances = np.full(len(labels), np.nan)
+    distances[order] = sorted_distances
+    
+    closest = {}
+    for cluster_id, start, size in zip(cluster_ids, starts, sizes):
+        segment = sorted_distances[start:start + size]
+        k = min(n_samples, size)
+        nearest = np.argpartition(segment, k - 1)[:k]
+        nearest = nearest[np.argsort(segment[nearest], kind="stable")]
+        closest[int(cluster_id)] = order[start + nearest]
+    
+    return {
+        "cluster_ids": cluster_ids,
+        "centroids": centroids,
+        "sizes": sizes,
+        "distances": distances,
+        "closest": closest,
+        "order": order,
+        "starts": starts,
+    }
+
+def get_cluster_representatives(df, labels, embeddings, n_samples=5, geometry=None):
     """Get representative messages for each cluster (closest to centroid)."""
     print("\nFinding representative messages for each cluster...")
     
-    representatives = {}
-    unique_labels = sorted(set(labels[labels != -1]))
+    if geometry is None:
+        geometry = compute_cluster_geometry(labels, embeddings, n_samples)
     
-    for cluster_id in unique_labels:
-        mask = labels == cluster_id
-        cluster_embeddings = embeddings[mask]
-        cluster_df = df[mask]
-        
-        # Calculate centroid
-        centroid = cluster_embeddings.mean(axis=0)
-        
-        # Find distances to centroid
-        distances = euclidean_distances([centroid], cluster_embeddings)[0]
-        
-        # Get closest n_samples
-        closest_idx = np.argsort(distances)[:n_samples]
-        
-        representatives[int(cluster_id)] = {
-            "messages": cluster_df.iloc[closest_idx]["first_message"].tolist(),
-            "conversation_ids": cluster_df.iloc[closest_idx]["conversation_id"].tolist(),
-            "distances": [float(d) for d in distances[closest_idx]]
+    representatives = {}
+    for cluster_id, closest_idx in geometry["closest"].items():
+        closest_idx = closest_idx[:n_samples]
+        representatives[cluster_id] = {
+            "messages": df["first_message"].iloc[closest_idx].tolist(),
+            "conversation_ids": df["conversation_id"].iloc[closest_idx].tolist(),
+            "distances": [float(d) for d in geometry["distances"][closest_idx]]
         }
     
     return representatives
 
-def get_tags_from_row(tags):
-    """Safely extract tags from a row (handles numpy arrays and lists)."""
-    if tags is None:
-        return []
-    if isinstance(tags, np.ndarray):
-        if tags.size == 0:
-            return []
-        return tags.tolist()
-    if isinstance(tags, list):
-        return tags
-    return []
-
 def get_tag_distribution_per_cluster(df, labels):
-    """Analyze existing tag distribution for each cluster."""
+    """Analyze existing tag distribution for each cluster.
+    
+    Tags are exploded once into a (cluster, tag) frame and counted with a
+    single groupby. Ties keep the order tags first appear in the cluster.
+    """
     print("\nAnalyzing tag distribution per cluster...")
     
-    tag_stats = {}
-    unique_labels = sorted(set(labels[labels != -1]))
+    clustered = labels != -1
+    cluster_ids = np.unique(labels[clustered])
+    cluster_sizes = pd.Series(labels[clustered]).value_counts()
     
-    for cluster_id in unique_labels:
-        mask = labels == cluster_id
-        cluster_df = df[mask]
-        
-        # Flatten all tags
-        all_tags = []
-        for tags in cluster_df["tags"]:
-            tag_list = get_tags_from_row(tags)
-            all_tags.extend(tag_list)
-        
-        # Count tags
-        tag_counts = {}
-        for tag in all_tags:
-            tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        
-        # Sort by count
-        sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)
-        
-        # Calculate coverage (what % of cluster has the top tag)
-        top_tag_count = sorted_tags[0][1] if sorted_tags else 0
-        coverage = top_tag_count / len(cluster_df) if len(cluster_df) > 0 else 0
-        
-        tag_stats[int(cluster_id)] = {
-            "top_tags": [[str(t), int(c)] for t, c in sorted_tags[:10]],
-            "tag_coverage": float(coverage),
-            "unique_tags": len(tag_counts),
-            "cluster_size": len(cluster_df)
+    pairs = pd.DataFrame({
+        "cluster": labels[clustered],
+        "tag": df["tags"].to_numpy()[clustered],
+    }).explode("tag").dropna(subset=["tag"])
+    counts = (
+        pairs.groupby(["cluster", "tag"], sort=False).size().rename("count").reset_index()
+        .sort_values(["cluster", "count"], ascending=[True, False], kind="stable")
+    )
+    unique_tags = counts.groupby("cluster").size()
+    top_counts = counts.groupby("cluster")["count"].max()
+    
+    tag_stats = {}
+    for cluster_id in cluster_ids.tolist():
+        size = int(cluster_sizes[cluster_id])
+        tag_stats[cluster_id] = {
+            "top_tags": [],
+            "tag_coverage": float(top_counts.get(cluster_id, 0) / size),
+            "unique_tags": int(unique_tags.get(cluster_id, 0)),
+            "cluster_size": size
         }
+    top_tags = counts.groupby("cluster").head(10)
+    for cluster_id, tag, count in zip(top_tags["cluster"].tolist(), top_tags["tag"].tolist(), top_tags["count"].tolist()):
+        tag_stats[cluster_id]["top_tags"].append([str(tag), int(count)])
     
     return tag_stats
 
-def generate_labels_from_tags_and_messages(representatives, tag_stats):
-    """Generate cluster labels from top tags and representative messages."""
+def get_cluster_keywords(df, labels, n_keywords=KEYWORDS_PER_CLUSTER):
+    """Top keywords per cluster by class-based TF-IDF over members' first messages.
+    
+    Member term counts are summed into one row per cluster with a sparse
+    indicator product, then weighted: term frequency within the cluster times
+    log(1 + average cluster word count / term frequency across clusters).
+    Each cluster's top terms come from one lexsort over the sparse scores.
+    """
+    from scipy import sparse
+    from sklearn.feature_extraction.text import CountVectorizer
+    
+    clustered = np.flatnonzero(labels != -1)
+    cluster_ids, rows = np.unique(labels[clustered], return_inverse=True)
+    keywords = {int(cluster_id): [] for cluster_id in cluster_ids}
+    if len(clustered) == 0:
+        return keywords
+    
+    texts = df["first_message"].iloc[clustered].fillna("").str[:KEYWORD_MESSAGE_CHARS]
+    vectorizer = CountVectorizer(token_pattern=r"(?u)\b\w{4,}\b", stop_words=sorted(LABEL_STOP_WORDS))
+    try:
+        doc_terms = vectorizer.fit_transform(texts)
+    except ValueError:  # No words left after filtering
+        return keywords
+    
+    membership = sparse.csr_matrix((np.ones(len(clustered)), (rows, np.arange(len(clustered)))),
+                                   shape=(len(cluster_ids), len(clustered)))
+    class_terms = (membership @ doc_terms).tocsr().astype(np.float64)
+    words_per_class = np.asarray(class_terms.sum(axis=1)).ravel()
+    term_totals = np.asarray(class_terms.sum(axis=0)).ravel()
+    idf = np.log(1 + words_per_class.mean() / np.maximum(term_totals, 1))
+    scores = sparse.diags(1 / np.maximum(words_per_class, 1)) @ class_terms @ sparse.diags(idf)
+    scores = scores.tocsr()
+    scores.sort_indices()
+    
+    # Order every stored score by (cluster, score desc, term) and keep each cluster's first n
+    class_of = np.repeat(np.arange(scores.shape[0]), np.diff(scores.indptr))
+    order = np.lexsort((scores.indices, -scores.data, class_of))
+    rank = np.arange(len(order)) - scores.indptr[class_of[order]]
+    keep = order[rank < n_keywords]
+    vocab = vectorizer.get_feature_names_out()
+    for class_index, term in zip(class_of[keep].tolist(), scores.indices[keep].tolist()):
+        keywords[int(cluster_ids[class_index])].append(str(vocab[term]))
+    return keywords
+
+def generate_labels_from_tags_and_messages(representatives, tag_stats, keywords):
+    """Generate cluster labels from top tags, falling back to c-TF-IDF keywords."""
     print("\nGenerating cluster labels from tags and keywords...")
     
     labels = {}
@@ -205,56 +683,34 @@ def generate_labels_from_tags_and_messages(representatives, tag_stats):
         
         if top_tags and top_tags[0][1] > 5:  # If top tag has more than 5 occurrences
             label = top_tags[0][0].replace("_", " ").title()
+        elif keywords.get(cluster_id):
+            label = " ".join(w.title() for w in keywords[cluster_id][:2])
         else:
-            # Extract keywords from representative messages
-            messages = representatives[cluster_id]["messages"]
-            words = []
-            for msg in messages[:3]:  # First 3 messages
-                # Simple keyword extraction
-                msg_words = msg[:200].lower().split()
-                # Filter common words
-                stop_words = {'the', 'a', 'an', 'is', 'was', 'are', 'were', 'i', 'you', 'my', 'your', 'to', 'for', 'of', 'and', 'in', 'on', 'with', 'this', 'that', 'it', 'be', 'have', 'has', 'had', 'can', 'would', 'like', 'just', 'if', 'me', 'we', 'us', 'as', 'at', 'but', 'not', 'so', 'do', 'does', 'did', 'will', 'when', 'what', 'how', 'all', 'from'}
-                for w in msg_words:
-                    w = ''.join(c for c in w if c.isalnum())
-                    if len(w) > 3 and w not in stop_words:
-                        words.append(w)
-            
-            if words:
-                # Get most common word
-                from collections import Counter
-                common = Counter(words).most_common(2)
-                label = " ".join(w[0].title() for w in common)
-            else:
-                label = f"Cluster {cluster_id}"
+            label = f"Cluster {cluster_id}"
         
         labels[cluster_id] = label
         print(f"  Cluster {cluster_id}: {label}")
     
     return labels
 
-def calculate_assignments(df, labels, embeddings):
+def calculate_assignments(df, labels, embeddings, geometry=None):
     """Calculate cluster assignments with distance to centroid."""
     print("\nCalculating cluster assignments...")
     
-    assignments = {}
-    unique_labels = sorted(set(labels[labels != -1]))
-    
-    # Pre-calculate centroids
-    centroids = {}
-    for cluster_id in unique_labels:
-        mask = labels == cluster_id
-        centroids[cluster_id] = embeddings[mask].mean(axis=0)
+    if geometry is None:
+        geometry = compute_cluster_geometry(labels, embeddings)
     
-    for i, (conv_id, cluster_id) in enumerate(zip(df["conversation_id"], labels)):
+    assignments = {}
+    for conv_id, cluster_id, dist in zip(df["conversation_id"], labels.tolist(), geometry["distances"].tolist()):
         if cluster_id == -1:
             assignments[conv_id] = {"cluster_id": -1, "distance_to_centroid": None}
         else:
-            dist = float(euclidean_distances([embeddings[i]], [centroids[cluster_id]])[0][0])
-            assignments[conv_id] = {"cluster_id": int(cluster_id), "distance_to_centroid": dist}
+            assignments[conv_id] = {"cluster_id": cluster_id, "distance_to_centroid": dist}
     
     return assignments
 
-def save_outputs(version_dir, assignments, cluster_labels, representatives, tag_stats, metrics, params, pca_variance):
+def save_outputs(version_dir, assignments, cluster_labels, representatives, tag_stats, metrics, params, pca_variance, parquet=False,
+                 pca_method="PCA", keywords=None, algorithm="hdbscan"):
     """Save all output files."""
     print(f"\nSaving outputs to {version_dir}...")
     
@@ -265,6 +721,15 @@ def save_outputs(version_dir, assignments, cluster_labels, representatives, tag_
         json.dump(assignments, f)
     print(f"  Saved {len(assignments)} assignments")
     
+    if parquet:
+        # One row per conversation, sorted by cluster for predicate pushdown
+        write_parquet(
+            [{"conversation_id": conv_id, **a} for conv_id, a in assignments.items()],
+            version_dir / "assignments.parquet",
+            sort_by="cluster_id",
+        )
+        print(f"  Saved assignments.parquet")
+    
     # Build labels file with full cluster info
     labels_data = {"clusters": []}
     for cluster_id in sorted(cluster_labels.keys()):
@@ -277,7 +742,8 @@ def save_outputs(version_dir, assignments, cluster_labels, representatives, tag_
             "size": tags["cluster_size"],
             "representative_messages": rep["messages"],
             "top_existing_tags": tags["top_tags"][:5],
-            "tag_coverage": tags["tag_coverage"]
+            "tag_coverage": tags["tag_coverage"],
+            "keywords": (keywords or {}).get(cluster_id, [])
         })
     
     with open(version_dir / "labels.json", "w") as f:
@@ -286,16 +752,17 @@ def save_outputs(version_dir, assignments, cluster_labels, representatives, tag_
     
     # Save metrics
     metrics_data = {
-        "algorithm": "hdbscan",
+        "algorithm": algorithm,
         "parameters": params,
         "num_clusters": metrics["num_clusters"],
         "noise_points": metrics["noise_points"],
         "silhouette_score": metrics["silhouette_score"],
+        "silhouette_method": metrics["silhouette_method"],
         "noise_pct": metrics["noise_pct"],
         "largest_cluster_pct": metrics["largest_cluster_pct"],
         "cluster_sizes": metrics["cluster_sizes"],
         "dimensionality_reduction": {
-            "method": "PCA",
+            "method": pca_method,
             "original_dims": 1536,
             "reduced_dims": PCA_DIMS,
             "variance_explained": pca_variance
@@ -307,24 +774,136 @@ def save_outputs(version_dir, assignments, cluster_labels, representatives, tag_
         json.dump(metrics_data, f, indent=2)
     print(f"  Saved metrics")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cluster support conversations into natural topics.")
+    parser.add_argument("--parquet", action="store_true",
+                        help="Also write assignments.parquet (zstd) next to assignments.json")
+    parser.add_argument("--mode", choices=["full", "two-stage"], default="full",
+                        help="HDBSCAN on every point, or on MiniBatchKMeans micro-clusters mapped back to conversations")
+    parser.add_argument("--micro-clusters", type=int, default=MICRO_CLUSTERS,
+                        help="Micro-clusters for --mode two-stage")
+    parser.add_argument("--micro-batch-size", type=int, default=MICRO_BATCH_SIZE,
+                        help="Rows per MiniBatchKMeans batch for --mode two-stage")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Grid-search --min-cluster-sizes x --min-samples with the shared-tree sweep engine")
+    parser.add_argument("--min-cluster-sizes", type=lambda v: [int(x) for x in v.split(",")], default=[50, 30, 100],
+                        help="Comma-separated min_cluster_size values for --sweep")
+    parser.add_argument("--min-samples", type=lambda v: [int(x) for x in v.split(",")], default=[10, 5, 15],
+                        help="Comma-separated min_samples values for --sweep")
+    parser.add_argument("--sweep-workers", type=int, default=None,
+                        help="Worker processes for --sweep (default: one per min_samples value, up to CPU count)")
+    parser.add_argument("--silhouette", choices=["auto", "exact", "sampled"], default="auto",
+                        help="Silhouette scoring: exact (chunked), stratified sample with bootstrap CI, or auto")
+    parser.add_argument("--silhouette-sample-size", type=int, default=SILHOUETTE_SAMPLE_SIZE,
+                        help="Points scored in sampled silhouette mode")
+    parser.add_argument("--silhouette-memory-mb", type=int, default=SILHOUETTE_MEMORY_MB,
+                        help="Memory budget for silhouette distance chunks (MB)")
+    parser.add_argument("--pca", choices=["full", "incremental"], default="full",
+                        help="Fit PCA in memory or stream batches through IncrementalPCA")
+    parser.add_argument("--pca-batch-size", type=int, default=PCA_BATCH_SIZE,
+                        help="Rows per batch for incremental PCA and projection")
+    parser.add_argument("--reuse-projection", type=Path, nargs="?", const=ARTIFACTS_DIR / "latest" / PROJECTION_FILENAME,
+                        help=f"Transform with a saved projection instead of refitting (default: latest/{PROJECTION_FILENAME})")
+    parser.add_argument("--embedding-store", choices=STORE_KINDS, default="float32",
+                        help="Read embeddings from a float16/int8 quantized store, or only the saved PCA-reduced matrix")
+    parser.add_argument("--ann-pq-subspaces", type=int, default=0,
+                        help=f"Product-quantize {INDEX_FILENAME} into this many subspaces (must divide the PCA dims; 0 stores flat vectors)")
+    parser.add_argument("--trace", type=Path,
+                        help="Append per-stage timing and memory records to this JSONL file and print a stage table")
+    parser.add_argument("--trace-allocations", action="store_true",
+                        help="Also record each stage's peak Python/NumPy allocations (tracemalloc; slower)")
+    parser.add_argument("--force", action="store_true",
+                        help="Recluster even if a cached run has the same inputs and parameters")
+    args = parser.parse_args()
+    if args.sweep and args.mode == "two-stage":
+        parser.error("--sweep runs on every point; it can't be combined with --mode two-stage")
+    return args
+
 def main():
-    # Load data
-    df = load_embeddings()
-    embeddings_full = np.array(df["embedding"].tolist())
-    
-    # Reduce dimensions for faster clustering
-    embeddings, pca_variance = reduce_dimensions(embeddings_full)
-    
-    # Iteration tracking
-    iterations = []
-    max_iterations = 3
+    args = parse_args()
+    recorder = StageRecorder("cluster_analysis", trace_path=args.trace, track_allocations=args.trace_allocations)
     
     # Starting parameters - adjusted for the dataset
+    max_iterations = 3
     param_sets = [
         {"min_cluster_size": 50, "min_samples": 10},
         {"min_cluster_size": 30, "min_samples": 5},
         {"min_cluster_size": 100, "min_samples": 15},
     ]
+    if args.sweep:
+        param_sets = [
+            {"min_cluster_size": size, "min_samples": samples}
+            for samples in args.min_samples
+            for size in args.min_cluster_sizes
+        ]
+        max_iterations = len(param_sets)
+    
+    # Skip the run entirely when the embeddings, code and every setting that
+    # shapes the outputs match a cached run
+    cache = ArtifactCache(ARTIFACTS_DIR, "cluster_analysis")
+    inputs = [EMBEDDINGS_PATH, Path(__file__)] + [SCRIPT_DIR / name for name in CODE_DEPENDENCIES]
+    if args.reuse_projection:
+        inputs.append(args.reuse_projection)
+    cache_key, manifest = cache.key(inputs, params={
+        "param_sets": param_sets,
+        "pca_dims": PCA_DIMS,
+        "pca": args.pca,
+        "pca_batch_size": args.pca_batch_size,
+        "reuse_projection": bool(args.reuse_projection),
+        "embedding_store": args.embedding_store,
+        "mode": args.mode,
+        "micro_clusters": args.micro_clusters,
+        "micro_batch_size": args.micro_batch_size,
+        "sweep": args.sweep,
+        "silhouette": args.silhouette,
+        "silhouette_sample_size": args.silhouette_sample_size,
+        "silhouette_memory_mb": args.silhouette_memory_mb,
+        "keywords_per_cluster": KEYWORDS_PER_CLUSTER,
+        "ann_pq_subspaces": args.ann_pq_subspaces,
+        "parquet": args.parquet,
+    })
+    if not args.force and cache.lookup(cache_key) is not None:
+        cache.publish(cache_key)
+        print(f"Inputs and parameters unchanged; reusing {ARTIFACTS_DIR / cache_key}")
+        print(f"Updated symlink: latest -> {cache_key}")
+        return 0
+    
+    # Load data
+    reused_projection = load_projection(args.reuse_projection) if args.reuse_projection else None
+    pca_params = reduction_params(args.pca, args.pca_batch_size, reused_projection)
+    with recorder.stage("load_embeddings") as stage:
+        df = load_embeddings()
+        embeddings_full, embeddings, projection = load_embedding_store(args.embedding_store, pca_params=pca_params)
+        stage["rows"] = len(df)
+    
+    # Reduce dimensions for faster clustering
+    if embeddings is None:
+        with recorder.stage("reduce_dimensions", rows=len(df)):
+            embeddings, pca_variance, projection = reduce_dimensions(
+                embeddings_full,
+                method=args.pca,
+                batch_size=args.pca_batch_size,
+                projection=reused_projection,
+            )
+            if args.embedding_store == "reduced":
+                save_reduced(embeddings, projection, pca_params)
+    else:
+        pca_variance = float(projection["explained_variance_ratio"].sum())
+    
+    # Iteration tracking
+    iterations = []
+    
+    # Wider grid with all clusterings computed up front by the sweep engine
+    labels_by_params = None
+    if args.sweep:
+        with recorder.stage("sweep_clustering", rows=len(embeddings)):
+            labels_by_params = sweep_clustering(embeddings, param_sets, workers=args.sweep_workers)
+    
+    # Two-stage mode compresses once and reruns only the cheap HDBSCAN stage per parameter set
+    micro = None
+    if args.mode == "two-stage":
+        with recorder.stage("micro_cluster", rows=len(embeddings)):
+            micro = micro_cluster(embeddings, n_micro=args.micro_clusters, batch_size=args.micro_batch_size)
     
     best_metrics = None
     best_labels = None
@@ -339,15 +918,31 @@ def main():
         print(f"ITERATION {i+1}/{max_iterations}")
         print(f"{'='*60}")
         
-        # Run clustering
-        labels, clusterer = run_clustering(
-            embeddings, 
-            min_cluster_size=params["min_cluster_size"],
-            min_samples=params["min_samples"]
-        )
+        # Run clustering (or pick up the sweep result)
+        if labels_by_params is not None:
+            labels = labels_by_params[(params["min_cluster_size"], params["min_samples"])]
+            n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
+            print(f"Sweep result for min_cluster_size={params['min_cluster_size']}, "
+                  f"min_samples={params['min_samples']}: {n_clusters} clusters")
+        elif micro is not None:
+            with recorder.stage(f"cluster_{i+1}", rows=len(micro[0])):
+                labels, clusterer = run_two_stage_clustering(
+                    micro,
+                    min_cluster_size=params["min_cluster_size"],
+                    min_samples=params["min_samples"]
+                )
+        else:
+            with recorder.stage(f"cluster_{i+1}", rows=len(embeddings)):
+                labels, clusterer = run_clustering(
+                    embeddings, 
+                    min_cluster_size=params["min_cluster_size"],
+                    min_samples=params["min_samples"]
+                )
         
         # Calculate metrics
-        metrics = calculate_metrics(embeddings, labels)
+        with recorder.stage(f"metrics_{i+1}", rows=len(labels)):
+            metrics = calculate_metrics(embeddings, labels, args.silhouette,
+                                        args.silhouette_sample_size, args.silhouette_memory_mb)
         
         # Check quality gates
         passed, issues = check_quality_gates(metrics)
@@ -385,31 +980,60 @@ def main():
     metrics = best_metrics
     
     # Get representatives (use reduced embeddings)
-    representatives = get_cluster_representatives(df, labels, embeddings)
+    with recorder.stage("representatives", rows=len(labels)):
+        geometry = compute_cluster_geometry(labels, embeddings)
+        representatives = get_cluster_representatives(df, labels, embeddings, geometry=geometry)
     
     # Get tag distribution
-    tag_stats = get_tag_distribution_per_cluster(df, labels)
+    with recorder.stage("tag_distribution", rows=len(labels)):
+        tag_stats = get_tag_distribution_per_cluster(df, labels)
     
     # Generate labels from tags and keywords
-    cluster_labels = generate_labels_from_tags_and_messages(representatives, tag_stats)
+    with recorder.stage("labels", rows=len(labels)):
+        keywords = get_cluster_keywords(df, labels)
+        cluster_labels = generate_labels_from_tags_and_messages(representatives, tag_stats, keywords)
     
     # Calculate assignments (use reduced embeddings for consistent distances)
-    assignments = calculate_assignments(df, labels, embeddings)
+    with recorder.stage("assignments", rows=len(labels)):
+        assignments = calculate_assignments(df, labels, embeddings, geometry=geometry)
+    
+    # Save outputs to a staging directory that becomes the cache entry
+    version_dir = cache.begin(cache_key)
+    with recorder.stage("save_outputs", rows=len(assignments)):
+        save_outputs(version_dir, assignments, cluster_labels, representatives, tag_stats, metrics, params, pca_variance,
+                     parquet=args.parquet, pca_method=str(projection["method"]), keywords=keywords,
+                     algorithm="hdbscan" if micro is None else f"two-stage (minibatch-kmeans x{len(micro[0])} + hdbscan)")
+        
+        # Save the fitted projection for later runs and new conversations
+        save_projection(version_dir / PROJECTION_FILENAME, projection)
+    
+    # Save the compact model cluster_assign.py uses to label new conversations
+    with recorder.stage("cluster_model", rows=len(labels)):
+        save_cluster_model(version_dir / MODEL_FILENAME,
+                           build_cluster_model(embeddings, labels, geometry, projection, params["min_samples"]))
+    print(f"  Saved {MODEL_FILENAME}")
     
-    # Save outputs
-    version_dir = ARTIFACTS_DIR / "v1"
-    save_outputs(version_dir, assignments, cluster_labels, representatives, tag_stats, metrics, params, pca_variance)
+    # Save the nearest-neighbour index for similar-conversation lookups
+    with recorder.stage("ann_index", rows=len(labels)):
+        AnnIndex.build(embeddings, labels, geometry, df["conversation_id"].to_numpy(),
+                       pq_subspaces=args.ann_pq_subspaces).save(version_dir / INDEX_FILENAME)
+    print(f"  Saved {INDEX_FILENAME}")
     
     # Save iterations log
     with open(version_dir / "iterations.json", "w") as f:
         json.dump(iterations, f, indent=2)
     
-    # Create latest symlink
-    latest_link = ARTIFACTS_DIR / "latest"
-    if latest_link.exists() or latest_link.is_symlink():
-        latest_link.unlink()
-    latest_link.symlink_to("v1")
-    print(f"\nCreated symlink: latest -> v1")
+    # Add stage timings to metrics.json now that every stage has run
+    with open(version_dir / "metrics.json") as f:
+        metrics_data = json.load(f)
+    metrics_data["performance"] = recorder.summary()
+    with open(version_dir / "metrics.json", "w") as f:
+        json.dump(metrics_data, f, indent=2)
+    
+    # Move the outputs into place and point latest at them
+    version_dir = cache.commit(cache_key, manifest)
+    print(f"\nSaved {version_dir}")
+    print(f"Updated symlink: latest -> {cache_key}")
     
     print(f"\n{'='*60}")
     print("SUMMARY")
@@ -425,6 +1049,9 @@ def main():
         label = cluster_labels.get(int(cluster_id), f"Cluster {cluster_id}")
         print(f"  {cluster_id}: {label} ({size} conversations)")
     
+    if args.trace:
+        recorder.print_summary()
+    
     return 0 if best_metrics else 1
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Cluster Assign - place new conversations into existing clusters
+
+cluster_analysis.py saves a compact cluster model (cluster_model.npz) next
+to its other outputs: the PCA projection, cluster centroids, per-cluster
+distance thresholds and a set of exemplar points with their HDBSCAN core
+distances. assign() labels a new batch of embeddings in milliseconds,
+returning the same shape as assignments.json, without rerunning clustering.
+
+    python3 scripts/cluster_assign.py new-conversations.parquet -o new-assignments.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+import numpy as np
+
+ARTIFACTS_DIR = Path("artifacts/phase-0/clusters")
+MODEL_FILENAME = "cluster_model.npz"
+
+MAX_EXEMPLARS_PER_CLUSTER = 200
+THRESHOLD_PERCENTILE = 95  # Members farther than this from their centroid are treated as the cluster's edge
+ASSIGN_BATCH_SIZE = 4096
+
+def _pairwise_distances(a, b):
+    sq = (a ** 2).sum(axis=1)[:, None] + (b ** 2).sum(axis=1)[None, :] - 2 * a @ b.T
+    return np.sqrt(np.maximum(sq, 0))
+
+def build_cluster_model(embeddings, labels, geometry, projection, min_samples, seed=42):
+    """Collect what assign() needs from a finished clustering run.
+
+    embeddings are the reduced (post-PCA) vectors the clustering ran on and
+    geometry the output of compute_cluster_geometry(), whose label-sorted
+    row order gives each cluster's members as one slice. Exemplars are a
+    per-cluster random sample; their core distances are measured among the
+    exemplars, the same reference set ClusterModel.predict() uses for new
+    points.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    rng = np.random.default_rng(seed)
+    cluster_ids = geometry["cluster_ids"]
+    order, starts, sizes = geometry["order"], geometry["starts"], geometry["sizes"]
+
+    thresholds = []
+    exemplar_rows = []
+    for start, size in zip(starts, sizes):
+        members = order[start:start + size]
+        thresholds.append(np.percentile(geometry["distances"][members], THRESHOLD_PERCENTILE))
+        take = min(size, MAX_EXEMPLARS_PER_CLUSTER)
+        exemplar_rows.append(np.sort(rng.choice(members, size=take, replace=False)))
+    thresholds = np.array(thresholds)
+    exemplar_rows = np.concatenate(exemplar_rows) if exemplar_rows else np.empty(0, dtype=np.int64)
+
+    exemplars = np.asarray(embeddings[exemplar_rows], dtype=np.float32)
+    if len(exemplars):
+        # min_samples counts the point itself, as in sklearn's HDBSCAN
+        neighbours = NearestNeighbors(n_neighbors=min(min_samples, len(exemplars))).fit(exemplars)
+        core_distances = neighbours.kneighbors(exemplars)[0][:, -1].astype(np.float32)
+    else:
+        core_distances = np.empty(0, dtype=np.float32)
+
+    return {
+        "components": projection["components"],
+        "mean": projection["mean"],
+        "cluster_ids": cluster_ids.astype(np.int64),
+        "centroids": geometry["centroids"].astype(np.float32),
+        "thresholds": thresholds.astype(np.float32),
+        "exemplars": exemplars,
+        "exemplar_labels": labels[exemplar_rows].astype(np.int64),
+        "exemplar_core_distances": core_distances,
+        "min_samples": np.array(min_samples),
+    }
+
+def save_cluster_model(path, model):
+    np.savez(path, **model)
+
+class ClusterModel:
+    """Approximate HDBSCAN prediction for new points.
+
+    Like hdbscan's approximate_predict, a new point takes the label of its
+    nearest exemplar under mutual reachability distance
+    max(d(x, e), core(x), core(e)). Core distances follow sklearn's
+    convention, where min_samples counts the point itself: core(x) is the
+    distance to its (min_samples - 1)-th nearest exemplar, and core(e) was
+    measured among the exemplars the same way. Points beyond their
+    cluster's THRESHOLD_PERCENTILE distance to centroid are noise.
+    """
+
+    def __init__(self, arrays):
+        self.components = arrays["components"]
+        self.mean = arrays["mean"]
+        self.cluster_ids = arrays["cluster_ids"]
+        self.centroids = arrays["centroids"]
+        self.thresholds = arrays["thresholds"]
+        self.exemplars = arrays["exemplars"]
+        self.exemplar_labels = arrays["exemplar_labels"]
+        self.exemplar_core_distances = arrays["exemplar_core_distances"]
+        self.min_samples = int(arrays["min_samples"])
+
+    @classmethod
+    def load(cls, path=ARTIFACTS_DIR / "latest" / MODEL_FILENAME):
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def predict(self, embeddings):
+        """(labels, distance_to_centroid) for raw embeddings; noise is -1 with NaN distance."""
+        labels = np.full(len(embeddings), -1, dtype=np.int64)
+        distances = np.full(len(embeddings), np.nan)
+        if len(self.exemplars) == 0:
+            return labels, distances
+
+        # The point itself is the first of its min_samples neighbours
+        k = min(self.min_samples - 1, len(self.exemplars)) - 1
+        centroid_index = {int(c): i for i, c in enumerate(self.cluster_ids)}
+        for start in range(0, len(embeddings), ASSIGN_BATCH_SIZE):
+            batch = np.asarray(embeddings[start:start + ASSIGN_BATCH_SIZE], dtype=np.float32)
+            reduced = (batch - self.mean) @ self.components.T
+
+            dists = _pairwise_distances(reduced, self.exemplars)
+            core = np.partition(dists, k, axis=1)[:, k] if k >= 0 else np.zeros(len(batch))
+            reachability = np.maximum(dists, np.maximum(core[:, None], self.exemplar_core_distances[None, :]))
+            nearest = self.exemplar_labels[reachability.argmin(axis=1)]
+
+            rows = np.array([centroid_index[int(label)] for label in nearest])
+            to_centroid = np.linalg.norm(reduced - self.centroids[rows], axis=1)
+            inside = to_centroid <= self.thresholds[rows]
+
+            labels[start:start + len(batch)] = np.where(inside, nearest, -1)
+            distances[start:start + len(batch)] = np.where(inside, to_centroid, np.nan)
+        return labels, distances
+
+    def assign(self, embeddings, conversation_ids):
+        """Assignments for new conversations, shaped like assignments.json."""
+        labels, distances = self.predict(embeddings)
+        return {
+            conv_id: {
+                "cluster_id": int(label),
+                "distance_to_centroid": None if label == -1 else float(dist),
+            }
+            for conv_id, label, dist in zip(conversation_ids, labels.tolist(), distances.tolist())
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("embeddings", type=Path, help="Parquet file with conversation_id and embedding columns")
+    parser.add_argument("--model", type=Path, default=ARTIFACTS_DIR / "latest" / MODEL_FILENAME)
+    parser.add_argument("-o", "--output", type=Path, help="Write assignments JSON here instead of stdout")
+    args = parser.parse_args()
+
+    import pyarrow.parquet as pq
+    from cluster_analysis import load_embedding_matrix
+
+    model = ClusterModel.load(args.model)
+    conversation_ids = pq.read_table(args.embeddings, columns=["conversation_id"]).column(0).to_pylist()
+    assignments = model.assign(load_embedding_matrix(args.embeddings), conversation_ids)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(assignments, f)
+        print(f"Assigned {len(assignments)} conversations -> {args.output}", file=sys.stderr)
+    else:
+        json.dump(assignments, sys.stdout)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Columnar Output - Parquet copies of the FAQ mining artifacts
+
+Writes records (lists of flat dicts) as zstd-compressed Parquet so consumers
+can read single columns or filter rows without parsing a whole JSON file,
+e.g. with DuckDB:
+
+    SELECT cluster_id FROM 'assignments.parquet' WHERE conversation_id = 'cnv_123'
+
+The JSON artifacts are still written as before; these files sit next to them.
+"""
+
+from pathlib import Path
+
+ROW_GROUP_SIZE = 100_000  # Min/max stats per row group drive predicate pushdown
+
+def write_parquet(records: list, path: Path, sort_by: str = None) -> Path:
+    """Write records to a zstd-compressed Parquet file.
+
+    Sorting by the column consumers filter on keeps row group statistics
+    tight, so readers can skip most of the file.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise SystemExit("Parquet output requires pyarrow (pip install pyarrow)") from e
+
+    if sort_by is not None:
+        records = sorted(records, key=lambda r: (r[sort_by] is None, r[sort_by]))
+    table = pa.Table.from_pylist(records)
+    pq.write_table(table, path, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    return path
+
+def copy_parquet(conn, query: str, path: Path) -> Path:
+    """Write a DuckDB query's result to a zstd-compressed Parquet file.
+
+    For results too large to hold as records: DuckDB streams them straight
+    to disk. ORDER BY the column consumers filter on, as with write_parquet.
+    """
+    conn.execute(f"""
+    COPY ({query}) TO '{str(path).replace("'", "''")}'
+    (FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE {ROW_GROUP_SIZE})
+    """)
+    return path
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Embedding Store - compact on-disk copies of the conversation embeddings
+
+Besides the float32 sidecar cluster_analysis.py already caches next to
+conversations.parquet, the embeddings can be kept as:
+  - float16: half precision, 2x smaller
+  - int8: per-row scalar quantization (one float32 scale per row), 4x smaller
+  - reduced: only the PCA-reduced float32 matrix plus the projection and PCA
+    settings that produced it, about 30x smaller; clustering skips PCA
+    entirely when the settings match
+
+cluster_analysis.py --embedding-store <kind> reads (and on first use
+writes) the store. The report command measures how far each store moves
+the cluster labels from a float64 baseline (adjusted Rand index):
+
+    python3 scripts/embedding_store.py build --kind int8
+    python3 scripts/embedding_store.py report --min-cluster-size 50 --min-samples 10
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+import numpy as np
+
+EMBEDDINGS_PATH = Path("artifacts/phase-0/embeddings/latest/conversations.parquet")
+# Outside the cluster cache entries, which stay as cluster_analysis.py wrote them
+REPORT_PATH = Path("artifacts/phase-0/reports/quantization_report.json")
+
+STORE_KINDS = ["float32", "float16", "int8", "reduced"]
+STORE_SUFFIXES = {
+    "float16": ".embedding.f16.npy",
+    "int8": ".embedding.i8.npy",
+    "reduced": ".embedding.reduced.npz",
+}
+INT8_SCALE_SUFFIX = ".embedding.i8.scale.npy"
+INT8_MAX = 127
+BATCH_SIZE = 10_000
+
+def store_path(kind, embeddings_path=EMBEDDINGS_PATH):
+    return embeddings_path.with_suffix(STORE_SUFFIXES[kind])
+
+def _is_fresh(path, embeddings_path):
+    return path.exists() and path.stat().st_mtime >= embeddings_path.stat().st_mtime
+
+def quantize_int8(block):
+    """Symmetric per-row int8 codes and the float32 scale that restores each row."""
+    block = np.asarray(block, dtype=np.float32)
+    scales = np.abs(block).max(axis=1) / INT8_MAX
+    scales[scales == 0] = 1.0
+    codes = np.rint(block / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+class Int8Matrix:
+    """Read-only (n, dims) view over int8 codes that dequantizes to float32 on access.
+
+    Slicing returns float32 rows, so it drops into the batched PCA and
+    projection code in place of a memory-mapped float32 matrix.
+    """
+
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, codes, scales):
+        self.codes = codes
+        self.scales = scales
+        self.shape = codes.shape
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        return self.codes[rows].astype(np.float32) * self.scales[rows][..., None]
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = np.empty(self.shape, dtype=np.float32)
+        for start in range(0, self.shape[0], BATCH_SIZE):
+            matrix[start:start + BATCH_SIZE] = self[start:start + BATCH_SIZE]
+        return matrix if dtype is None else matrix.astype(dtype, copy=False)
+
+def write_store(kind, matrix, embeddings_path=EMBEDDINGS_PATH):
+    """Quantize a float32 (n, dims) matrix into a float16 or int8 store, batch by batch."""
+    path = store_path(kind, embeddings_path)
+    n_rows, dims = matrix.shape
+    if kind == "float16":
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float16, shape=(n_rows, dims))
+        for start in range(0, n_rows, BATCH_SIZE):
+            out[start:start + BATCH_SIZE] = matrix[start:start + BATCH_SIZE]
+        out.flush()
+    elif kind == "int8":
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.int8, shape=(n_rows, dims))
+        scales = np.empty(n_rows, dtype=np.float32)
+        for start in range(0, n_rows, BATCH_SIZE):
+            out[start:start + BATCH_SIZE], scales[start:start + BATCH_SIZE] = quantize_int8(matrix[start:start + BATCH_SIZE])
+        out.flush()
+        np.save(embeddings_path.with_suffix(INT8_SCALE_SUFFIX), scales)
+    else:
+        raise ValueError(f"Unsupported store kind: {kind}")
+    return path
+
+def load_store(kind, embeddings_path=EMBEDDINGS_PATH):
+    """Memory-map a float16 or int8 store, or None if it's missing or older than the parquet."""
+    path = store_path(kind, embeddings_path)
+    if not _is_fresh(path, embeddings_path):
+        return None
+    if kind == "float16":
+        return np.load(path, mmap_mode="r")
+    scale_path = embeddings_path.with_suffix(INT8_SCALE_SUFFIX)
+    if not _is_fresh(scale_path, embeddings_path):
+        return None
+    return Int8Matrix(np.load(path, mmap_mode="r"), np.load(scale_path))
+
+def save_reduced(reduced, projection, params, embeddings_path=EMBEDDINGS_PATH):
+    """Persist the PCA-reduced matrix with the projection and PCA params that produced it."""
+    path = store_path("reduced", embeddings_path)
+    np.savez(path, reduced=np.asarray(reduced, dtype=np.float32), params=np.array(json.dumps(params, sort_keys=True)),
+             **{f"projection_{key}": value for key, value in projection.items()})
+    return path
+
+def load_reduced(params, embeddings_path=EMBEDDINGS_PATH):
+    """(reduced, projection) from the reduced store, or None if missing, stale or saved with other PCA params."""
+    path = store_path("reduced", embeddings_path)
+    if not _is_fresh(path, embeddings_path):
+        return None
+    with np.load(path) as data:
+        if "params" not in data.files or str(data["params"]) != json.dumps(params, sort_keys=True):
+            return None
+        projection = {key[len("projection_"):]: data[key] for key in data.files if key.startswith("projection_")}
+        return data["reduced"], projection
+
+def store_nbytes(kind, embeddings_path=EMBEDDINGS_PATH):
+    if kind == "float32":
+        from cluster_analysis import embedding_cache_path
+        return embedding_cache_path(embeddings_path).stat().st_size
+    size = store_path(kind, embeddings_path).stat().st_size
+    if kind == "int8":
+        size += embeddings_path.with_suffix(INT8_SCALE_SUFFIX).stat().st_size
+    return size
+
+def quantization_report(min_cluster_size=50, min_samples=10, embeddings_path=EMBEDDINGS_PATH):
+    """Cluster every store with the same parameters and compare labels to a float64 baseline."""
+    from sklearn.metrics import adjusted_rand_score
+    from cluster_analysis import (
+        load_embedding_store, read_embedding_column, reduce_dimensions, reduction_params, run_clustering,
+    )
+
+    def cluster(reduced):
+        labels, _ = run_clustering(reduced, min_cluster_size=min_cluster_size, min_samples=min_samples)
+        return labels
+
+    # Read from the parquet file (not the float32 sidecar) and fitted,
+    # projected and clustered in double precision throughout
+    baseline = read_embedding_column(embeddings_path, dtype=np.float64)
+    baseline_labels = cluster(reduce_dimensions(baseline, dtype=np.float64)[0])
+
+    stores = []
+    for kind in STORE_KINDS:
+        started = time.perf_counter()
+        matrix, reduced, _ = load_embedding_store(kind, embeddings_path)
+        if reduced is None:
+            reduced, _, projection = reduce_dimensions(matrix)
+            if kind == "reduced":
+                save_reduced(reduced, projection, reduction_params(), embeddings_path)
+                matrix = None
+        labels = cluster(reduced)
+        entry = {
+            "kind": kind,
+            "bytes": store_nbytes(kind, embeddings_path),
+            "ari_vs_float64": float(adjusted_rand_score(baseline_labels, labels)),
+            "num_clusters": int(len(set(labels)) - (1 if -1 in labels else 0)),
+            "noise_pct": float((labels == -1).mean() * 100),
+            "seconds": time.perf_counter() - started,
+        }
+        if matrix is not None:
+            restored = np.asarray(matrix, dtype=np.float64)
+            entry["relative_error"] = float(np.linalg.norm(restored - baseline) / np.linalg.norm(baseline))
+        stores.append(entry)
+
+    float32_bytes = stores[0]["bytes"]
+    for entry in stores:
+        entry["compression_vs_float32"] = float32_bytes / entry["bytes"]
+    return {
+        "parameters": {"min_cluster_size": min_cluster_size, "min_samples": min_samples},
+        "num_conversations": int(baseline.shape[0]),
+        "baseline_num_clusters": int(len(set(baseline_labels)) - (1 if -1 in baseline_labels else 0)),
+        "stores": stores,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", type=Path, default=EMBEDDINGS_PATH, help="conversations.parquet the stores sit next to")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Write a store (reduced fits PCA with the default settings)")
+    build.add_argument("--kind", choices=STORE_KINDS, required=True)
+
+    report = subparsers.add_parser("report", help="Adjusted Rand index of each store's clusters vs float64")
+    report.add_argument("--min-cluster-size", type=int, default=50)
+    report.add_argument("--min-samples", type=int, default=10)
+    report.add_argument("-o", "--output", type=Path, default=REPORT_PATH)
+
+    args = parser.parse_args()
+    from cluster_analysis import load_embedding_store, reduce_dimensions, reduction_params
+
+    if args.command == "build":
+        matrix, reduced, _ = load_embedding_store(args.kind, args.embeddings)
+        if args.kind == "reduced" and reduced is None:
+            reduced, _, projection = reduce_dimensions(matrix)
+            save_reduced(reduced, projection, reduction_params(), args.embeddings)
+        print(f"{args.kind} store: {store_nbytes(args.kind, args.embeddings) / 1e6:.1f} MB")
+        return 0
+
+    result = quantization_report(args.min_cluster_size, args.min_samples, args.embeddings)
+    print(f"\n{'store':>8} {'MB':>9} {'vs f32':>7} {'ARI':>7} {'clusters':>9} {'noise %':>8}")
+    for entry in result["stores"]:
+        print(f"{entry['kind']:>8} {entry['bytes'] / 1e6:>9.1f} {entry['compression_vs_float32']:>6.1f}x "
+              f"{entry['ari_vs_float64']:>7.3f} {entry['num_clusters']:>9} {entry['noise_pct']:>8.1f}")
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,43 @@
 #!/usr/bin/env python3
 """Extract golden responses from Front support conversations."""
 
+import argparse
 import json
 import re
+import sys
+import zlib
 import hashlib
+import heapq
+import itertools
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 import duckdb
+import numpy as np
+from artifact_cache import ArtifactCache
+from columnar_output import copy_parquet, write_parquet
+from front_cache_maintenance import stale_conversations
+from stage_metrics import StageRecorder
+from template_index import TemplateIndex, index_path_for
+from topic_matcher import TopicMatcher
 
 # Paths
 DB_PATH = Path.home() / "skill/data/front-cache.db"
-OUTPUT_DIR = Path.home() / "Code/skillrecordings/support/artifacts/phase-0/golden/v1"
+GOLDEN_DIR = Path.home() / "Code/skillrecordings/support/artifacts/phase-0/golden"  # Cache entries + latest symlink
+SPILL_FILENAME = ".candidates.duckdb"  # Scratch database in the staging directory, removed before commit
+STATE_FILENAME = "extraction_state.duckdb"  # Incremental mode watermark + running counts, kept in GOLDEN_DIR across runs
+SCRIPT_DIR = Path(__file__).resolve().parent
+# Code and config whose changes invalidate cached outputs, besides this script
+CODE_DEPENDENCIES = ["topic_matcher.py", "topics.json", "template_index.py", "columnar_output.py"]
+
+MIN_REUSE_COUNT = 3  # Distinct conversations a response needs once near-duplicates are merged
+# Personalized variants of a golden response may each be sent only once, so
+# candidates are kept from a single conversation up and MIN_REUSE_COUNT is
+# applied to the merged groups instead
+MIN_CANDIDATE_REUSE = 1
+MAX_SOURCE_CONVERSATIONS = 20  # Source conversations kept per response
+MAX_TEMPLATES = 100
+BATCH_SIZE = 10_000  # Candidate rows fetched from DuckDB at a time
 
 # Boilerplate patterns to filter
 BOILERPLATE_PATTERNS = [
@@ -36,6 +63,20 @@ PII_PATTERNS = [
     (r"\b\d{4}[-/]\d{2}[-/]\d{2}\b", "{date}"),
 ]
 
+# Near-duplicate grouping (MinHash + LSH)
+SHINGLE_SIZE = 3  # Word 3-grams
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands x 8 rows -> candidate pairs from ~0.7 Jaccard
+NEAR_DUP_THRESHOLD = 0.8  # Min estimated Jaccard to merge two responses
+MINHASH_PRIME = np.uint64((1 << 32) + 15)
+_rng = np.random.default_rng(42)
+MINHASH_A = _rng.integers(1, 1 << 31, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+MINHASH_B = _rng.integers(0, 1 << 31, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+GREETING_PATTERN = r"^\s*(?:hi|hey|hello|dear|good (?:morning|afternoon|evening))\b[^\n]{0,40}\n"
+
+TOPIC_MATCHER = TopicMatcher.from_config()  # topics.json
+
 def is_boilerplate(text: str) -> bool:
     """Check if response is boilerplate."""
     text_lower = text.lower().strip()
@@ -54,23 +95,83 @@ def extract_template(text: str) -> str:
         template = re.sub(pattern, replacement, template)
     return template
 
-def compute_quality_score(reuse_count: int, avg_thread_length: float, text_length: int) -> float:
-    """Compute quality score (0-1) for a response."""
-    # Normalize factors
-    reuse_score = min(reuse_count / 50, 1.0)  # Cap at 50 reuses
-    length_score = min(text_length / 500, 1.0)  # Cap at 500 chars
-    resolution_score = max(0, 1 - (avg_thread_length - 2) / 5)  # 2 msgs = 1.0, 7+ msgs = 0
-    
-    # Weighted combination
-    return 0.4 * reuse_score + 0.3 * resolution_score + 0.3 * length_score
+# Python's Unicode \s (also what str.strip() removes), \w and \d, spelled
+# for DuckDB's RE2, whose own classes are ASCII-only
+RE2_WHITESPACE_CHARS = r"\t\n\x{0b}\f\r\x{1c}-\x{1f}\pZ\x{85}"
+RE2_WHITESPACE = f"[{RE2_WHITESPACE_CHARS}]"
+RE2_WORD_CHARS = r"\pL\pN_"
+RE2_DIGIT = r"\p{Nd}"
+RE2_NON_WORD = f"[^{RE2_WORD_CHARS}]"
+# Word characters outside ASCII: neither ASCII nor a non-letter, or neither
+# ASCII nor a non-number
+RE2_NON_ASCII_WORD = r"(?:[^\x00-\x7F\PL]|[^\x00-\x7F\PN])"
 
-def main():
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    
-    conn = duckdb.connect(str(DB_PATH), read_only=True)
-    
-    # Query for reused responses
-    query = """
+# PII_PATTERNS for RE2, which has no \b. A boundary depends on the characters
+# on both sides, which RE2 can only test by consuming them, so they are
+# captured and written back by the replacement. That can swallow the start of
+# the next match, which template_sql() works around for each pattern.
+#
+# Emails are anchored on the character before their run of address
+# characters, so a match can only start at the first boundary in the run, as
+# Python's leftmost match does. An email that starts on the "." (or %, +, -)
+# right after another one did so because that one ended in a letter; its
+# {email} stands in for the letter.
+RE2_EMAIL_PATTERN = (
+    rf"(?:(\{{email\}})[.%+-]|(^|[^{RE2_WORD_CHARS}.%+-])([.%+-]*)[A-Za-z0-9_]"
+    rf"|({RE2_NON_ASCII_WORD})([A-Za-z0-9_]*)[.%+-])"
+    rf"[A-Za-z0-9._%+-]*@[A-Za-z0-9.-]+\.[A-Z|a-z]+(?:[A-Za-z]($|{RE2_NON_WORD})|\|([{RE2_WORD_CHARS}]))"
+)
+RE2_EMAIL_REPLACEMENT = r"\1\2\3\4\5{email}\6\7"
+RE2_URL_PATTERN = (
+    rf"(?:(^|{RE2_NON_WORD})(?:https?://(?:www\.)?[a-zA-Z0-9-]+|www\.[a-zA-Z0-9-]+|[a-zA-Z0-9][a-zA-Z0-9-]*)"
+    rf"|([{RE2_WORD_CHARS}])-[a-zA-Z0-9-]*)\.(?:com|dev|io|net|org)/[^{RE2_WHITESPACE_CHARS}]*"
+)
+RE2_AMOUNT_PATTERN = rf"\${RE2_DIGIT}+(?:\.{RE2_DIGIT}{{2}})?"
+RE2_DATE_PATTERN = rf"(^|{RE2_NON_WORD}){RE2_DIGIT}{{4}}[-/]{RE2_DIGIT}{{2}}[-/]{RE2_DIGIT}{{2}}($|{RE2_NON_WORD})"
+
+def _sql_literal(value: str) -> str:
+    """Quote a string as a SQL literal."""
+    return "'" + value.replace("'", "''") + "'"
+
+def _to_re2(pattern: str) -> str:
+    """Translate a Python pattern to RE2 so both engines agree on whitespace."""
+    return re.sub(
+        r"\[\^\\s\]|\\s",
+        lambda m: f"[^{RE2_WHITESPACE_CHARS}]" if m.group(0).startswith("[") else RE2_WHITESPACE,
+        pattern,
+    )
+
+def boilerplate_sql(column: str) -> str:
+    """SQL predicate equivalent to is_boilerplate() for use inside DuckDB."""
+    stripped = f"regexp_replace({column}, {_sql_literal(f'^{RE2_WHITESPACE}+|{RE2_WHITESPACE}+$')}, '', 'g')"
+    clauses = [
+        f"regexp_matches(lower({stripped}), {_sql_literal('(?im)' + _to_re2(pattern))})"
+        for pattern in BOILERPLATE_PATTERNS
+    ]
+    clauses.append(f"length({stripped}) < 100")
+    return "(" + " OR ".join(clauses) + ")"
+
+def template_sql(column: str) -> str:
+    """SQL expression equivalent to extract_template() for use inside DuckDB.
+
+    A global replace can skip a match whose leading character the previous
+    one consumed. Emails are therefore replaced one at a time, leftmost first,
+    once per "@" in the text (every address has exactly one). Dates get a
+    second pass, which is enough since a date can't start inside a skipped
+    one; URLs run up to whitespace, so nothing follows them directly.
+    """
+    def replace_all(expression, pattern, replacement):
+        return f"regexp_replace({expression}, {_sql_literal(pattern)}, {_sql_literal(replacement)}, 'g')"
+
+    email = f"regexp_replace(acc, {_sql_literal(RE2_EMAIL_PATTERN)}, {_sql_literal(RE2_EMAIL_REPLACEMENT)})"
+    expression = f"list_reduce(string_split({column}, '@')[2:], (acc, _) -> {email}, {column})"
+    expression = replace_all(expression, RE2_URL_PATTERN, r"\1\2{url}")
+    expression = replace_all(expression, RE2_AMOUNT_PATTERN, "{amount}")
+    for _ in range(2):
+        expression = replace_all(expression, RE2_DATE_PATTERN, r"\1{date}\2")
+    return expression
+
+RAW_CANDIDATES_SQL = f"""
     WITH thread_counts AS (
       SELECT conversation_id, COUNT(*) as msg_count 
       FROM messages GROUP BY conversation_id
@@ -79,8 +180,8 @@ def main():
       m.body_text as response,
       COUNT(DISTINCT c.id) as reuse_count,
       AVG(thread.msg_count) as avg_thread_length,
-      list(DISTINCT c.id) as conversation_ids,
-      list(DISTINCT unnest(c.tags)) as all_tags
+      list(DISTINCT c.id ORDER BY c.id) as conversation_ids,
+      list_sort(list_distinct(flatten(list(c.tags)))) as all_tags
     FROM conversations c
     JOIN messages m ON m.conversation_id = c.id
     JOIN thread_counts thread ON thread.conversation_id = c.id
@@ -89,143 +190,892 @@ def main():
       AND thread.msg_count BETWEEN 2 AND 10
       AND LENGTH(m.body_text) > 50
     GROUP BY m.body_text
-    HAVING COUNT(DISTINCT c.id) >= 3
-    ORDER BY reuse_count DESC
+    HAVING COUNT(DISTINCT c.id) >= {MIN_CANDIDATE_REUSE}
+"""
+
+# Same candidates from the tables maintained by front_cache_maintenance.py:
+# thread lengths come from thread_stats and responses group on a 64-bit
+# fingerprint of the normalized text instead of the raw body.
+PRECOMPUTED_CANDIDATES_SQL = f"""
+    SELECT 
+      min(m.body_text) as response,
+      COUNT(DISTINCT c.id) as reuse_count,
+      AVG(ts.msg_count) as avg_thread_length,
+      list(DISTINCT c.id ORDER BY c.id) as conversation_ids,
+      list_sort(list_distinct(flatten(list(c.tags)))) as all_tags
+    FROM conversations c
+    JOIN thread_stats ts ON ts.conversation_id = c.id
+    JOIN message_fingerprints f ON f.conversation_id = c.id
+    JOIN messages m ON m.id = f.message_id
+    WHERE c.status = 'archived'
+      AND ts.msg_count BETWEEN 2 AND 10
+      AND f.text_length > 50
+    GROUP BY f.fingerprint
+    HAVING COUNT(DISTINCT c.id) >= {MIN_CANDIDATE_REUSE}
+"""
+
+def build_candidates_query(sql_filter: bool = False, precomputed: bool = False) -> str:
+    """Build the golden candidates query.
+
+    With sql_filter, boilerplate and short responses are dropped and PII is
+    templated inside DuckDB, so only real candidates cross into Python. With
+    precomputed, candidates come from the thread_stats/message_fingerprints
+    tables instead of re-aggregating messages.
+    """
+    template_column = f"{template_sql('response')} as template" if sql_filter else "NULL as template"
+    boilerplate_filter = f"WHERE NOT {boilerplate_sql('response')}" if sql_filter else ""
+    return f"""
+    WITH candidates AS ({PRECOMPUTED_CANDIDATES_SQL if precomputed else RAW_CANDIDATES_SQL})
+    SELECT response, reuse_count, avg_thread_length, conversation_ids, all_tags,
+      {template_column}
+    FROM candidates
+    {boilerplate_filter}
+    ORDER BY reuse_count DESC, response
+    """
+
+INCREMENTAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS response_stats (
+  response_hash VARCHAR PRIMARY KEY,
+  response VARCHAR NOT NULL,
+  reuse_count BIGINT NOT NULL,
+  thread_length_sum BIGINT NOT NULL,
+  thread_length_rows BIGINT NOT NULL,
+  conversation_ids VARCHAR[],
+  tags VARCHAR[]
+);
+
+CREATE TABLE IF NOT EXISTS processed_conversations (
+  id VARCHAR PRIMARY KEY,
+  last_message_at TIMESTAMP,
+  tags VARCHAR[]
+);
+
+-- What each processed conversation added to response_stats, so it can be
+-- taken back out when the conversation is reopened
+CREATE TABLE IF NOT EXISTS conversation_responses (
+  conversation_id VARCHAR NOT NULL,
+  response_hash VARCHAR NOT NULL,
+  message_rows BIGINT NOT NULL,
+  msg_count BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS watermark (
+  synced_at TIMESTAMP,
+  conversation_id VARCHAR,
+  updated_at TIMESTAMP
+);
+"""
+
+def update_incremental_state(conn) -> dict:
+    """Fold archived conversations synced since the watermark into response_stats.
+
+    Expects the front cache attached as `front`. The watermark follows when
+    conversations were last synced rather than their last message, so one
+    archived after its last message is still picked up. A conversation is
+    counted once, unless it comes back with a later last message (reopened,
+    answered and archived again): then what it added last time is taken back
+    out of response_stats before it is counted again. Per-response counts
+    can therefore be summed across runs, and each run costs time
+    proportional to the new mail rather than the whole history.
+
+    The changes are left in an open transaction; the caller commits once the
+    outputs built from them are written, so a failed run doesn't mark its
+    conversations as processed.
     """
+    conn.execute(INCREMENTAL_SCHEMA)
+    previous = conn.execute("SELECT synced_at, conversation_id FROM watermark").fetchone()
+    since = previous[0] if previous else None
+
+    conn.execute("BEGIN TRANSACTION")
+    conn.execute("""
+    CREATE OR REPLACE TEMP TABLE new_conversations AS
+    SELECT c.id, c.tags, c.last_message_at, p.id IS NOT NULL AS reopened,
+      COALESCE(c.synced_at, c.last_message_at, c.created_at) AS watermark_at
+    FROM front.conversations c
+    LEFT JOIN processed_conversations p ON p.id = c.id
+    WHERE c.status = 'archived'
+      AND ($since IS NULL OR COALESCE(c.synced_at, c.last_message_at, c.created_at) >= $since)
+      AND (p.id IS NULL OR c.last_message_at > p.last_message_at)
+    """, {"since": since})
+
+    # Take back what reopened conversations added on their previous run
+    conn.execute("""
+    CREATE OR REPLACE TEMP TABLE retracted AS
+    SELECT
+      r.response_hash,
+      COUNT(*) as reuse_count,
+      SUM(r.message_rows * r.msg_count) as thread_length_sum,
+      SUM(r.message_rows) as thread_length_rows,
+      list(r.conversation_id) as conversation_ids
+    FROM conversation_responses r
+    JOIN new_conversations n ON n.id = r.conversation_id AND n.reopened
+    GROUP BY r.response_hash
+    """)
+    conn.execute("""
+    UPDATE response_stats s SET
+      reuse_count = s.reuse_count - t.reuse_count,
+      thread_length_sum = s.thread_length_sum - t.thread_length_sum,
+      thread_length_rows = s.thread_length_rows - t.thread_length_rows,
+      conversation_ids = list_filter(s.conversation_ids, id -> NOT list_contains(t.conversation_ids, id))
+    FROM retracted t
+    WHERE s.response_hash = t.response_hash
+    """)
+    conn.execute("DELETE FROM conversation_responses WHERE conversation_id IN (SELECT id FROM new_conversations WHERE reopened)")
+
+    conn.execute("""
+    CREATE OR REPLACE TEMP TABLE conversation_batch AS
+    WITH thread_counts AS (
+      SELECT m.conversation_id, COUNT(*) as msg_count
+      FROM front.messages m
+      JOIN new_conversations n ON n.id = m.conversation_id
+      GROUP BY m.conversation_id
+    )
+    SELECT
+      c.id as conversation_id,
+      md5(m.body_text) as response_hash,
+      m.body_text as response,
+      COUNT(*) as message_rows,
+      any_value(thread.msg_count) as msg_count
+    FROM new_conversations c
+    JOIN front.messages m ON m.conversation_id = c.id
+    JOIN thread_counts thread ON thread.conversation_id = c.id
+    WHERE m.is_inbound = false
+      AND thread.msg_count BETWEEN 2 AND 10
+      AND LENGTH(m.body_text) > 50
+    GROUP BY c.id, m.body_text
+    """)
+    conn.execute("""
+    CREATE OR REPLACE TEMP TABLE response_batch AS
+    SELECT
+      b.response_hash,
+      any_value(b.response) as response,
+      COUNT(*) as reuse_count,
+      SUM(b.message_rows * b.msg_count) as thread_length_sum,
+      SUM(b.message_rows) as thread_length_rows,
+      list(b.conversation_id ORDER BY b.conversation_id) as conversation_ids,
+      list_sort(list_distinct(flatten(list(c.tags)))) as tags
+    FROM conversation_batch b
+    JOIN new_conversations c ON c.id = b.conversation_id
+    GROUP BY b.response_hash
+    """)
+    conn.execute("""
+    UPDATE response_stats s SET
+      reuse_count = s.reuse_count + b.reuse_count,
+      thread_length_sum = s.thread_length_sum + b.thread_length_sum,
+      thread_length_rows = s.thread_length_rows + b.thread_length_rows,
+      conversation_ids = list_concat(s.conversation_ids, b.conversation_ids),
+      tags = list_sort(list_distinct(list_concat(s.tags, b.tags)))
+    FROM response_batch b
+    WHERE s.response_hash = b.response_hash
+    """)
+    conn.execute("""
+    INSERT INTO response_stats
+    SELECT response_hash, response, reuse_count, thread_length_sum, thread_length_rows, conversation_ids, tags
+    FROM response_batch
+    WHERE response_hash NOT IN (SELECT response_hash FROM response_stats)
+    """)
+    conn.execute("""
+    INSERT INTO conversation_responses
+    SELECT conversation_id, response_hash, message_rows, msg_count FROM conversation_batch
+    """)
+    conn.execute("""
+    INSERT OR REPLACE INTO processed_conversations
+    SELECT id, last_message_at, tags FROM new_conversations
+    """)
+
+    # Tags can't be subtracted, so responses a reopened conversation sent
+    # before get theirs rebuilt from the conversations still sending them
+    conn.execute("""
+    UPDATE response_stats s SET tags = t.tags
+    FROM (
+      SELECT r.response_hash, list_sort(list_distinct(flatten(list(p.tags)))) as tags
+      FROM conversation_responses r
+      JOIN processed_conversations p ON p.id = r.conversation_id
+      WHERE r.response_hash IN (SELECT response_hash FROM retracted)
+      GROUP BY r.response_hash
+    ) t
+    WHERE s.response_hash = t.response_hash
+    """)
+    conn.execute("DELETE FROM response_stats WHERE reuse_count <= 0")
+
+    new_count, reopened_count = conn.execute(
+        "SELECT COUNT(*), COUNT(*) FILTER (WHERE reopened) FROM new_conversations"
+    ).fetchone()
+    latest = conn.execute(
+        "SELECT watermark_at, id FROM new_conversations ORDER BY watermark_at DESC NULLS LAST, id DESC LIMIT 1"
+    ).fetchone()
+    if latest and latest[0] is not None and (since is None or latest[0] > since):
+        conn.execute("DELETE FROM watermark")
+        conn.execute("INSERT INTO watermark VALUES (?, ?, now())", list(latest))
+
+    watermark = conn.execute("SELECT synced_at, conversation_id FROM watermark").fetchone()
+    print(f"Incremental: {new_count} new archived conversations since {since or 'the beginning'}"
+          f" ({reopened_count} reopened and counted again)")
+    return {
+        "new_conversations": new_count,
+        "reopened_conversations": reopened_count,
+        "synced_at": watermark[0].isoformat() if watermark and watermark[0] else None,
+        "conversation_id": watermark[1] if watermark else None,
+    }
+
+def build_state_query(sql_filter: bool = False) -> str:
+    """Build the golden candidates query over the incremental response_stats table."""
+    template_column = f"{template_sql('response')} as template" if sql_filter else "NULL as template"
+    boilerplate_filter = f"AND NOT {boilerplate_sql('response')}" if sql_filter else ""
+    return f"""
+    SELECT
+      response,
+      reuse_count,
+      thread_length_sum / thread_length_rows as avg_thread_length,
+      conversation_ids,
+      tags as all_tags,
+      {template_column}
+    FROM response_stats
+    WHERE reuse_count >= {MIN_CANDIDATE_REUSE}
+      {boilerplate_filter}
+    ORDER BY reuse_count DESC, response_hash
+    """
+
+def response_id(response: str) -> str:
+    """Stable golden response ID derived from the response text."""
+    return f"gr_{hashlib.md5(response.encode()).hexdigest()[:12]}"
+
+def iter_row_batches(conn, query: str, batch_size: int = BATCH_SIZE):
+    """Stream query results in fetchmany() batches instead of one fetchall()."""
+    cursor = conn.execute(query)
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        yield batch
+
+def iter_query_rows(conn, query: str, batch_size: int = BATCH_SIZE):
+    for batch in iter_row_batches(conn, query, batch_size):
+        yield from batch
+
+def conversation_keys(conv_ids: list) -> np.ndarray:
+    """64-bit keys for conversation ids, for counting distinct conversations across merged responses."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(cid.encode(), digest_size=8).digest(), "little") for cid in conv_ids),
+        dtype=np.uint64, count=len(conv_ids),
+    )
+
+def iter_candidates(rows, counts: dict = None, start: int = 0):
+    """Drop boilerplate rows and template the rest, one row at a time.
+
+    Rows already filtered and templated by DuckDB pass through as they are;
+    otherwise is_boilerplate() and extract_template() run here. Each kept
+    candidate is reduced to what later stages need (truncated text, template
+    hash, MinHash signature, conversation keys) so the full body and
+    conversation list never outlive their batch.
+    """
+    for i, (response, reuse_count, avg_thread_length, conv_ids, tags, template) in enumerate(rows, start):
+        if counts is not None:
+            counts["analyzed"] = counts.get("analyzed", 0) + 1
+        if template is None:
+            if response is None or is_boilerplate(response):
+                continue
+            template = extract_template(response)
+        yield {
+            "row": i,
+            "id": response_id(response),
+            "response": response[:2000],
+            "text_length": len(response),
+            "template": template[:2000],
+            "template_hash": hashlib.md5(template.encode()).hexdigest()[:12],
+            "signature": minhash_signature(response),
+            "reuse_count": reuse_count,
+            "avg_thread_length": avg_thread_length,
+            "conversation_ids": (conv_ids or [])[:MAX_SOURCE_CONVERSATIONS],
+            "conversation_keys": conversation_keys(conv_ids or []),
+            "tags": [t for t in (tags or []) if t],
+        }
+
+def _process_batch(start: int, rows: list) -> list:
+    """Worker entry point: candidates for one batch of rows."""
+    return list(iter_candidates(rows, start=start))
+
+def iter_candidates_parallel(batches, workers: int, counts: dict = None):
+    """iter_candidates() with batches fanned out to a process pool.
+
+    Results are yielded in submission order, so the candidate stream (and
+    everything derived from it) is identical to the serial path. At most two
+    batches per worker are in flight to keep memory bounded.
+    """
+    start = 0
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in batches:
+            pending.append(pool.submit(_process_batch, start, batch))
+            start += len(batch)
+            if counts is not None:
+                counts["analyzed"] = counts.get("analyzed", 0) + len(batch)
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def check_parity(conn) -> int:
+    """Compare the DuckDB filter/template path against the Python reference."""
+    python_rows = iter_candidates(iter_query_rows(conn, build_candidates_query()))
+    sql_rows = iter_candidates(iter_query_rows(conn, build_candidates_query(sql_filter=True)))
+    python_templates = {c["id"]: c["template"] for c in python_rows}
+    sql_templates = {c["id"]: c["template"] for c in sql_rows}
+
+    only_python = python_templates.keys() - sql_templates.keys()
+    only_sql = sql_templates.keys() - python_templates.keys()
+    mismatched = [r for r in python_templates.keys() & sql_templates.keys() if python_templates[r] != sql_templates[r]]
+
+    print(f"Python path: {len(python_templates)} candidates, SQL path: {len(sql_templates)} candidates")
+    for label, responses in [("Only kept by Python", only_python), ("Only kept by SQL", only_sql), ("Template mismatch", mismatched)]:
+        if responses:
+            print(f"  {label}: {len(responses)}")
+            for rid in list(responses)[:5]:
+                print(f"    {rid}")
+
+    if only_python or only_sql or mismatched:
+        print("❌ Parity check FAILED")
+        return 1
+    print("✅ Parity check passed")
+    return 0
+
+def normalize_for_similarity(text: str) -> str:
+    """Normalize a response so greetings, names, PII and whitespace don't matter."""
+    normalized = text.lower()
+    without_greeting = re.sub(GREETING_PATTERN, "", normalized)
+    if without_greeting.strip():  # Single-line replies that open with "Hi" keep their text
+        normalized = without_greeting
+    normalized = extract_template(normalized)
+    return " ".join(re.findall(r"[a-z0-9{}']+", normalized))
+
+def minhash_signature(text: str) -> np.ndarray:
+    """Compute the MinHash signature of a response's word shingles."""
+    words = normalize_for_similarity(text).split()
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((MINHASH_A[:, None] * hashes[None, :] + MINHASH_B[:, None]) % MINHASH_PRIME).min(axis=1)
+
+def similar_pairs(signatures: np.ndarray, buckets) -> dict:
+    """Neighbours of each candidate whose estimated Jaccard reaches NEAR_DUP_THRESHOLD.
+
+    buckets are tuples of indices into signatures that share an LSH band
+    bucket. Only candidates sharing a bucket are compared, but every pair
+    within one is. Buckets already seen in another band are skipped, since
+    exact duplicates otherwise land together in all of them.
+    """
+    neighbours = defaultdict(set)
+    seen_buckets = set()
+    for members in buckets:
+        members = tuple(members)
+        if len(members) < 2 or members in seen_buckets:
+            continue
+        seen_buckets.add(members)
+        member_signatures = signatures[list(members)]
+        for k, i in enumerate(members[:-1]):
+            similarity = np.mean(member_signatures[k + 1:] == member_signatures[k], axis=1)
+            for j in np.asarray(members[k + 1:])[similarity >= NEAR_DUP_THRESHOLD].tolist():
+                neighbours[i].add(j)
+                neighbours[j].add(i)
+    return neighbours
+
+SPILL_SCHEMA = """
+CREATE TABLE candidates (
+  row BIGINT, id VARCHAR, response VARCHAR, text_length BIGINT, template VARCHAR, template_hash VARCHAR,
+  reuse_count BIGINT, avg_thread_length DOUBLE, conversation_ids VARCHAR[], tags VARCHAR[], signature BLOB
+);
+CREATE TABLE conversation_keys (row BIGINT, key UBIGINT);
+CREATE TABLE lsh_buckets (band INTEGER, bucket BLOB, row BIGINT);
+-- Near-duplicate groups: members folded into their representative, and
+-- what the representative looks like once merged
+CREATE TABLE absorbed (row BIGINT, representative BIGINT);
+CREATE TABLE merged_groups (
+  row BIGINT, avg_thread_length DOUBLE, conversation_ids VARCHAR[], tags VARCHAR[], variant_count BIGINT
+);
+CREATE TABLE golden (
+  row BIGINT, id VARCHAR, text VARCHAR, template VARCHAR, template_hash VARCHAR, reuse_count BIGINT,
+  avg_thread_length DOUBLE, source_conversations VARCHAR[], associated_tags VARCHAR[], quality_score DOUBLE,
+  text_length BIGINT, variant_count BIGINT
+);
+"""
+
+GOLDEN_FIELDS = [
+    "id", "text", "template", "reuse_count", "avg_thread_length", "source_conversations",
+    "associated_tags", "quality_score", "text_length", "variant_count",
+]
+
+def _objects(values) -> np.ndarray:
+    """1-D object array, so DuckDB scans lists and strings as single values."""
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+class CandidateSpill:
+    """Candidates spilled to a scratch DuckDB database between pipeline stages.
+
+    Python only ever holds one batch of candidates: their text, MinHash
+    signatures, LSH band keys and the full set of conversation keys go to
+    the database, near-duplicate grouping reads back only the candidates
+    that share an LSH bucket, and merged candidates and golden responses are
+    streamed back out in batches. DuckDB itself spills to disk when the
+    database is a file, so memory stays bounded by the batch size.
+    """
+
+    def __init__(self, path: Path = None):
+        self.conn = duckdb.connect(str(path) if path else ":memory:")
+        self.conn.execute(SPILL_SCHEMA)
+        self.count = 0
+
+    def add(self, candidates: list):
+        """Write one batch of candidates from iter_candidates()."""
+        if not candidates:
+            return
+        rows = np.array([c["row"] for c in candidates], dtype=np.int64)
+        signatures = np.stack([c["signature"] for c in candidates])
+        self.conn.register("candidate_batch", {
+            "row": rows,
+            **{field: _objects([c[field] for c in candidates])
+               for field in ("id", "response", "template", "template_hash", "conversation_ids", "tags")},
+            "text_length": np.array([c["text_length"] for c in candidates], dtype=np.int64),
+            "reuse_count": np.array([c["reuse_count"] for c in candidates], dtype=np.int64),
+            "avg_thread_length": np.array([c["avg_thread_length"] for c in candidates], dtype=np.float64),
+            "signature": _objects([signature.tobytes() for signature in signatures]),
+        })
+        self.conn.execute("""
+        INSERT INTO candidates
+        SELECT row, id, response, text_length, template, template_hash, reuse_count, avg_thread_length,
+          conversation_ids::VARCHAR[], tags::VARCHAR[], signature
+        FROM candidate_batch
+        """)
+
+        keys = [c["conversation_keys"] for c in candidates]
+        self.conn.register("key_batch", {
+            "row": np.repeat(rows, [len(k) for k in keys]),
+            "key": np.concatenate(keys).astype(np.uint64),
+        })
+        self.conn.execute("INSERT INTO conversation_keys SELECT row, key FROM key_batch")
+
+        # One bucket key per band: the band's slice of the signature as bytes
+        band_bytes = signatures.view(np.uint8).reshape(len(candidates) * LSH_BANDS, -1)
+        self.conn.register("bucket_batch", {
+            "band": np.tile(np.arange(LSH_BANDS, dtype=np.int32), len(candidates)),
+            "bucket": _objects([bytes(b) for b in band_bytes]),
+            "row": np.repeat(rows, LSH_BANDS),
+        })
+        self.conn.execute("INSERT INTO lsh_buckets SELECT band, bucket, row FROM bucket_batch")
+        for name in ("candidate_batch", "key_batch", "bucket_batch"):
+            self.conn.unregister(name)
+        self.count += len(candidates)
+
+    def extend(self, candidates, batch_size: int = BATCH_SIZE):
+        """Write a stream of candidates, batch_size at a time."""
+        batch = []
+        for candidate in candidates:
+            batch.append(candidate)
+            if len(batch) >= batch_size:
+                self.add(batch)
+                batch = []
+        self.add(batch)
+
+    def group_near_duplicates(self) -> int:
+        """Merge near-duplicate candidates using MinHash signatures bucketed with LSH.
+
+        Candidates are taken most reused first; each unassigned one starts a
+        group and absorbs the unassigned neighbours that are similar to every
+        member already in it, so a group never chains together responses that
+        aren't near-duplicates of each other. Ties are broken by response id,
+        which makes the groups independent of input order. Groups are merged
+        into their most reused member: conversations and tags are unioned,
+        reuse counts the distinct conversations and the thread length is
+        averaged by reuse. Only candidates sharing a bucket are read back.
+
+        Returns the number of candidates left after merging.
+        """
+        buckets = [members for members, in self.conn.execute("""
+        SELECT list(row ORDER BY row) FROM lsh_buckets GROUP BY band, bucket HAVING COUNT(*) > 1
+        """).fetchall()]
+        bucketed = sorted({row for members in buckets for row in members})
+        self.conn.register("bucketed", {"row": np.array(bucketed, dtype=np.int64)})
+        loaded = self.conn.execute("""
+        SELECT c.row, c.id, c.reuse_count, c.avg_thread_length, c.conversation_ids, c.tags, c.signature
+        FROM candidates c JOIN bucketed b ON b.row = c.row
+        ORDER BY c.row
+        """).fetchall()
+        self.conn.unregister("bucketed")
+        if not loaded:
+            return self.count
+
+        index = {row[0]: i for i, row in enumerate(loaded)}
+        signatures = np.stack([np.frombuffer(row[6], dtype=np.uint64) for row in loaded])
+        neighbours = similar_pairs(signatures, ([index[row] for row in members] for members in buckets))
+        order = sorted(range(len(loaded)), key=lambda i: (-loaded[i][2], loaded[i][1]))
+        rank = {i: position for position, i in enumerate(order)}
+
+        assigned = set()
+        absorbed = []
+        merged = []
+        for seed in order:
+            if seed in assigned:
+                continue
+            members = [seed]
+            for other in sorted(neighbours[seed] - assigned, key=rank.__getitem__):
+                if np.all(np.mean(signatures[members] == signatures[other], axis=1) >= NEAR_DUP_THRESHOLD):
+                    members.append(other)
+            assigned.update(members)
+            if len(members) == 1:
+                continue
+            group = [loaded[i] for i in members]
+            representative = group[0][0]
+            absorbed.extend((row[0], representative) for row in group[1:])
+            total_reuse = sum(row[2] for row in group)
+            merged.append((
+                representative,
+                sum(row[3] * row[2] for row in group) / total_reuse,
+                list(dict.fromkeys(cid for row in group for cid in row[4]))[:MAX_SOURCE_CONVERSATIONS],
+                list(dict.fromkeys(t for row in group for t in row[5])),
+                len(group),
+            ))
+
+        if merged:
+            self.conn.executemany("INSERT INTO absorbed VALUES (?, ?)", absorbed)
+            self.conn.executemany("INSERT INTO merged_groups VALUES (?, ?, ?, ?, ?)", merged)
+        return self.count - len(absorbed)
+
+    def iter_merged(self, batch_size: int = BATCH_SIZE):
+        """Candidates after group_near_duplicates() reused in MIN_REUSE_COUNT conversations, in input order."""
+        # A conversation that sent several variants counts once
+        query = f"""
+        WITH reuse AS (
+          SELECT COALESCE(a.representative, k.row) as row, COUNT(DISTINCT k.key) as reuse_count
+          FROM conversation_keys k
+          LEFT JOIN absorbed a ON a.row = k.row
+          GROUP BY ALL
+        )
+        SELECT c.row, c.id, c.response, c.text_length, c.template, c.template_hash,
+          COALESCE(r.reuse_count, 0) as reuse_count,
+          COALESCE(m.avg_thread_length, c.avg_thread_length) as avg_thread_length,
+          COALESCE(m.conversation_ids, c.conversation_ids) as conversation_ids,
+          COALESCE(m.tags, c.tags) as tags,
+          COALESCE(m.variant_count, 1) as variant_count
+        FROM candidates c
+        LEFT JOIN reuse r ON r.row = c.row
+        LEFT JOIN merged_groups m ON m.row = c.row
+        WHERE c.row NOT IN (SELECT row FROM absorbed)
+          AND COALESCE(r.reuse_count, 0) >= {MIN_REUSE_COUNT}
+        ORDER BY c.row
+        """
+        fields = ["row", "id", "response", "text_length", "template", "template_hash", "reuse_count",
+                  "avg_thread_length", "conversation_ids", "tags", "variant_count"]
+        for row in iter_query_rows(self.conn.cursor(), query, batch_size):
+            yield dict(zip(fields, row))
+
+    def add_golden(self, responses: list):
+        """Write one batch of scored golden responses (with their row and template_hash)."""
+        if not responses:
+            return
+        columns = ["row", "template_hash", *GOLDEN_FIELDS]
+        self.conn.register("golden_batch", {column: _objects([r[column] for r in responses]) for column in columns})
+        self.conn.execute(f"""
+        INSERT INTO golden ({", ".join(columns)})
+        SELECT row::BIGINT, template_hash, id, text, template, reuse_count::BIGINT, avg_thread_length::DOUBLE,
+          source_conversations::VARCHAR[], associated_tags::VARCHAR[], quality_score::DOUBLE,
+          text_length::BIGINT, variant_count::BIGINT
+        FROM golden_batch
+        """)
+        self.conn.unregister("golden_batch")
+
+    def golden_query(self) -> str:
+        """Golden responses, best first, as written to responses.json."""
+        return f"SELECT {', '.join(GOLDEN_FIELDS)} FROM golden ORDER BY quality_score DESC, id"
+
+    def iter_golden(self, batch_size: int = BATCH_SIZE):
+        for row in iter_query_rows(self.conn.cursor(), self.golden_query(), batch_size):
+            yield dict(zip(GOLDEN_FIELDS, row))
+
+    def iter_template_groups(self, batch_size: int = BATCH_SIZE):
+        """(usage, template_hash, template, response ids) for groups eligible to become templates.
+
+        Groups of 2+ responses qualify, as do singles with high usage. The
+        template text and variations follow input order.
+        """
+        query = """
+        SELECT SUM(reuse_count) as usage, template_hash, arg_min(template, row) as template,
+          list(id ORDER BY row) as variations
+        FROM golden
+        GROUP BY template_hash
+        HAVING SUM(reuse_count) >= 5 OR COUNT(*) >= 2
+        """
+        yield from iter_query_rows(self.conn.cursor(), query, batch_size)
+
+    def close(self):
+        self.conn.close()
+
+def group_near_duplicates(candidates: list) -> list:
+    """CandidateSpill.group_near_duplicates() for an in-memory list of candidates."""
+    spill = CandidateSpill()
+    try:
+        spill.add(candidates)
+        spill.group_near_duplicates()
+        return list(spill.iter_merged())
+    finally:
+        spill.close()
+
+def compute_quality_score(reuse_count: int, avg_thread_length: float, text_length: int) -> float:
+    """Compute quality score (0-1) for a response."""
+    # Normalize factors
+    reuse_score = min(reuse_count / 50, 1.0)  # Cap at 50 reuses
+    length_score = min(text_length / 500, 1.0)  # Cap at 500 chars
+    resolution_score = max(0, 1 - (avg_thread_length - 2) / 5)  # 2 msgs = 1.0, 7+ msgs = 0
+    
+    # Weighted combination
+    return 0.4 * reuse_score + 0.3 * resolution_score + 0.3 * length_score
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sql-filter", action="store_true",
+                        help="Filter boilerplate and template PII inside DuckDB instead of Python")
+    parser.add_argument("--precomputed", action="store_true",
+                        help="Use thread_stats and message_fingerprints (see front_cache_maintenance.py)")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Only aggregate conversations synced since the watermark in {STATE_FILENAME}")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Candidate rows fetched from DuckDB per batch")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Process candidate batches in N worker processes (output is identical)")
+    parser.add_argument("--parquet", action="store_true",
+                        help="Also write responses.parquet and templates.parquet (zstd)")
+    parser.add_argument("--check-parity", action="store_true",
+                        help="Verify the DuckDB and Python filter/template paths agree, then exit")
+    parser.add_argument("--trace", type=Path,
+                        help="Append per-stage timing and memory records to this JSONL file and print a stage table")
+    parser.add_argument("--trace-allocations", action="store_true",
+                        help="Also record each stage's peak Python/NumPy allocations (tracemalloc; slower)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-extract even if a cached run has the same front-cache.db and parameters")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
     
-    results = conn.execute(query).fetchall()
-    print(f"Found {len(results)} raw golden response candidates")
+    if args.check_parity:
+        return check_parity(duckdb.connect(str(DB_PATH), read_only=True))
     
-    # Process and filter
-    golden_responses = []
-    template_groups = defaultdict(list)  # template -> [response_ids]
-    total_analyzed = len(results)
+    # Skip the run entirely when front-cache.db, the code, the settings
+    # that shape the outputs and (incremental) the state match a cached run
+    cache = ArtifactCache(GOLDEN_DIR, "extract_golden_responses")
+    inputs = [DB_PATH, DB_PATH.with_name(DB_PATH.name + ".wal"), Path(__file__)]
+    inputs += [SCRIPT_DIR / name for name in CODE_DEPENDENCIES]
+    if args.incremental:
+        # The outputs also depend on the watermark and counts from earlier runs
+        state_path = GOLDEN_DIR / STATE_FILENAME
+        inputs += [state_path, state_path.with_name(state_path.name + ".wal")]
+    cache_key, manifest = cache.key(inputs, params={
+        "sql_filter": args.sql_filter,
+        "precomputed": args.precomputed,
+        "incremental": args.incremental,
+        "batch_size": args.batch_size,
+        "parquet": args.parquet,
+    })
+    if not args.force and cache.lookup(cache_key) is not None:
+        cache.publish(cache_key)
+        print(f"Inputs and parameters unchanged; reusing {GOLDEN_DIR / cache_key}")
+        print(f"Updated symlink: latest -> {cache_key}")
+        return 0
     
-    for i, (response, reuse_count, avg_thread_length, conv_ids, tags) in enumerate(results):
-        if response is None or is_boilerplate(response):
-            continue
+    # The precomputed tables only reflect the cache as of their last refresh
+    if args.precomputed:
+        with duckdb.connect(str(DB_PATH), read_only=True) as check:
+            stale = stale_conversations(check)
+        if stale:
+            raise SystemExit(
+                f"thread_stats and message_fingerprints are out of date for {stale} conversations; "
+                f"run front_cache_maintenance.py before --precomputed"
+            )
+    
+    # Outputs go to a staging directory that becomes the cache entry
+    output_dir = cache.begin(cache_key)
+    recorder = StageRecorder("extract_golden_responses", trace_path=args.trace, track_allocations=args.trace_allocations)
+    
+    watermark = None
+    if args.incremental:
+        with recorder.stage("incremental_state"):
+            conn = duckdb.connect(str(GOLDEN_DIR / STATE_FILENAME))
+            conn.execute(f"ATTACH {_sql_literal(str(DB_PATH))} AS front (READ_ONLY)")
+            watermark = update_incremental_state(conn)
+            query = build_state_query(sql_filter=args.sql_filter)
+    else:
+        conn = duckdb.connect(str(DB_PATH), read_only=True)
+        query = build_candidates_query(sql_filter=args.sql_filter, precomputed=args.precomputed)
+    
+    # Stream rows through boilerplate filtering and PII templating
+    # (already done by DuckDB with --sql-filter). Candidates are spilled to
+    # a scratch database in the staging directory, so only one batch is
+    # held in memory at a time
+    spill_path = output_dir / SPILL_FILENAME
+    spill = CandidateSpill(spill_path)
+    counts = {"analyzed": 0}
+    with recorder.stage("candidates") as stage:
+        if args.workers > 1:
+            spill.extend(iter_candidates_parallel(iter_row_batches(conn, query, args.batch_size), args.workers, counts), args.batch_size)
+        else:
+            spill.extend(iter_candidates(iter_query_rows(conn, query, args.batch_size), counts), args.batch_size)
+        stage["rows"] = counts["analyzed"]
+    total_analyzed = counts["analyzed"]
+    print(f"Found {total_analyzed} raw golden response candidates")
+    
+    # Merge responses that differ only by greeting, name or whitespace
+    with recorder.stage("near_duplicates", rows=spill.count):
+        candidate_count = spill.group_near_duplicates()
+    print(f"After near-duplicate grouping: {candidate_count} candidates")
+    
+    # Process candidates reused often enough once merged
+    golden_count = 0
+    with recorder.stage("score_responses", rows=candidate_count):
+        batch = []
+        for candidate in spill.iter_merged(args.batch_size):
+            golden_count += 1
+            reuse_count = candidate["reuse_count"]
+            avg_thread_length = candidate["avg_thread_length"]
+            quality_score = compute_quality_score(reuse_count, avg_thread_length, candidate["text_length"])
+            
+            batch.append({
+                "row": candidate["row"],
+                "template_hash": candidate["template_hash"],  # Group by template for template extraction
+                "id": candidate["id"],
+                "text": candidate["response"],  # Truncated for storage
+                "template": candidate["template"],
+                "reuse_count": reuse_count,
+                "avg_thread_length": round(avg_thread_length, 2),
+                "source_conversations": candidate["conversation_ids"],
+                "associated_tags": candidate["tags"][:10],  # First 10 non-null tags
+                "quality_score": round(quality_score, 3),
+                "text_length": candidate["text_length"],
+                "variant_count": candidate["variant_count"]
+            })
+            if len(batch) >= args.batch_size:
+                spill.add_golden(batch)
+                batch = []
+        spill.add_golden(batch)
         
-        response_id = f"gr_{i+1:03d}"
-        template = extract_template(response)
-        quality_score = compute_quality_score(reuse_count, avg_thread_length, len(response))
+        print(f"After filtering: {golden_count} golden responses")
+    
+    with recorder.stage("templates"):
+        # Extract templates (groups with 2+ similar responses or high usage),
+        # keeping only the top MAX_TEMPLATES by usage with a heap
+        top_groups = heapq.nsmallest(MAX_TEMPLATES, spill.iter_template_groups(args.batch_size), key=lambda x: (-x[0], x[1]))
         
-        # Limit conversation IDs to first 20 for storage
-        conv_list = conv_ids[:20] if conv_ids else []
-        tag_list = [t for t in (tags or []) if t] [:10]  # First 10 non-null tags
+        # Extract topics for all templates in one pass
+        topics = TOPIC_MATCHER.classify_batch([template[:1500] for _, _, template, _ in top_groups])
         
-        golden_response = {
-            "id": response_id,
-            "text": response[:2000],  # Truncate for storage
-            "template": template[:2000],
-            "reuse_count": reuse_count,
-            "avg_thread_length": round(avg_thread_length, 2),
-            "source_conversations": conv_list,
-            "associated_tags": tag_list,
-            "quality_score": round(quality_score, 3),
-            "text_length": len(response)
-        }
-        golden_responses.append(golden_response)
+        templates = []
+        for (total_usage, hash_id, template, variations), topic in zip(top_groups, topics):
+            templates.append({
+                "id": f"tpl_{hash_id}",
+                "template": template[:1500],
+                "variations": variations,
+                "topic": topic,
+                "usage_count": total_usage
+            })
+        print(f"Extracted {len(templates)} templates")
+    
+    # Write outputs
+    with recorder.stage("write_outputs", rows=golden_count):
+        # Sorted by quality score; the summary stats are gathered on the way
+        summary = write_responses_json(spill.iter_golden(args.batch_size), output_dir / "responses.json", total_analyzed)
         
-        # Group by template for template extraction
-        template_hash = hashlib.md5(template.encode()).hexdigest()[:12]
-        template_groups[template_hash].append({
-            "id": response_id,
-            "template": template,
-            "usage_count": reuse_count
-        })
+        with open(output_dir / "templates.json", "w") as f:
+            json.dump({"templates": templates}, f, indent=2)
+        
+        # Serialized suggestion index so consumers don't rebuild it at startup
+        TemplateIndex.build_from_file(output_dir / "templates.json").save(index_path_for(output_dir / "templates.json"))
+        
+        if args.parquet:
+            copy_parquet(spill.conn, f"SELECT {', '.join(GOLDEN_FIELDS)} FROM golden ORDER BY id",
+                         output_dir / "responses.parquet")
+            write_parquet(templates, output_dir / "templates.parquet", sort_by="id")
     
-    # Sort by quality score
-    golden_responses.sort(key=lambda x: x["quality_score"], reverse=True)
-    
-    print(f"After filtering: {len(golden_responses)} golden responses")
-    
-    # Extract templates (groups with 2+ similar responses or high usage)
-    templates = []
-    for i, (hash_id, group) in enumerate(sorted(template_groups.items(), 
-                                                  key=lambda x: sum(r["usage_count"] for r in x[1]), 
-                                                  reverse=True)):
-        if len(group) >= 1:  # Include singles with high usage
-            total_usage = sum(r["usage_count"] for r in group)
-            if total_usage >= 5 or len(group) >= 2:
-                # Extract topic from template
-                template_text = group[0]["template"]
-                topic = extract_topic(template_text)
-                
-                templates.append({
-                    "id": f"tpl_{i+1:03d}",
-                    "template": template_text[:1500],
-                    "variations": [r["id"] for r in group],
-                    "topic": topic,
-                    "usage_count": total_usage
-                })
-    
-    templates = templates[:100]  # Top 100 templates
-    print(f"Extracted {len(templates)} templates")
+    top_responses = list(itertools.islice(spill.iter_golden(), 5))
+    top_tags = get_top_tags(spill.iter_golden(args.batch_size))
+    spill.close()
+    spill_path.unlink()
     
     # Generate stats
+    total_golden = summary["count"]
     stats = {
         "total_analyzed": total_analyzed,
-        "total_golden": len(golden_responses),
+        "total_golden": total_golden,
         "total_templates": len(templates),
-        "avg_quality_score": round(sum(r["quality_score"] for r in golden_responses) / max(len(golden_responses), 1), 3),
-        "avg_reuse_count": round(sum(r["reuse_count"] for r in golden_responses) / max(len(golden_responses), 1), 1),
-        "top_tags": get_top_tags(golden_responses),
-        "quality_distribution": {
-            "high": len([r for r in golden_responses if r["quality_score"] >= 0.7]),
-            "medium": len([r for r in golden_responses if 0.4 <= r["quality_score"] < 0.7]),
-            "low": len([r for r in golden_responses if r["quality_score"] < 0.4])
-        },
+        "avg_quality_score": round(summary["quality_score"] / max(total_golden, 1), 3),
+        "avg_reuse_count": round(summary["reuse_count"] / max(total_golden, 1), 1),
+        "top_tags": top_tags,
+        "quality_distribution": summary["quality_distribution"],
+        "watermark": watermark,
         "extraction_params": {
-            "min_reuse_count": 3,
+            "min_reuse_count": MIN_REUSE_COUNT,
             "min_text_length": 50,
             "max_thread_length": 10,
-            "boilerplate_filtered": True
+            "boilerplate_filtered": True,
+            "sql_filter": args.sql_filter,
+            "incremental": args.incremental,
+            "precomputed": args.precomputed,
+            "near_duplicate_threshold": NEAR_DUP_THRESHOLD,
+            "batch_size": args.batch_size
         }
     }
     
-    # Write outputs
-    with open(OUTPUT_DIR / "responses.json", "w") as f:
-        json.dump({
-            "responses": golden_responses,
-            "total_golden": len(golden_responses),
-            "total_analyzed": total_analyzed
-        }, f, indent=2)
-    
-    with open(OUTPUT_DIR / "templates.json", "w") as f:
-        json.dump({"templates": templates}, f, indent=2)
-    
-    with open(OUTPUT_DIR / "stats.json", "w") as f:
+    # Stage timings go last so they cover every other output
+    stats["performance"] = recorder.summary()
+    with open(output_dir / "stats.json", "w") as f:
         json.dump(stats, f, indent=2)
+    output_dir = cache.commit(cache_key, manifest)
+    if args.incremental:
+        # Only now that the outputs exist do these conversations count as processed
+        conn.execute("COMMIT")
     
-    print(f"\nOutputs written to {OUTPUT_DIR}")
-    print(f"  - responses.json: {len(golden_responses)} golden responses")
+    print(f"\nOutputs written to {output_dir} (latest -> {cache_key})")
+    print(f"  - responses.json: {total_golden} golden responses")
     print(f"  - templates.json: {len(templates)} templates")
+    print(f"  - templates.index.npz: template suggestion index")
     print(f"  - stats.json: extraction statistics")
+    if args.parquet:
+        print(f"  - responses.parquet, templates.parquet: columnar copies")
     
     # Print top 5 for verification
     print("\n=== TOP 5 GOLDEN RESPONSES ===")
-    for r in golden_responses[:5]:
+    for r in top_responses:
         print(f"\n[{r['id']}] Score: {r['quality_score']}, Reuse: {r['reuse_count']}, Thread: {r['avg_thread_length']}")
         print(f"Tags: {r['associated_tags']}")
         print(f"Text: {r['text'][:200]}...")
+    
+    if args.trace:
+        recorder.print_summary()
+
+def write_responses_json(responses, path: Path, total_analyzed: int) -> dict:
+    """Stream golden responses into responses.json, formatted as json.dump(..., indent=2) would.
+
+    Returns the count, score and reuse totals and quality distribution for stats.json.
+    """
+    summary = {"count": 0, "quality_score": 0.0, "reuse_count": 0,
+               "quality_distribution": {"high": 0, "medium": 0, "low": 0}}
+    with open(path, "w") as f:
+        f.write('{\n  "responses": [')
+        for r in responses:
+            f.write("," if summary["count"] else "")
+            f.write("\n    " + json.dumps(r, indent=2).replace("\n", "\n    "))
+            summary["count"] += 1
+            summary["quality_score"] += r["quality_score"]
+            summary["reuse_count"] += r["reuse_count"]
+            level = "high" if r["quality_score"] >= 0.7 else "medium" if r["quality_score"] >= 0.4 else "low"
+            summary["quality_distribution"][level] += 1
+        f.write("\n  ]" if summary["count"] else "]")
+        f.write(f',\n  "total_golden": {summary["count"]},\n  "total_analyzed": {total_analyzed}\n}}')
+    return summary
 
 def extract_topic(template: str) -> str:
     """Extract likely topic from template text."""
-    keywords = {
-        "transfer": ["transfer", "move", "change email"],
-        "refund": ["refund", "money back", "cancel"],
-        "access": ["access", "login", "password", "can't log"],
-        "discount": ["discount", "coupon", "code", "ppp"],
-        "team": ["team", "license", "seats"],
-        "invoice": ["invoice", "receipt", "tax"],
-        "download": ["download", "zip", "video"],
-        "content": ["module", "lesson", "workshop", "course"],
-    }
-    template_lower = template.lower()
-    for topic, terms in keywords.items():
-        if any(term in template_lower for term in terms):
-            return topic
-    return "general"
+    return TOPIC_MATCHER.classify(template)
 
 def get_top_tags(responses: list) -> list:
     """Get most common tags across responses."""
@@ -237,4 +1087,4 @@ def get_top_tags(responses: list) -> list:
     return sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:15]
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
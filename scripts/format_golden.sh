@@ -2,42 +2,38 @@
 # Format golden responses into final artifact format
 
 cd ~/Code/skillrecordings/support
-OUTPUT_DIR="artifacts/phase-0/golden/v1"
+GOLDEN_DIR="artifacts/phase-0/golden/latest"
+# Written beside the extraction cache entries rather than into one
+OUTPUT_DIR="artifacts/phase-0/golden/formatted"
 
-# Create responses.json with proper format
-cat "$OUTPUT_DIR/raw_responses.json" | jq '
-  . as $all |
+# Reformats the extractor's responses.json (run extract_golden_responses.py first)
+if [ ! -f "$GOLDEN_DIR/responses.json" ]; then
+  echo "No responses.json in $GOLDEN_DIR" >&2
+  exit 1
+fi
+mkdir -p "$OUTPUT_DIR"
+
+# Create responses.json with proper format (topics from scripts/topics.json)
+TOTAL_ANALYZED=$(jq '.total_analyzed' "$GOLDEN_DIR/responses.json")
+jq '.responses' "$GOLDEN_DIR/responses.json" \
+  | python3 scripts/topic_matcher.py --field text \
+  | jq --argjson total_analyzed "$TOTAL_ANALYZED" '
   {
     responses: [
-      .[] | . as $r | {
-        id: ("gr_" + (($all | index($r)) + 1 | tostring | if length == 1 then "00" + . elif length == 2 then "0" + . else . end)),
-        text: .response,
-        template: (
-          .response
-          | gsub("(?<email>[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Za-z]{2,})"; "{email}")
-          | gsub("\\$[0-9]+(\\.[0-9]{2})?"; "{amount}")
-        ),
+      .[] | {
+        id: .id,
+        text: .text,
+        template: .template,
         reuse_count: .reuse_count,
         avg_thread_length: .avg_thread_length,
-        source_conversations: .conversation_ids,
+        source_conversations: .source_conversations,
         quality_score: .quality_score,
         text_length: .text_length,
-        topic: (
-          if (.response | test("refund"; "i")) then "refund"
-          elif (.response | test("transfer|move.*email|change.*email"; "i")) then "transfer"
-          elif (.response | test("invoice|receipt"; "i")) then "invoice"
-          elif (.response | test("discord|community"; "i")) then "community"
-          elif (.response | test("download|video|zip"; "i")) then "download"
-          elif (.response | test("license|seat|team"; "i")) then "license"
-          elif (.response | test("coupon|discount|ppp"; "i")) then "discount"
-          elif (.response | test("access|login|password"; "i")) then "access"
-          else "general"
-          end
-        )
+        topic: .topic
       }
     ],
     total_golden: length,
-    total_analyzed: length
+    total_analyzed: $total_analyzed
   }
 ' > "$OUTPUT_DIR/responses.json"
 
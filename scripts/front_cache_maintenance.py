@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Front Cache Maintenance - precomputed tables for the FAQ mining scripts
+
+Materializes and incrementally refreshes two tables in front-cache.db:
+  - thread_stats: message counts per conversation
+  - message_fingerprints: 64-bit hash (the first half of its md5) of the
+    normalized text of every outbound message
+
+extract_golden_responses.py --precomputed joins on these instead of
+re-aggregating messages and grouping on raw body_text every run, and
+refuses to when stale_conversations() finds any the tables don't reflect.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+import duckdb
+
+# Paths
+DB_PATH = Path.home() / "skill/data/front-cache.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_stats (
+  conversation_id VARCHAR PRIMARY KEY,
+  msg_count INTEGER NOT NULL,
+  outbound_count INTEGER NOT NULL,
+  last_message_at TIMESTAMP,
+  refreshed_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS message_fingerprints (
+  message_id VARCHAR PRIMARY KEY,
+  conversation_id VARCHAR NOT NULL,
+  fingerprint UBIGINT NOT NULL,
+  text_length INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS fingerprint_method (
+  expression VARCHAR NOT NULL
+);
+"""
+
+# Case and whitespace don't make two responses different. Fingerprints are
+# persisted, so they're taken from md5 rather than hash(), which may change
+# between DuckDB versions.
+FINGERPRINT_SQL = r"('0x' || left(md5(lower(trim(regexp_replace(m.body_text, '\s+', ' ', 'g')))), 16))::UBIGINT"
+
+# Conversations that are new or whose last_message_at moved since thread_stats
+# was refreshed
+STALE_CONVERSATIONS_SQL = """
+SELECT c.id, c.last_message_at
+FROM conversations c
+LEFT JOIN thread_stats ts ON ts.conversation_id = c.id
+WHERE ts.conversation_id IS NULL
+   OR c.last_message_at IS DISTINCT FROM ts.last_message_at
+"""
+
+def stale_conversations(conn) -> int:
+    """Number of conversations a refresh would recount; 0 means the tables are current."""
+    refreshed, = conn.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'thread_stats'"
+    ).fetchone()
+    if not refreshed:
+        count, = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()
+    else:
+        count, = conn.execute(f"SELECT COUNT(*) FROM ({STALE_CONVERSATIONS_SQL})").fetchone()
+    return count
+
+def refresh(conn, full: bool = False) -> dict:
+    """Refresh thread_stats and message_fingerprints.
+
+    Only conversations whose last_message_at moved since the previous refresh
+    (or that were never seen) are recounted and fingerprinted, unless full.
+    Their old rows are dropped first, so deleted messages lose their
+    fingerprints, and rows of conversations no longer in the cache go too.
+    Fingerprints computed with a different FINGERPRINT_SQL can't be grouped
+    with new ones, so a change of expression forces a full refresh.
+    """
+    conn.execute(SCHEMA)
+    conn.execute("BEGIN TRANSACTION")
+    stored = conn.execute("SELECT expression FROM fingerprint_method").fetchone()
+    if stored != (FINGERPRINT_SQL,):
+        full = True
+        conn.execute("DELETE FROM fingerprint_method")
+        conn.execute("INSERT INTO fingerprint_method VALUES (?)", [FINGERPRINT_SQL])
+    if full:
+        conn.execute("DELETE FROM thread_stats")
+        conn.execute("DELETE FROM message_fingerprints")
+
+    conn.execute(f"CREATE OR REPLACE TEMP TABLE touched AS {STALE_CONVERSATIONS_SQL}")
+    conn.execute("""
+    CREATE OR REPLACE TEMP TABLE removed AS
+    SELECT conversation_id AS id FROM thread_stats
+    WHERE conversation_id NOT IN (SELECT id FROM conversations)
+    """)
+
+    for table in ("thread_stats", "message_fingerprints"):
+        conn.execute(f"""
+        DELETE FROM {table}
+        WHERE conversation_id IN (SELECT id FROM touched UNION ALL SELECT id FROM removed)
+        """)
+    conn.execute("""
+    INSERT INTO thread_stats
+    SELECT
+      t.id,
+      COUNT(m.id),
+      COUNT(m.id) FILTER (WHERE m.is_inbound = false),
+      t.last_message_at,
+      now()
+    FROM touched t
+    LEFT JOIN messages m ON m.conversation_id = t.id
+    GROUP BY t.id, t.last_message_at
+    """)
+
+    conn.execute(f"""
+    INSERT INTO message_fingerprints
+    SELECT m.id, m.conversation_id, {FINGERPRINT_SQL}, LENGTH(m.body_text)
+    FROM messages m
+    JOIN touched t ON t.id = m.conversation_id
+    WHERE m.is_inbound = false
+      AND m.body_text IS NOT NULL
+    ON CONFLICT (message_id) DO UPDATE SET
+      conversation_id = excluded.conversation_id,
+      fingerprint = excluded.fingerprint,
+      text_length = excluded.text_length
+    """)
+    conn.execute("COMMIT")
+
+    touched, = conn.execute("SELECT COUNT(*) FROM touched").fetchone()
+    removed, = conn.execute("SELECT COUNT(*) FROM removed").fetchone()
+    threads, = conn.execute("SELECT COUNT(*) FROM thread_stats").fetchone()
+    fingerprints, = conn.execute("SELECT COUNT(*) FROM message_fingerprints").fetchone()
+    return {
+        "touched_conversations": touched,
+        "removed_conversations": removed,
+        "thread_stats": threads,
+        "message_fingerprints": fingerprints,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="Path to front-cache.db")
+    parser.add_argument("--full", action="store_true", help="Rebuild both tables from scratch")
+    args = parser.parse_args()
+
+    print(f"Refreshing precomputed tables in {args.db}...")
+    conn = duckdb.connect(str(args.db))
+    counts = refresh(conn, full=args.full)
+    print(f"  Refreshed {counts['touched_conversations']} conversations")
+    print(f"  Removed {counts['removed_conversations']} conversations no longer in the cache")
+    print(f"  thread_stats: {counts['thread_stats']} rows")
+    print(f"  message_fingerprints: {counts['message_fingerprints']} rows")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Stage Metrics - per-stage timing and memory for the pipeline scripts
+
+A StageRecorder times named stages of a run:
+
+    recorder = StageRecorder("cluster_analysis", trace_path=args.trace)
+    with recorder.stage("load") as stage:
+        df = load_embeddings()
+        stage["rows"] = len(df)
+
+Each stage records wall and CPU seconds, the peak RSS so far and,
+with track_allocations, the peak of Python/NumPy allocations inside the
+stage (tracemalloc, which slows allocation-heavy code noticeably). CPU
+time and peak RSS include finished child processes (worker pools, the
+duckdb CLI), since that is where some scripts do their work. The
+scripts write recorder.summary() into their metrics.json/stats.json, and
+every record is also appended to the JSONL trace file when one is given.
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+def peak_rss_mb():
+    """Peak resident set size of this process or its largest finished child so far, in MB.
+
+    None where the resource module is unavailable.
+    """
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def cpu_seconds():
+    """CPU time of this process plus all finished child processes."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+class StageRecorder:
+    """Collects one record per stage, in the order stages finish."""
+
+    def __init__(self, script, trace_path=None, track_allocations=False):
+        self.script = script
+        self.trace_path = trace_path
+        self.track_allocations = track_allocations
+        self.records = []
+        if track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time the enclosed block; set stage["rows"] inside it to record a row count."""
+        record = {"stage": name, "rows": rows}
+        started_at = datetime.now(timezone.utc).isoformat()
+        wall = time.perf_counter()
+        cpu = cpu_seconds()
+        if self.track_allocations:
+            tracemalloc.reset_peak()
+        try:
+            yield record
+        finally:
+            record.update(
+                started_at=started_at,
+                wall_seconds=round(time.perf_counter() - wall, 4),
+                cpu_seconds=round(cpu_seconds() - cpu, 4),
+                peak_rss_mb=round(peak_rss_mb(), 1) if resource is not None else None,
+            )
+            if self.track_allocations:
+                record["peak_allocated_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            self.records.append(record)
+            self._trace(record)
+
+    def timed(self, name=None):
+        """Decorator form of stage(); the stage name defaults to the function name."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _trace(self, record):
+        if self.trace_path is None:
+            return
+        with open(self.trace_path, "a") as f:
+            f.write(json.dumps({"script": self.script, **record}) + "\n")
+
+    def summary(self):
+        """Stage records plus run totals, for the script's metrics/stats output."""
+        return {
+            "stages": self.records,
+            "total_wall_seconds": round(sum(r["wall_seconds"] for r in self.records), 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+        }
+
+    def print_summary(self):
+        print(f"\n{'stage':<28} {'rows':>10} {'wall s':>9} {'cpu s':>9} {'peak RSS MB':>12}")
+        for r in self.records:
+            rows = "" if r["rows"] is None else r["rows"]
+            rss = "" if r["peak_rss_mb"] is None else f"{r['peak_rss_mb']:.1f}"
+            print(f"{r['stage']:<28} {rows:>10} {r['wall_seconds']:>9.3f} {r['cpu_seconds']:>9.3f} {rss:>12}")
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Template Index - fast golden template suggestions for incoming messages
+
+Builds a BM25 inverted index over templates.json (optionally with a
+precomputed template embedding matrix) and serializes it as
+templates.index.npz next to it, so it loads in milliseconds instead of
+being rebuilt at startup. Repeated queries are served from an LRU cache.
+
+    python3 scripts/template_index.py build artifacts/phase-0/golden/latest/templates.json
+    python3 scripts/template_index.py suggest artifacts/phase-0/golden/latest/templates.json "how do I get a refund?"
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+
+INDEX_SUFFIX = ".index.npz"  # templates.json -> templates.index.npz
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+EMBEDDING_WEIGHT = 0.5  # Share of the score from cosine similarity when embeddings are used
+CACHE_SIZE = 4096
+
+STOP_WORDS = {
+    'the', 'a', 'an', 'is', 'was', 'are', 'were', 'i', 'you', 'my', 'your', 'to', 'for', 'of', 'and',
+    'in', 'on', 'with', 'this', 'that', 'it', 'be', 'have', 'has', 'had', 'can', 'would', 'just',
+    'if', 'me', 'we', 'us', 'as', 'at', 'but', 'not', 'so', 'do', 'does', 'did', 'will', 'or',
+}
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens without stop words or template placeholders."""
+    text = re.sub(r"\{\w+\}", " ", text.lower())
+    return [t for t in re.findall(r"[a-z0-9']+", text) if len(t) > 1 and t not in STOP_WORDS]
+
+def index_path_for(templates_path: Path) -> Path:
+    return templates_path.with_name(templates_path.stem + INDEX_SUFFIX)
+
+def _file_digest(path: Path) -> str:
+    return hashlib.md5(path.read_bytes()).hexdigest()
+
+class TemplateIndex:
+    """BM25 index over templates, stored as CSR postings.
+
+    For each term, postings hold the template rows containing it and the
+    precomputed BM25 weight of the term in that template, so scoring a query
+    is a handful of vectorized adds.
+    """
+
+    def __init__(self, ids, topics, vocab, indptr, postings, weights, embeddings=None, source_digest=""):
+        self.ids = ids
+        self.topics = topics
+        self.vocab = vocab
+        self.term_ids = {term: i for i, term in enumerate(vocab)}
+        self.indptr = indptr
+        self.postings = postings
+        self.weights = weights
+        self.embeddings = embeddings
+        self.source_digest = source_digest
+        self._cached_suggest = lru_cache(maxsize=CACHE_SIZE)(self._suggest)
+
+    @classmethod
+    def build(cls, templates: list, embeddings=None, source_digest: str = "") -> "TemplateIndex":
+        """Build the index from template records (the entries of templates.json)."""
+        docs = [tokenize(t["template"]) for t in templates]
+        doc_lengths = np.array([len(d) for d in docs], dtype=np.float32)
+        avg_length = float(doc_lengths.mean()) if len(docs) else 0.0
+
+        term_counts = {}
+        for row, doc in enumerate(docs):
+            for term in doc:
+                counts = term_counts.setdefault(term, {})
+                counts[row] = counts.get(row, 0) + 1
+
+        vocab = sorted(term_counts)
+        indptr = [0]
+        postings, weights = [], []
+        for term in vocab:
+            rows = sorted(term_counts[term])
+            tf = np.array([term_counts[term][r] for r in rows], dtype=np.float32)
+            idf = np.log(1 + (len(docs) - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[rows] / max(avg_length, 1e-9))
+            postings.extend(rows)
+            weights.extend(idf * tf * (BM25_K1 + 1) / (tf + norm))
+            indptr.append(len(postings))
+
+        if embeddings is not None:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        return cls(
+            ids=np.array([t["id"] for t in templates]),
+            topics=np.array([t.get("topic", "general") for t in templates]),
+            vocab=np.array(vocab),
+            indptr=np.array(indptr, dtype=np.int64),
+            postings=np.array(postings, dtype=np.int32),
+            weights=np.array(weights, dtype=np.float32),
+            embeddings=embeddings,
+            source_digest=source_digest,
+        )
+
+    @classmethod
+    def build_from_file(cls, templates_path: Path, embeddings_path: Path = None) -> "TemplateIndex":
+        with open(templates_path) as f:
+            templates = json.load(f)["templates"]
+        embeddings = np.load(embeddings_path) if embeddings_path else None
+        return cls.build(templates, embeddings=embeddings, source_digest=_file_digest(templates_path))
+
+    def save(self, path: Path) -> Path:
+        arrays = {
+            "ids": self.ids,
+            "topics": self.topics,
+            "vocab": self.vocab,
+            "indptr": self.indptr,
+            "postings": self.postings,
+            "weights": self.weights,
+            "source_digest": np.array(self.source_digest),
+        }
+        if self.embeddings is not None:
+            arrays["embeddings"] = self.embeddings
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "TemplateIndex":
+        with np.load(path) as data:
+            return cls(
+                ids=data["ids"],
+                topics=data["topics"],
+                vocab=data["vocab"],
+                indptr=data["indptr"],
+                postings=data["postings"],
+                weights=data["weights"],
+                embeddings=data["embeddings"] if "embeddings" in data.files else None,
+                source_digest=str(data["source_digest"]),
+            )
+
+    @classmethod
+    def for_templates(cls, templates_path: Path, embeddings_path: Path = None) -> "TemplateIndex":
+        """Load the serialized index next to templates.json, rebuilding it if stale or missing.
+
+        A rebuilt index is only kept in memory: templates.json usually sits
+        in an artifact cache entry, which must not change once committed.
+        Run the build command to write a fresh one.
+        """
+        path = index_path_for(templates_path)
+        if path.exists():
+            index = cls.load(path)
+            if index.source_digest == _file_digest(templates_path) and (
+                embeddings_path is None or index.embeddings is not None
+            ):
+                return index
+        return cls.build_from_file(templates_path, embeddings_path)
+
+    def bm25_scores(self, text: str) -> np.ndarray:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in tokenize(text):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self.indptr[term_id], self.indptr[term_id + 1]
+            scores[self.postings[lo:hi]] += self.weights[lo:hi]
+        return scores
+
+    def _suggest(self, text: str, k: int, query_embedding: tuple = None) -> tuple:
+        scores = self.bm25_scores(text)
+        if query_embedding is not None and self.embeddings is not None:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            cosine = self.embeddings @ (query / max(np.linalg.norm(query), 1e-12))
+            top = scores.max()
+            scores = (1 - EMBEDDING_WEIGHT) * (scores / top if top > 0 else scores) + EMBEDDING_WEIGHT * cosine
+
+        k = min(k, len(scores))
+        if k == 0:
+            return ()
+        top_k = np.argpartition(-scores, k - 1)[:k]
+        top_k = top_k[np.lexsort((top_k, -scores[top_k]))]
+        return tuple(
+            (str(self.ids[i]), str(self.topics[i]), float(scores[i]))
+            for i in top_k if scores[i] > 0
+        )
+
+    def suggest(self, text: str, k: int = 3, query_embedding=None) -> list:
+        """Top-k templates for a message as [{id, topic, score}], best first."""
+        if query_embedding is not None:
+            query_embedding = tuple(float(x) for x in query_embedding)
+        return [
+            {"id": template_id, "topic": topic, "score": round(score, 4)}
+            for template_id, topic, score in self._cached_suggest(text, k, query_embedding)
+        ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build and save the index next to templates.json")
+    build.add_argument("templates", type=Path)
+    build.add_argument("--embeddings", type=Path, help=".npy matrix of template embeddings, one row per template")
+
+    suggest = subparsers.add_parser("suggest", help="Suggest templates for a message")
+    suggest.add_argument("templates", type=Path)
+    suggest.add_argument("text")
+    suggest.add_argument("-k", type=int, default=3)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = TemplateIndex.build_from_file(args.templates, args.embeddings)
+        path = index.save(index_path_for(args.templates))
+        print(f"Indexed {len(index.ids)} templates ({len(index.vocab)} terms) -> {path}")
+        return 0
+
+    started = time.perf_counter()
+    index = TemplateIndex.for_templates(args.templates)
+    loaded = time.perf_counter()
+    suggestions = index.suggest(args.text, args.k)
+    done = time.perf_counter()
+    print(json.dumps(suggestions, indent=2))
+    print(f"load: {(loaded - started) * 1000:.1f} ms, query: {(done - loaded) * 1000:.2f} ms", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
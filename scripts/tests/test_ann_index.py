@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from ann_index import DEFAULT_NPROBE, INDEX_FILENAME, AnnIndex, benchmark, exact_search, main
+from cluster_analysis import PROJECTION_FILENAME, compute_cluster_geometry, embedding_cache_path, project
+
+DIMENSIONS = 16
+
+
+@pytest.fixture(scope="module")
+def clustered():
+    """3000 points in 6 overlapping blobs, the last 200 of them noise."""
+    rng = np.random.default_rng(0)
+    centres = rng.normal(0, 3, size=(6, DIMENSIONS))
+    labels = rng.integers(0, 6, size=3000)
+    embeddings = (centres[labels] + rng.normal(0, 1, size=(3000, DIMENSIONS))).astype(np.float32)
+    labels[-200:] = -1
+    geometry = compute_cluster_geometry(labels, embeddings)
+    return embeddings, labels, geometry
+
+
+def build(clustered, **kwargs):
+    embeddings, labels, geometry = clustered
+    return AnnIndex.build(embeddings, labels, geometry, [f"cnv_{i}" for i in range(len(embeddings))], **kwargs)
+
+
+def recall(index, embeddings, k, nprobe):
+    queries = embeddings[::30]
+    _, found = index.search(queries, k, nprobe)
+    truth = exact_search(queries, embeddings, k)
+    return sum(len(np.intersect1d(f, t)) for f, t in zip(found, truth)) / truth.size
+
+
+def test_exact_search_matches_a_full_sort(clustered):
+    embeddings = clustered[0]
+    queries = embeddings[:20]
+    dists = np.linalg.norm(queries[:, None].astype(np.float64) - embeddings[None], axis=2)
+    assert (exact_search(queries, embeddings, 10) == np.argsort(dists, axis=1, kind="stable")[:, :10]).all()
+
+
+def test_probing_every_list_is_exact(clustered):
+    embeddings = clustered[0]
+    index = build(clustered, target_list_size=128)
+    distances, rows = index.search(embeddings[:50], 10, nprobe=len(index.centres))
+    np.testing.assert_array_equal(rows, exact_search(embeddings[:50], embeddings, 10))
+    np.testing.assert_allclose(distances, np.linalg.norm(embeddings[rows] - embeddings[:50, None], axis=2), atol=1e-3)
+
+
+def test_recall_at_k_against_brute_force(clustered):
+    embeddings = clustered[0]
+    index = build(clustered, target_list_size=128)
+    assert len(index.centres) > 2 * DEFAULT_NPROBE
+    recalls = [recall(index, embeddings, 10, nprobe) for nprobe in (1, DEFAULT_NPROBE, len(index.centres))]
+    assert recalls == sorted(recalls)
+    assert recalls[1] >= 0.9
+    assert recalls[2] == 1.0
+
+
+def test_quantized_recall_against_brute_force(clustered):
+    embeddings = clustered[0]
+    index = build(clustered, target_list_size=128, pq_subspaces=4)
+    assert index.quantized
+    assert recall(index, embeddings, 10, len(index.centres)) >= 0.6
+
+
+def test_benchmark_reports_recall_per_nprobe(clustered, tmp_path):
+    embeddings = clustered[0]
+    index = AnnIndex.load(build(clustered, target_list_size=128).save(tmp_path / "ann_index.npz"))
+    report = benchmark(index, embeddings, n_queries=100, k=10, nprobes=[1, 4, 1000])
+    assert [r["nprobe"] for r in report["results"]] == [1, 4]
+    assert 0 < report["results"][0]["recall"] <= report["results"][1]["recall"] <= 1
+
+
+def test_similar_projects_only_the_query_embedding(clustered, tmp_path, monkeypatch, capsys):
+    import json
+    import sys
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Raw embeddings twice as wide as the reduced ones, mapped back by a stored projection
+    rng = np.random.default_rng(1)
+    reduced = clustered[0]
+    components = np.linalg.qr(rng.normal(size=(2 * DIMENSIONS, DIMENSIONS)))[0].T.astype(np.float32)
+    mean = rng.normal(size=2 * DIMENSIONS).astype(np.float32)
+    raw = reduced @ components + mean
+    embeddings_path = tmp_path / "conversations.parquet"
+    pq.write_table(pa.table({"embedding": pa.array(list(raw), pa.list_(pa.float32()))}), embeddings_path,
+                   row_group_size=500)
+    np.savez(tmp_path / PROJECTION_FILENAME, components=components, mean=mean)
+    index = build(clustered, target_list_size=128)
+    index.save(tmp_path / INDEX_FILENAME)
+
+    monkeypatch.setattr(sys, "argv", ["ann_index.py", "--clusters", str(tmp_path), "--embeddings", str(embeddings_path),
+                                      "similar", "cnv_1234", "-k", "5"])
+    assert main() == 0
+    similar = json.loads(capsys.readouterr().out)
+
+    full = project(raw, {"components": components, "mean": mean})
+    distances, rows = index.search(full[1234], 6)
+    expected = [(f"cnv_{row}", round(float(dist), 4)) for dist, row in zip(distances[0], rows[0]) if row != 1234][:5]
+    assert [(entry["conversation_id"], entry["distance"]) for entry in similar] == expected
+    # The whole matrix was never read, so no sidecar was cached for it
+    assert not embedding_cache_path(embeddings_path).exists()
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from artifact_cache import ArtifactCache, _pid_running
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(tmp_path / "cache", "stage")
+
+
+def dead_pid():
+    return next(pid for pid in range(4_000_000, 3_000_000, -1) if not _pid_running(pid))
+
+
+def build(cache, key, content):
+    out = cache.begin(key)
+    (out / "result.txt").write_text(content)
+    return cache.commit(key, {"key": key})
+
+
+def test_begin_leaves_staging_of_running_processes(cache):
+    cache.root.mkdir()
+    live = cache.root / f".abc.partial-{os.getppid()}"
+    dead = cache.root / f".abc.partial-{dead_pid()}"
+    other_key = cache.root / f".def.partial-{dead_pid()}"
+    for path in (live, dead, other_key):
+        path.mkdir()
+
+    cache.begin("abc")
+    assert live.exists()
+    assert not dead.exists()
+    assert other_key.exists()
+
+
+def test_rebuilding_an_entry_swaps_it_in_place(cache):
+    first = build(cache, "abc", "first")
+    first_data = cache.root / os.readlink(first)
+    second = build(cache, "abc", "second")
+
+    assert second.is_symlink()
+    assert cache.lookup("abc") == second
+    assert (second / "result.txt").read_text() == "second"
+    assert not first_data.exists()
+    assert (cache.root / "latest" / "result.txt").read_text() == "second"
+    assert sorted(p.name for p in cache.root.iterdir() if p.name.startswith(".abc.")) == [os.readlink(second)]
+
+
+def test_directory_entries_are_replaced(cache):
+    legacy = cache.root / "abc"
+    legacy.mkdir(parents=True)
+    (legacy / "result.txt").write_text("legacy")
+
+    entry = build(cache, "abc", "new")
+    assert entry.is_symlink()
+    assert (entry / "result.txt").read_text() == "new"
+    assert [p.name for p in cache.root.iterdir() if p.name.startswith(".abc.")] == [os.readlink(entry)]
+
+
+def test_commit_keeps_the_most_recent_entries(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", "stage", keep=2)
+    for key in ("aaaaaaaaaaaaaaaa", "bbbbbbbbbbbbbbbb", "cccccccccccccccc"):
+        build(cache, key, key)
+    assert cache.lookup("aaaaaaaaaaaaaaaa") is None
+    assert [key for key in ("bbbbbbbbbbbbbbbb", "cccccccccccccccc") if cache.lookup(key)] == ["bbbbbbbbbbbbbbbb", "cccccccccccccccc"]
+    assert not [p for p in cache.root.iterdir() if p.name.startswith(".aaaaaaaaaaaaaaaa.")]
+
+    # A hit re-points latest at an older entry, which is kept over newer ones
+    cache.publish("bbbbbbbbbbbbbbbb")
+    assert cache.prune(1) == ["cccccccccccccccc"]
+    assert sorted(p.name for p in cache.root.iterdir() if not p.name.startswith(".")) == ["bbbbbbbbbbbbbbbb", "latest"]
@@ -0,0 +1,207 @@
+import numpy as np
+import pytest
+from sklearn.metrics import silhouette_score
+
+from cluster_analysis import calculate_metrics, calculate_silhouette
+
+
+def blobs(sizes, dims=8, spread=1.0, seed=0):
+    """Gaussian blobs with the given sizes, and their labels."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((len(sizes), dims)) * 6
+    embeddings = np.concatenate([center + rng.standard_normal((size, dims)) * spread for center, size in zip(centers, sizes)])
+    labels = np.repeat(np.arange(len(sizes)), sizes)
+    return embeddings.astype(np.float32), labels
+
+
+@pytest.mark.parametrize("memory_mb", [1024, 0.001])  # One chunk, or a few rows per chunk
+def test_exact_silhouette_matches_sklearn(memory_mb):
+    embeddings, labels = blobs([40, 25, 1, 30])  # Cluster 2 is a singleton
+    labels[::7] = -1  # Noise is left out of the score
+    metrics = calculate_metrics(embeddings, labels, silhouette_mode="exact", memory_mb=memory_mb)
+    mask = labels != -1
+    expected = silhouette_score(embeddings[mask].astype(np.float64), labels[mask])
+    assert metrics["silhouette_method"] == {"mode": "exact", "sample_size": int(mask.sum())}
+    assert metrics["silhouette_score"] == pytest.approx(expected, abs=1e-9)
+
+
+def test_sampled_silhouette_is_close_to_exact():
+    embeddings, labels = blobs([1500, 900, 400, 200], spread=3.0)
+    exact, _ = calculate_silhouette(embeddings, labels, mode="exact")
+    sampled, method = calculate_silhouette(embeddings, labels, mode="sampled", sample_size=400)
+    assert method["mode"] == "sampled"
+    assert 400 <= method["sample_size"] <= 410
+    assert sampled == pytest.approx(exact, abs=0.02)
+    low, high = method["ci_95"]
+    assert low <= sampled <= high
+
+
+def test_sweep_labels_match_direct_hdbscan_fits():
+    from sklearn.cluster import HDBSCAN
+    from cluster_analysis import sweep_clustering
+
+    # Uneven blob sizes, so larger min_cluster_size values drop or merge clusters
+    embeddings, _ = blobs([120, 60, 25, 12, 8], spread=1.5, seed=3)
+    param_sets = [
+        {"min_cluster_size": k, "min_samples": m} for m in (3, 8) for k in (5, 10, 20, 50)
+    ]
+    swept = sweep_clustering(embeddings, param_sets, workers=2)
+    assert set(swept) == {(p["min_cluster_size"], p["min_samples"]) for p in param_sets}
+    for (k, m), labels in swept.items():
+        expected = HDBSCAN(min_cluster_size=k, min_samples=m, metric="euclidean").fit_predict(embeddings)
+        np.testing.assert_array_equal(labels, expected, err_msg=f"min_cluster_size={k}, min_samples={m}")
+    assert len({tuple(labels) for labels in swept.values()}) > 1
+
+
+def test_cluster_geometry_matches_per_cluster_numpy():
+    from cluster_analysis import compute_cluster_geometry
+
+    rng = np.random.default_rng(5)
+    embeddings = rng.standard_normal((12, 3)).astype(np.float32)
+    labels = np.array([2, 0, -1, 2, 0, 5, 2, -1, 0, 2, 5, 0])
+    geometry = compute_cluster_geometry(labels, embeddings, n_samples=3)
+
+    assert geometry["cluster_ids"].tolist() == [0, 2, 5]
+    assert geometry["sizes"].tolist() == [4, 4, 2]
+    assert np.isnan(geometry["distances"][labels == -1]).all()
+    for i, cluster_id in enumerate([0, 2, 5]):
+        members = np.flatnonzero(labels == cluster_id)
+        centroid = embeddings[members].astype(np.float64).mean(axis=0)
+        distances = np.linalg.norm(embeddings[members] - centroid, axis=1)
+        np.testing.assert_allclose(geometry["centroids"][i], centroid)
+        np.testing.assert_allclose(geometry["distances"][members], distances, rtol=1e-6)
+        assert geometry["closest"][cluster_id].tolist() == members[np.argsort(distances, kind="stable")][:3].tolist()
+        # The label-sorted order slices out each cluster's members
+        start = geometry["starts"][i]
+        assert sorted(geometry["order"][start:start + len(members)].tolist()) == members.tolist()
+
+
+@pytest.fixture
+def clustered_messages():
+    import pandas as pd
+
+    df = pd.DataFrame({
+        "first_message": [
+            "Refund please, refund the invoice",
+            "Need a refund for my invoice",
+            "Ignored noise message about refunds",
+            "Password reset link expired, password again",
+            "Cannot login, password reset please",
+            "Invoice copy please",
+        ],
+        "tags": [["billing", "refund"], ["refund"], ["spam"], ["access"], ["access", "login"], None],
+    })
+    labels = np.array([0, 0, -1, 1, 1, 0])
+    return df, labels
+
+
+def test_keywords_are_class_tfidf_ranked(clustered_messages):
+    from collections import Counter
+    from cluster_analysis import get_cluster_keywords
+
+    df, labels = clustered_messages
+    keywords = get_cluster_keywords(df, labels, n_keywords=3)
+
+    # c-TF-IDF by hand: words of 4+ letters per cluster, tf / cluster words x log(1 + mean words / term total)
+    counts = {c: Counter(w for text in df["first_message"][labels == c] for w in text.lower().replace(",", " ").split()
+                         if len(w) >= 4) for c in (0, 1)}
+    totals = Counter()
+    for counter in counts.values():
+        totals.update(counter)
+    mean_words = np.mean([sum(counter.values()) for counter in counts.values()])
+    for c, counter in counts.items():
+        scores = {w: n / sum(counter.values()) * np.log(1 + mean_words / totals[w]) for w, n in counter.items()}
+        expected = sorted(scores, key=lambda w: (-scores[w], w))[:3]
+        assert keywords[c] == expected
+    assert keywords[0][:2] == ["invoice", "refund"]  # Tied scores go alphabetically
+    assert keywords[1][0] == "password"
+
+
+def test_tag_counts_per_cluster(clustered_messages):
+    from cluster_analysis import get_tag_distribution_per_cluster
+
+    df, labels = clustered_messages
+    assert get_tag_distribution_per_cluster(df, labels) == {
+        0: {"top_tags": [["refund", 2], ["billing", 1]], "tag_coverage": 2 / 3, "unique_tags": 2, "cluster_size": 3},
+        1: {"top_tags": [["access", 2], ["login", 1]], "tag_coverage": 1.0, "unique_tags": 2, "cluster_size": 2},
+    }
+
+
+def write_embeddings(path, embeddings):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.table({"embedding": pa.array(list(embeddings), pa.list_(pa.float32()))}), path)
+
+
+def test_embedding_sidecar_is_reused_until_the_parquet_changes(tmp_path):
+    import os
+    from cluster_analysis import embedding_cache_path, load_embedding_matrix
+
+    path = tmp_path / "conversations.parquet"
+    first = np.random.default_rng(0).standard_normal((20, 6)).astype(np.float32)
+    write_embeddings(path, first)
+    sidecar = embedding_cache_path(path)
+
+    loaded = load_embedding_matrix(path)  # Missing sidecar: read from parquet and cached
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, first)
+    assert sidecar.exists()
+
+    # A fresh sidecar is memory-mapped as is, even if it disagrees with the parquet
+    marker = np.full_like(first, 7)
+    np.save(sidecar, marker)
+    np.testing.assert_array_equal(load_embedding_matrix(path), marker)
+
+    # Older than the parquet: read from parquet again
+    stat = path.stat()
+    os.utime(sidecar, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+    np.testing.assert_array_equal(load_embedding_matrix(path), first)
+
+    # Fresh but from a parquet with a different number of rows
+    second = np.random.default_rng(1).standard_normal((25, 6)).astype(np.float32)
+    write_embeddings(path, second)
+    np.save(sidecar, first)
+    os.utime(sidecar, ns=(stat.st_atime_ns, path.stat().st_mtime_ns + 10**9))
+    np.testing.assert_array_equal(load_embedding_matrix(path), second)
+
+
+def test_embedding_row_is_read_from_its_row_group_or_the_sidecar(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from cluster_analysis import embedding_cache_path, read_embedding_row
+
+    path = tmp_path / "conversations.parquet"
+    embeddings = np.random.default_rng(0).standard_normal((20, 6)).astype(np.float32)
+    pq.write_table(pa.table({"embedding": pa.array(list(embeddings), pa.list_(pa.float32()))}), path, row_group_size=7)
+    assert pq.ParquetFile(path).num_row_groups == 3
+    for row in (0, 6, 7, 13, 19):
+        np.testing.assert_array_equal(read_embedding_row(row, path), embeddings[row])
+    with pytest.raises(IndexError):
+        read_embedding_row(20, path)
+    assert not embedding_cache_path(path).exists()
+
+    marker = np.full_like(embeddings, 7)
+    np.save(embedding_cache_path(path), marker)
+    np.testing.assert_array_equal(read_embedding_row(13, path), marker[13])
+
+
+def test_incremental_pca_matches_full_pca():
+    from cluster_analysis import reduce_dimensions
+
+    rng = np.random.default_rng(2)
+    # Well separated component variances, so each component is determined up to sign
+    scales = np.array([10, 8, 6, 4, 2] + [0.1] * 27)
+    rotation, _ = np.linalg.qr(rng.standard_normal((32, 32)))
+    embeddings = ((rng.standard_normal((3000, 32)) * scales) @ rotation + 5).astype(np.float32)
+
+    full, full_variance, full_projection = reduce_dimensions(embeddings, n_components=5)
+    incremental, incremental_variance, projection = reduce_dimensions(
+        embeddings, n_components=5, method="incremental", batch_size=500,
+    )
+    assert str(projection["method"]) == "IncrementalPCA"
+    assert incremental_variance == pytest.approx(full_variance, rel=1e-4)
+    np.testing.assert_allclose(projection["explained_variance_ratio"], full_projection["explained_variance_ratio"], rtol=1e-3)
+    # Same components up to sign, so the reduced coordinates agree up to sign
+    signs = np.sign((full * incremental).sum(axis=0))
+    np.testing.assert_allclose(incremental * signs, full, atol=1e-3)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from cluster_analysis import compute_cluster_geometry
+from cluster_assign import MAX_EXEMPLARS_PER_CLUSTER, ClusterModel, build_cluster_model
+
+DIMENSIONS = 5
+IDENTITY_PROJECTION = {"components": np.eye(DIMENSIONS, dtype=np.float32), "mean": np.zeros(DIMENSIONS, dtype=np.float32)}
+
+
+def blobs(sizes, seed=0):
+    """Gaussian blobs 10 apart with 0-based labels, plus a few noise points."""
+    rng = np.random.default_rng(seed)
+    embeddings = [rng.normal(10 * i, 1, size=(size, DIMENSIONS)) for i, size in enumerate(sizes)]
+    labels = [np.full(size, i) for i, size in enumerate(sizes)]
+    embeddings.append(rng.uniform(-50, -40, size=(5, DIMENSIONS)))
+    labels.append(np.full(5, -1))
+    return np.vstack(embeddings).astype(np.float32), np.concatenate(labels)
+
+
+def model_for(embeddings, labels, min_samples):
+    geometry = compute_cluster_geometry(labels, embeddings)
+    arrays = build_cluster_model(embeddings, labels, geometry, IDENTITY_PROJECTION, min_samples)
+    return ClusterModel(arrays), geometry
+
+
+def test_training_points_are_assigned_back_to_their_cluster():
+    embeddings, labels = blobs([300, 120, 40])
+    model, geometry = model_for(embeddings, labels, min_samples=5)
+    clustered = labels != -1
+    predicted, distances = model.predict(embeddings[clustered])
+
+    # Everything within its cluster's threshold keeps its label; the edge is noise
+    thresholds = model.thresholds[labels[clustered]]
+    inside = geometry["distances"][clustered] <= thresholds + 1e-5
+    np.testing.assert_array_equal(predicted, np.where(inside, labels[clustered], -1))
+    assert inside.mean() > 0.9
+    np.testing.assert_allclose(distances[inside], geometry["distances"][clustered][inside], rtol=1e-4)
+
+
+def test_far_points_are_noise():
+    embeddings, labels = blobs([300, 120])
+    model, _ = model_for(embeddings, labels, min_samples=5)
+    far = np.array([[100.0] * DIMENSIONS, [-45.0] * DIMENSIONS, [5.0] * DIMENSIONS], dtype=np.float32)
+    predicted, distances = model.predict(far)
+    assert (predicted == -1).all()
+    assert np.isnan(distances).all()
+
+
+def test_exemplars_are_capped_per_cluster():
+    embeddings, labels = blobs([300, 40])
+    model, _ = model_for(embeddings, labels, min_samples=5)
+    assert np.bincount(model.exemplar_labels).tolist() == [MAX_EXEMPLARS_PER_CLUSTER, 40]
+
+
+@pytest.mark.parametrize("min_samples", [1, 2, 5])
+def test_core_distances_count_the_point_itself(min_samples):
+    embeddings, labels = blobs([30])
+    model, _ = model_for(embeddings, labels, min_samples=min_samples)
+    exemplars = model.exemplars.astype(np.float64)
+    dists = np.linalg.norm(exemplars[:, None] - exemplars[None, :], axis=2)
+    # Sorted distances start with the exemplar itself at 0
+    expected = np.sort(dists, axis=1)[:, min_samples - 1]
+    np.testing.assert_allclose(model.exemplar_core_distances, expected, rtol=1e-5, atol=1e-5)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from embedding_store import load_reduced, save_reduced, store_path
+
+FITTED = {"method": "full", "dims": 50, "batch_size": None}
+
+
+@pytest.fixture
+def embeddings_path(tmp_path):
+    path = tmp_path / "conversations.parquet"
+    path.write_bytes(b"")
+    return path
+
+
+@pytest.fixture
+def projection():
+    rng = np.random.default_rng(0)
+    return {
+        "method": np.array("PCA"),
+        "components": rng.standard_normal((4, 8)).astype(np.float32),
+        "mean": rng.standard_normal(8).astype(np.float32),
+        "explained_variance_ratio": np.full(4, 0.1),
+    }
+
+
+def test_reduced_store_is_reused_with_the_same_params(embeddings_path, projection):
+    reduced = np.arange(12, dtype=np.float32).reshape(3, 4)
+    save_reduced(reduced, projection, FITTED, embeddings_path)
+
+    stored, stored_projection = load_reduced(dict(FITTED), embeddings_path)
+    np.testing.assert_array_equal(stored, reduced)
+    np.testing.assert_array_equal(stored_projection["components"], projection["components"])
+
+
+@pytest.mark.parametrize("params", [
+    {**FITTED, "method": "incremental", "batch_size": 10_000},
+    {**FITTED, "dims": 20},
+    {"projection": "0" * 64},
+])
+def test_reduced_store_is_ignored_with_other_params(embeddings_path, projection, params):
+    save_reduced(np.zeros((3, 4), dtype=np.float32), projection, FITTED, embeddings_path)
+    assert load_reduced(params, embeddings_path) is None
+
+
+def test_reduced_store_without_params_is_ignored(embeddings_path, projection):
+    np.savez(store_path("reduced", embeddings_path), reduced=np.zeros((3, 4), dtype=np.float32),
+             **{f"projection_{key}": value for key, value in projection.items()})
+    assert load_reduced(FITTED, embeddings_path) is None
+
+
+def test_float64_reduction_stays_in_double_precision():
+    from cluster_analysis import reduce_dimensions
+
+    rng = np.random.default_rng(0)
+    # Offsets far larger than the spread lose most of it to float32 rounding
+    embeddings = 1e4 + rng.standard_normal((200, 16))
+    reduced, _, projection = reduce_dimensions(embeddings, n_components=4, dtype=np.float64)
+    assert reduced.dtype == projection["components"].dtype == projection["mean"].dtype == np.float64
+    expected = (embeddings - embeddings.mean(axis=0)) @ projection["components"].T
+    np.testing.assert_allclose(reduced, expected, atol=1e-9)
+
+    single, _, _ = reduce_dimensions(embeddings, n_components=4)
+    assert single.dtype == np.float32
+    assert np.abs(np.abs(single) - np.abs(reduced)).max() > 1e-6
+
+
+def test_report_baseline_keeps_the_parquet_precision(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from embedding_store import quantization_report
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((3, 64)) * 5
+    embeddings = np.concatenate([center + rng.standard_normal((100, 64)) * 0.1 for center in centers]) + 1e3
+    path = tmp_path / "conversations.parquet"
+    pq.write_table(pa.table({"embedding": pa.array(list(embeddings), pa.list_(pa.float64(), 64))}), path)
+
+    report = quantization_report(min_cluster_size=10, min_samples=5, embeddings_path=path)
+    [float32] = [entry for entry in report["stores"] if entry["kind"] == "float32"]
+    # Against its own float32 copy the error would be exactly 0
+    expected = np.linalg.norm(embeddings.astype(np.float32) - embeddings) / np.linalg.norm(embeddings)
+    assert float32["relative_error"] == pytest.approx(expected)
+    assert float32["relative_error"] > 0
+    assert report["baseline_num_clusters"] == 3
@@ -0,0 +1,94 @@
+import hashlib
+import sys
+
+import duckdb
+import pytest
+
+import extract_golden_responses
+from front_cache_maintenance import FINGERPRINT_SQL, refresh, stale_conversations
+
+
+def md5_fingerprint(text):
+    return int(hashlib.md5(" ".join(text.split()).lower().encode()).hexdigest()[:16], 16)
+
+
+@pytest.fixture
+def front_cache():
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE conversations (id VARCHAR, last_message_at TIMESTAMP)")
+    conn.execute("CREATE TABLE messages (id VARCHAR, conversation_id VARCHAR, is_inbound BOOLEAN, body_text VARCHAR)")
+    conn.execute("INSERT INTO conversations VALUES ('cnv_1', '2026-01-01')")
+    conn.execute("INSERT INTO messages VALUES ('msg_1', 'cnv_1', true, 'Where is my invoice?')")
+    conn.execute("INSERT INTO messages VALUES ('msg_2', 'cnv_1', false, '  Your invoice is\n attached.  ')")
+    yield conn
+    conn.close()
+
+
+def fingerprints(conn):
+    return dict(conn.execute("SELECT message_id, fingerprint FROM message_fingerprints").fetchall())
+
+
+def test_fingerprints_are_md5_of_the_normalized_text(front_cache):
+    refresh(front_cache)
+    assert fingerprints(front_cache) == {"msg_2": md5_fingerprint("Your invoice is attached.")}
+
+
+def test_edited_messages_are_fingerprinted_again(front_cache):
+    refresh(front_cache)
+    front_cache.execute("UPDATE messages SET body_text = 'Your receipt is attached.' WHERE id = 'msg_2'")
+    front_cache.execute("UPDATE conversations SET last_message_at = '2026-01-02'")
+    refresh(front_cache)
+    assert fingerprints(front_cache) == {"msg_2": md5_fingerprint("Your receipt is attached.")}
+
+
+def test_fingerprints_from_another_expression_are_rebuilt(front_cache):
+    refresh(front_cache)
+    front_cache.execute("UPDATE fingerprint_method SET expression = 'hash(m.body_text)'")
+    front_cache.execute("UPDATE message_fingerprints SET fingerprint = 0")
+    counts = refresh(front_cache)
+    assert counts["touched_conversations"] == 1
+    assert fingerprints(front_cache) == {"msg_2": md5_fingerprint("Your invoice is attached.")}
+    assert front_cache.execute("SELECT expression FROM fingerprint_method").fetchall() == [(FINGERPRINT_SQL,)]
+
+
+def test_deleted_messages_lose_their_fingerprints(front_cache):
+    front_cache.execute("INSERT INTO messages VALUES ('msg_3', 'cnv_1', false, 'Anything else?')")
+    refresh(front_cache)
+    front_cache.execute("DELETE FROM messages WHERE id = 'msg_3'")
+    front_cache.execute("UPDATE conversations SET last_message_at = '2026-01-02'")
+    refresh(front_cache)
+    assert fingerprints(front_cache) == {"msg_2": md5_fingerprint("Your invoice is attached.")}
+    assert front_cache.execute("SELECT msg_count FROM thread_stats").fetchall() == [(2,)]
+
+
+def test_conversations_missing_from_the_cache_are_removed(front_cache):
+    refresh(front_cache)
+    front_cache.execute("DELETE FROM conversations")
+    front_cache.execute("DELETE FROM messages")
+    counts = refresh(front_cache)
+    assert counts["removed_conversations"] == 1
+    assert counts["thread_stats"] == counts["message_fingerprints"] == 0
+
+
+def test_stale_conversations_counts_what_a_refresh_would_recount(front_cache):
+    assert stale_conversations(front_cache) == 1  # Never refreshed
+    refresh(front_cache)
+    assert stale_conversations(front_cache) == 0
+    front_cache.execute("INSERT INTO conversations VALUES ('cnv_2', '2026-01-03')")
+    front_cache.execute("UPDATE conversations SET last_message_at = '2026-01-02' WHERE id = 'cnv_1'")
+    assert stale_conversations(front_cache) == 2
+
+
+def test_precomputed_extraction_refuses_stale_tables(front_cache, tmp_path, monkeypatch):
+    refresh(front_cache)
+    front_cache.execute("INSERT INTO conversations VALUES ('cnv_2', '2026-01-03')")
+    db_path = tmp_path / "front-cache.db"
+    front_cache.execute(f"ATTACH '{db_path}' AS copy")
+    front_cache.execute("COPY FROM DATABASE memory TO copy")
+    front_cache.execute("DETACH copy")
+
+    monkeypatch.setattr(extract_golden_responses, "DB_PATH", db_path)
+    monkeypatch.setattr(extract_golden_responses, "GOLDEN_DIR", tmp_path / "golden")
+    monkeypatch.setattr(sys, "argv", ["extract_golden_responses.py", "--precomputed"])
+    with pytest.raises(SystemExit, match="out of date for 1 conversations"):
+        extract_golden_responses.main()
@@ -0,0 +1,123 @@
+import gc
+import json
+import shutil
+import sys
+from datetime import datetime
+
+import duckdb
+import pytest
+
+import extract_golden_responses
+
+RESPONSE = (
+    "You can download the course videos from your account page: open the course, "
+    "then use the download button next to each module."
+)
+ARCHIVED_FIRST = [f"cnv_a{i}" for i in range(4)]
+ARCHIVED_LATER = [f"cnv_b{i}" for i in range(4)]
+
+
+def write_front_cache(path, conversations, replies=None):
+    """conversations: id -> (status, last_message_at, synced_at); all of them send RESPONSE.
+
+    replies: id -> how many times the conversation sends RESPONSE (default once).
+    """
+    conn = duckdb.connect(str(path))
+    conn.execute("""
+    CREATE OR REPLACE TABLE conversations (
+      id VARCHAR, status VARCHAR, tags VARCHAR[], created_at TIMESTAMP, last_message_at TIMESTAMP, synced_at TIMESTAMP
+    )
+    """)
+    conn.execute("CREATE OR REPLACE TABLE messages (conversation_id VARCHAR, is_inbound BOOLEAN, body_text VARCHAR)")
+    for conversation_id, (status, last_message_at, synced_at) in conversations.items():
+        conn.execute(
+            "INSERT INTO conversations VALUES (?, ?, ['downloads'], ?, ?, ?)",
+            [conversation_id, status, last_message_at, last_message_at, synced_at],
+        )
+        conn.execute("INSERT INTO messages VALUES (?, true, 'How do I download the videos?')", [conversation_id])
+        for _ in range((replies or {}).get(conversation_id, 1)):
+            conn.execute("INSERT INTO messages VALUES (?, false, ?)", [conversation_id, RESPONSE])
+    conn.close()
+
+
+@pytest.fixture
+def extract(tmp_path, monkeypatch):
+    """Run extract_golden_responses.main() against tmp_path; returns reuse counts (or another field) by response id."""
+    monkeypatch.setattr(extract_golden_responses, "DB_PATH", tmp_path / "front-cache.db")
+    monkeypatch.setattr(extract_golden_responses, "GOLDEN_DIR", tmp_path / "golden")
+
+    def run(*flags, field="reuse_count"):
+        monkeypatch.setattr(sys, "argv", ["extract_golden_responses.py", *flags])
+        extract_golden_responses.main()
+        responses = json.loads((tmp_path / "golden" / "latest" / "responses.json").read_text())["responses"]
+        return {r["id"]: r[field] for r in responses}
+
+    return run
+
+
+def test_conversations_archived_after_their_last_message_are_picked_up(tmp_path, extract):
+    db_path = tmp_path / "front-cache.db"
+    first = {cid: ("archived", datetime(2026, 1, 10), datetime(2026, 1, 11)) for cid in ARCHIVED_FIRST}
+    # Still open at the first run, archived later without a new message
+    later = {cid: ("open", datetime(2026, 1, 5), datetime(2026, 1, 6)) for cid in ARCHIVED_LATER}
+    write_front_cache(db_path, {**first, **later})
+    assert list(extract("--incremental").values()) == [4]
+
+    later = {cid: ("archived", datetime(2026, 1, 5), datetime(2026, 2, 1)) for cid in ARCHIVED_LATER}
+    write_front_cache(db_path, {**first, **later})
+    incremental = extract("--incremental")
+    assert list(incremental.values()) == [8]
+    assert extract() == incremental
+
+
+def test_reopened_conversations_are_counted_again(tmp_path, extract):
+    db_path = tmp_path / "front-cache.db"
+    first = {cid: ("archived", datetime(2026, 1, 10), datetime(2026, 1, 11)) for cid in ARCHIVED_FIRST}
+    write_front_cache(db_path, first)
+    assert list(extract("--incremental").values()) == [4]
+
+    # Two of them are reopened, answered with the same reply again and
+    # re-archived, so their threads get longer; one more is archived
+    reopened = {cid: ("archived", datetime(2026, 2, 1), datetime(2026, 2, 2)) for cid in ARCHIVED_FIRST[:2]}
+    later = {ARCHIVED_LATER[0]: ("archived", datetime(2026, 2, 1), datetime(2026, 2, 2))}
+    write_front_cache(db_path, {**first, **reopened, **later}, replies={cid: 2 for cid in reopened})
+    incremental = extract("--incremental", field="avg_thread_length")
+    full = extract(field="avg_thread_length")
+    assert incremental == full
+    assert list(full.values()) == [2.57]  # (2 threads x 2 replies x 3 messages + 3 x 1 x 2) / 7 replies
+    assert list(extract("--incremental").values()) == [5]
+
+
+def test_state_is_not_committed_when_writing_outputs_fails(tmp_path, extract, monkeypatch):
+    conversations = {cid: ("archived", datetime(2026, 1, 10), datetime(2026, 1, 11)) for cid in ARCHIVED_FIRST}
+    write_front_cache(tmp_path / "front-cache.db", conversations)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(extract_golden_responses.TemplateIndex, "build_from_file", fail)
+        with pytest.raises(OSError):
+            extract("--incremental")
+    gc.collect()  # Drop the failed run's connection and its open transaction
+
+    state = duckdb.connect(str(tmp_path / "golden" / extract_golden_responses.STATE_FILENAME))
+    assert state.execute("SELECT COUNT(*) FROM processed_conversations").fetchone() == (0,)
+    state.close()
+    assert list(extract("--incremental").values()) == [4]
+
+
+def test_cached_runs_are_keyed_on_the_incremental_state(tmp_path, extract):
+    db_path = tmp_path / "front-cache.db"
+    first = {cid: ("archived", datetime(2026, 1, 10), datetime(2026, 1, 11)) for cid in ARCHIVED_FIRST}
+    write_front_cache(tmp_path / "first.db", first)
+    later = {cid: ("archived", datetime(2026, 2, 1), datetime(2026, 2, 2)) for cid in ARCHIVED_LATER}
+    write_front_cache(tmp_path / "second.db", {**first, **later})
+
+    shutil.copyfile(tmp_path / "first.db", db_path)
+    assert list(extract("--incremental").values()) == [4]
+    shutil.copyfile(tmp_path / "second.db", db_path)
+    assert list(extract("--incremental").values()) == [8]
+    # Same front cache as the first run, but the state now counts all 8
+    shutil.copyfile(tmp_path / "first.db", db_path)
+    assert list(extract("--incremental").values()) == [8]
@@ -0,0 +1,144 @@
+import json
+import sys
+import tracemalloc
+
+import duckdb
+import numpy as np
+import pytest
+
+import extract_golden_responses
+from extract_golden_responses import MINHASH_PERMUTATIONS, CandidateSpill, group_near_duplicates, iter_candidates
+
+ROWS_PER_BAND = 8
+BASE_SIGNATURE = np.arange(MINHASH_PERMUTATIONS, dtype=np.uint64) + 1000
+
+
+def candidate(text, conversations, signature=None, row=0):
+    [c] = iter_candidates([(text, len(conversations), 3.0, conversations, [], None)], start=row)
+    if signature is not None:
+        c["signature"] = signature
+    return c
+
+
+def response(name):
+    return f"Response {name}: the refund for your order was processed today and should reach your account within a week."
+
+
+def replaced(signature, positions, offset):
+    signature = signature.copy()
+    signature[positions] = offset + np.arange(len(signature[positions]), dtype=np.uint64)
+    return signature
+
+
+def test_bucket_members_are_compared_with_each_other():
+    # b and c are near-duplicates sharing only band 0 with each other; a
+    # shares band 0 too but nothing else, and comes first in the bucket
+    b = BASE_SIGNATURE
+    c = replaced(BASE_SIGNATURE, slice(ROWS_PER_BAND, None, ROWS_PER_BAND), 5000)
+    a = replaced(BASE_SIGNATURE, slice(ROWS_PER_BAND, None), 9000)
+    candidates = [
+        candidate(response(name), [f"cnv_{name}{i}" for i in range(3)], signature, row)
+        for row, (name, signature) in enumerate([("a", a), ("b", b), ("c", c)])
+    ]
+
+    for ordering in (candidates, candidates[::-1], candidates[1:] + candidates[:1]):
+        merged = group_near_duplicates(ordering)
+        assert sorted(m["variant_count"] for m in merged) == [1, 2]
+        [pair] = [m for m in merged if m["variant_count"] == 2]
+        assert sorted(pair["conversation_ids"]) == sorted(candidates[1]["conversation_ids"] + candidates[2]["conversation_ids"])
+
+
+def test_groups_do_not_chain_through_a_shared_neighbour():
+    # a ~ b and b ~ c (112/128 rows agree), but a and c only agree on 96/128
+    b = BASE_SIGNATURE
+    a = replaced(BASE_SIGNATURE, slice(14 * ROWS_PER_BAND, None), 5000)
+    c = replaced(BASE_SIGNATURE, slice(0, 2 * ROWS_PER_BAND), 9000)
+    candidates = [
+        candidate(response(name), [f"cnv_{name}{i}" for i in range(reuse)], signature, row)
+        for row, (name, signature, reuse) in enumerate([("a", a, 4), ("b", b, 5), ("c", c, 3)])
+    ]
+
+    merged = group_near_duplicates(candidates)
+    assert len(merged) == 2
+    [group] = [m for m in merged if m["variant_count"] == 2]
+    # b is the most reused, so it absorbs a before c is considered
+    assert group["id"] == candidates[1]["id"]
+    assert set(group["conversation_ids"]) == {f"cnv_a{i}" for i in range(4)} | {f"cnv_b{i}" for i in range(5)}
+
+
+def test_reuse_counts_each_conversation_once():
+    # The same 25 conversations each sent both variants, more than the
+    # conversation ids kept per response
+    conversations = [f"cnv_{i:03d}" for i in range(25)]
+    body = "you can reset your password from the account settings page, then sign in again with the new one."
+    candidates = [
+        candidate(f"Hi Sam,\n{body}", conversations, row=0),
+        candidate(f"Hello Alex,\n{body}", conversations, row=1),
+    ]
+
+    [merged] = group_near_duplicates(candidates)
+    assert merged["variant_count"] == 2
+    assert merged["reuse_count"] == 25
+    assert merged["conversation_ids"] == conversations[:20]
+
+
+def spill_peak_bytes(tmp_path, count, batch_size):
+    """Peak Python allocations while spilling, grouping and reading back count candidates."""
+    # Unrelated texts, so no LSH bucket is shared and nothing is read back for grouping
+    words = np.random.default_rng(count).integers(0, 100_000, size=(count, 20))
+    rows = (
+        (" ".join(f"w{w}" for w in words[i]), 40, 3.0, [f"cnv_{i}_{j}" for j in range(40)], ["billing"], None)
+        for i in range(count)
+    )
+    tracemalloc.start()
+    spill = CandidateSpill(tmp_path / f"spill-{count}.duckdb")
+    try:
+        spill.extend(iter_candidates(rows), batch_size)
+        assert spill.group_near_duplicates() == count
+        assert sum(1 for _ in spill.iter_merged(batch_size)) == count
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        spill.close()
+
+
+def test_spill_memory_is_bounded_by_batch_size(tmp_path):
+    spill_peak_bytes(tmp_path, 100, batch_size=100)  # One-off allocations on first use
+    small = spill_peak_bytes(tmp_path, 500, batch_size=100)
+    large = spill_peak_bytes(tmp_path, 4000, batch_size=100)
+    # 8x the candidates (and their 40 conversation keys each) in the same batches
+    assert large < small * 1.5
+
+
+def write_front_cache(path, replies):
+    """One archived two-message conversation per reply."""
+    conn = duckdb.connect(str(path))
+    conn.execute("""
+    CREATE TABLE conversations (
+      id VARCHAR, status VARCHAR, tags VARCHAR[], created_at TIMESTAMP, last_message_at TIMESTAMP, synced_at TIMESTAMP
+    )
+    """)
+    conn.execute("CREATE TABLE messages (id VARCHAR, conversation_id VARCHAR, is_inbound BOOLEAN, body_text VARCHAR, created_at TIMESTAMP)")
+    for i, reply in enumerate(replies):
+        conn.execute("INSERT INTO conversations VALUES (?, 'archived', ['billing'], '2026-01-01', '2026-01-01', '2026-01-01')", [f"cnv_{i}"])
+        conn.execute("INSERT INTO messages VALUES (?, ?, true, 'Where is my refund?', '2026-01-01')", [f"in_{i}", f"cnv_{i}"])
+        conn.execute("INSERT INTO messages VALUES (?, ?, false, ?, '2026-01-01')", [f"out_{i}", f"cnv_{i}", reply])
+    conn.close()
+
+
+@pytest.mark.parametrize("flags", [[], ["--sql-filter"], ["--incremental"]])
+def test_single_use_variants_merge_into_one_golden_response(tmp_path, monkeypatch, flags):
+    # Each personalized variant is sent once; only together do they reach MIN_REUSE_COUNT
+    replies = [f"Hi {name},\n{response('x')}" for name in ["Sam", "Alex", "Jo"]]
+    replies.append("Thanks for the note, we have passed this on to the team and someone will get back to you soon.")
+    write_front_cache(tmp_path / "front-cache.db", replies)
+    monkeypatch.setattr(extract_golden_responses, "DB_PATH", tmp_path / "front-cache.db")
+    monkeypatch.setattr(extract_golden_responses, "GOLDEN_DIR", tmp_path / "golden")
+    monkeypatch.setattr(sys, "argv", ["extract_golden_responses.py", *flags])
+    extract_golden_responses.main()
+
+    golden = json.loads((tmp_path / "golden" / "latest" / "responses.json").read_text())
+    [merged] = golden["responses"]
+    assert merged["reuse_count"] == 3
+    assert merged["variant_count"] == 3
+    assert merged["source_conversations"] == ["cnv_0", "cnv_1", "cnv_2"]
@@ -0,0 +1,96 @@
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+
+import duckdb
+import numpy as np
+import pytest
+
+import extract_golden_responses
+
+REPLIES = [
+    f"You can {verb} the {thing} from your account page at example.com/account, then follow the steps there. "
+    "If anything goes wrong just reply to this email and we will sort it out for you."
+    for verb in ["download", "reset", "update", "export", "cancel", "upgrade", "transfer", "view"]
+    for thing in ["videos", "password", "invoice", "license", "subscription", "course", "team seats", "receipt"]
+]
+
+
+def write_front_cache(path, count):
+    """count conversations answered with 1-3 REPLIES each, some with a greeting, an email or a date."""
+    rng = random.Random(7)
+    conversations = {name: [] for name in ["id", "status", "tags", "sent_at"]}
+    messages = {name: [] for name in ["id", "conversation_id", "is_inbound", "body_text", "sent_at"]}
+
+    def message(conversation_id, is_inbound, body_text, at):
+        for name, value in zip(messages, [f"msg_{len(messages['id'])}", conversation_id, is_inbound, body_text, at]):
+            messages[name].append(value)
+
+    for i in range(count):
+        conversation_id = f"cnv_{i:05d}"
+        at = datetime(2026, 1, 1) + timedelta(minutes=i)
+        conversations["id"].append(conversation_id)
+        conversations["status"].append(rng.choice(["archived", "archived", "open"]))
+        conversations["tags"].append(rng.sample(["billing", "downloads", "access", "refund", "team"], 2))
+        conversations["sent_at"].append(at)
+        message(conversation_id, True, "Hi, I need help with my account please", at)
+        for _ in range(rng.randint(1, 3)):
+            body = rng.choice(REPLIES)
+            if rng.random() < 0.5:
+                body = f"Hi {rng.choice(['Sam', 'Alex', 'Jo', 'Chris', 'Pat'])},\n{body}"
+            if rng.random() < 0.2:
+                body += f" Contact joe{rng.randint(0, 9)}@example.com on 2024-01-0{rng.randint(1, 9)}."
+            message(conversation_id, False, body, at)
+
+    conn = duckdb.connect(str(path))
+    for name, columns in [("conversations", conversations), ("messages", messages)]:
+        array = {}
+        for column, values in columns.items():
+            array[column] = np.empty(len(values), dtype=object)
+            array[column][:] = values
+        conn.register(f"{name}_rows", array)
+    conn.execute("""
+    CREATE TABLE conversations AS
+    SELECT id, status, tags::VARCHAR[] AS tags, sent_at::TIMESTAMP AS created_at,
+      sent_at::TIMESTAMP AS last_message_at, sent_at::TIMESTAMP AS synced_at
+    FROM conversations_rows
+    """)
+    conn.execute("""
+    CREATE TABLE messages AS
+    SELECT id, conversation_id, is_inbound::BOOLEAN AS is_inbound, body_text, sent_at::TIMESTAMP AS created_at
+    FROM messages_rows
+    """)
+    conn.close()
+
+
+@pytest.fixture
+def extract(tmp_path, monkeypatch):
+    """Run extract_golden_responses.main() into tmp_path/<name>; returns the output directory."""
+    monkeypatch.setattr(extract_golden_responses, "DB_PATH", tmp_path / "front-cache.db")
+
+    def run(name, *flags):
+        monkeypatch.setattr(extract_golden_responses, "GOLDEN_DIR", tmp_path / name)
+        monkeypatch.setattr(sys, "argv", ["extract_golden_responses.py", *flags])
+        extract_golden_responses.main()
+        return tmp_path / name / "latest"
+
+    return run
+
+
+@pytest.mark.parametrize("flags", [(), ("--sql-filter",)])
+def test_parallel_outputs_are_identical_to_serial(tmp_path, extract, flags):
+    write_front_cache(tmp_path / "front-cache.db", 3000)
+    # Small batches so the workers get many of them
+    serial = extract("serial", "--batch-size", "50", *flags)
+    parallel = extract("parallel", "--batch-size", "50", "--workers", "4", *flags)
+
+    responses = json.loads((serial / "responses.json").read_text())
+    assert responses["total_analyzed"] > 100 and responses["responses"]
+    assert any(r["variant_count"] > 1 for r in responses["responses"])
+    for name in ["responses.json", "templates.json", "templates.index.npz"]:
+        assert (parallel / name).read_bytes() == (serial / name).read_bytes(), name
+
+    serial_stats, parallel_stats = (json.loads((d / "stats.json").read_text()) for d in (serial, parallel))
+    del serial_stats["performance"], parallel_stats["performance"]
+    assert parallel_stats == serial_stats
@@ -0,0 +1,77 @@
+import random
+
+import duckdb
+import pytest
+
+from extract_golden_responses import check_parity, extract_template, is_boilerplate, boilerplate_sql, template_sql
+
+FILLER = " Let us know if there is anything else we can help with, we are always happy to take a look."
+
+# Non-ASCII letters, digits and whitespace next to the PII patterns, where
+# Python's Unicode \b, \d and \s disagree with RE2's ASCII ones, and
+# matches separated by a single character
+SAMPLES = [
+    "Please write to éjoe@x.com and we will sort it out.",
+    "We have updated naïve@host.io as the billing contact.",
+    "Your refund of $١٢.٥٠ went out today.",
+    "Your refund of $٤٢ went out on ٢٠٢٤-٠١-٠٢, allow a week.",
+    "The course moved on ２０２４-０１-０２ to the new platform.",
+    "The download is at example.com/files/ebook v2 for you.",
+    "Grab it from example.dev/ workshop and sign in again.",
+    "Sent on 2024-01-02 to joe@example.com, see example.io/a\vb for details.",
+    "The slides are at example.com/deck\u00a0and the recording follows.",
+    "Both joe@example.com,jane.doe@example.org and é-joe@x.com were notified.",
+    "Dates 2024-01-02,2024-01-03 and 2024-01-04_x were moved.",
+    "Thanks! ",
+    "ok ",
+]
+
+
+@pytest.fixture
+def front_cache():
+    """In-memory front cache where every sample is sent by three archived conversations."""
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE conversations (id VARCHAR, status VARCHAR, tags VARCHAR[])")
+    conn.execute("CREATE TABLE messages (conversation_id VARCHAR, is_inbound BOOLEAN, body_text VARCHAR)")
+    for s, sample in enumerate(SAMPLES):
+        for n in range(3):
+            conversation_id = f"cnv_{s}_{n}"
+            conn.execute("INSERT INTO conversations VALUES (?, 'archived', ['support'])", [conversation_id])
+            conn.execute("INSERT INTO messages VALUES (?, true, 'Hi, I need help')", [conversation_id])
+            conn.execute("INSERT INTO messages VALUES (?, false, ?)", [conversation_id, sample + FILLER])
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("sample", SAMPLES)
+def test_template_matches_python(sample):
+    text = sample + FILLER
+    sql_template, sql_boilerplate = duckdb.execute(
+        f"SELECT {template_sql('t')}, {boilerplate_sql('t')} FROM (SELECT ?::VARCHAR AS t)", [text]
+    ).fetchone()
+    assert sql_template == extract_template(text)
+    assert sql_boilerplate == is_boilerplate(text)
+
+
+def test_check_parity_on_non_ascii_samples(front_cache):
+    assert check_parity(front_cache) == 0
+
+
+# Fragments that make up the PII patterns, plus the characters around them
+# that decide Python's \b, \d and \s
+FRAGMENTS = [
+    "joe", "a", "_", ".", "-", "%", "+", "|", "@", "/", ",", " ", "\u00a0", "\v", "\n", "é", "٢", "２", "$",
+    "1", "12", "2024", "-01-", "/02/", ".com", ".io", "com", "https://", "www.", "x.org/", "{", "}",
+    "2024-01-02", "٢٠٢٤-٠١-٠٢", "joe@x.com", "a.b@c.io", "x.co|m",
+]
+
+
+def test_template_matches_python_on_random_text():
+    rng = random.Random(0)
+    texts = ["".join(rng.choices(FRAGMENTS, k=rng.randint(1, 30))) for _ in range(5000)]
+    sql_templates = duckdb.execute(
+        f"SELECT {template_sql('t')} FROM (SELECT unnest(?::VARCHAR[]) AS t, generate_subscripts(?::VARCHAR[], 1) AS i) ORDER BY i",
+        [texts, texts],
+    ).fetchall()
+    mismatches = [(text, sql) for text, (sql,) in zip(texts, sql_templates) if sql != extract_template(text)]
+    assert mismatches == []
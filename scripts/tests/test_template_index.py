@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pytest
+
+from template_index import BM25_B, BM25_K1, TemplateIndex, index_path_for, tokenize
+
+TEMPLATES = [
+    {"id": "tpl_refund", "topic": "refund", "template": "Your refund for {amount} is on its way, refund issued today."},
+    {"id": "tpl_invoice", "topic": "invoice", "template": "You can download your invoice from the invoices page."},
+    {"id": "tpl_login", "topic": "access", "template": "Use the login link we sent to {email} to access the course."},
+]
+
+
+def bm25(query, templates):
+    """BM25 straight from the formula, one template at a time."""
+    docs = [tokenize(t["template"]) for t in templates]
+    avg_length = sum(len(d) for d in docs) / len(docs)
+    scores = []
+    for doc in docs:
+        score = 0.0
+        for term in tokenize(query):
+            df = sum(term in d for d in docs)
+            if term not in doc:
+                continue
+            idf = np.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            tf = doc.count(term)
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg_length))
+        scores.append(score)
+    return scores
+
+
+@pytest.fixture
+def templates_path(tmp_path):
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps({"templates": TEMPLATES}))
+    return path
+
+
+def test_postings_list_the_templates_containing_each_term():
+    index = TemplateIndex.build(TEMPLATES)
+    postings = {
+        str(term): index.postings[index.indptr[i]:index.indptr[i + 1]].tolist()
+        for i, term in enumerate(index.vocab)
+    }
+    assert postings["refund"] == [0]
+    assert postings["download"] == [1]
+    assert postings["course"] == [2]
+    assert "amount" not in postings and "the" not in postings  # Placeholders and stop words
+    assert sorted(postings) == sorted({term for t in TEMPLATES for term in tokenize(t["template"])})
+
+
+@pytest.mark.parametrize("query", ["refund please", "where is my invoice to download", "login access course refund", "hello"])
+def test_bm25_scores_match_the_formula(query):
+    index = TemplateIndex.build(TEMPLATES)
+    np.testing.assert_allclose(index.bm25_scores(query), bm25(query, TEMPLATES), rtol=1e-5)
+
+
+def test_suggestions_are_ranked_by_score():
+    index = TemplateIndex.build(TEMPLATES)
+    assert [s["id"] for s in index.suggest("I never got my refund, and where is the invoice?", k=3)] == [
+        "tpl_refund", "tpl_invoice",
+    ]
+
+
+def test_saved_index_is_used_while_templates_are_unchanged(templates_path):
+    index_path = TemplateIndex.build_from_file(templates_path).save(index_path_for(templates_path))
+    np.savez(index_path, **{**np.load(index_path), "ids": np.array(["a", "b", "c"])})
+    assert TemplateIndex.for_templates(templates_path).ids.tolist() == ["a", "b", "c"]
+
+
+def test_stale_index_is_rebuilt_in_memory_only(templates_path):
+    index_path = TemplateIndex.build_from_file(templates_path).save(index_path_for(templates_path))
+    saved = index_path.read_bytes()
+    templates_path.write_text(json.dumps({"templates": TEMPLATES[:2]}))
+
+    index = TemplateIndex.for_templates(templates_path)
+    assert index.ids.tolist() == ["tpl_refund", "tpl_invoice"]
+    assert index_path.read_bytes() == saved  # Cache entries are immutable
+
+    index_path.unlink()
+    assert TemplateIndex.for_templates(templates_path).ids.tolist() == ["tpl_refund", "tpl_invoice"]
+    assert not index_path.exists()
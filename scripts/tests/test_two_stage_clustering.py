@@ -0,0 +1,24 @@
+import numpy as np
+
+from cluster_analysis import run_two_stage_clustering
+
+
+def micro_clusters(centroids, weights):
+    weights = np.asarray(weights)
+    return centroids.astype(np.float32), weights, np.repeat(np.arange(len(centroids)), weights)
+
+
+def test_all_noise_micro_clusters_give_all_noise_labels():
+    centroids = np.random.default_rng(0).uniform(size=(30, 5))
+    labels, _ = run_two_stage_clustering(micro_clusters(centroids, [10] * 30), min_cluster_size=200, min_samples=10)
+    assert labels.shape == (300,)
+    assert (labels == -1).all()
+
+
+def test_light_clusters_become_noise():
+    rng = np.random.default_rng(0)
+    # Two tight groups: 20 micro-clusters of 10 conversations and 8 of 2
+    centroids = np.vstack([rng.normal(0, 0.01, size=(20, 5)), rng.normal(5, 0.01, size=(8, 5))])
+    labels, _ = run_two_stage_clustering(micro_clusters(centroids, [10] * 20 + [2] * 8), min_cluster_size=60, min_samples=10)
+    assert set(labels[:200]) == {0}
+    assert (labels[200:] == -1).all()
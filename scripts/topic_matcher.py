@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Topic Matcher - keyword topics for golden responses and templates
+
+Compiles the terms of every topic in topics.json into one regex, so a
+text (or a whole batch of texts) is scanned once and every topic hit comes
+back with its position. Topics are listed in priority order:
+classify() returns the first listed topic with any hit.
+
+Used by extract_golden_responses.py and, as a CLI, by format_golden.sh:
+
+    jq '.responses' responses.json | python3 scripts/topic_matcher.py --field text
+"""
+
+import argparse
+import bisect
+import json
+import re
+import sys
+from pathlib import Path
+
+TOPICS_PATH = Path(__file__).resolve().parent / "topics.json"
+BATCH_SEPARATOR = "\n"  # Terms never span lines, so hits can't cross texts
+
+class TopicMatcher:
+    """Case-insensitive multi-pattern matcher over a priority-ordered topic list.
+
+    Terms are plain substrings. All topics are compiled into one pattern, so
+    a text is scanned once: a lookahead for any term finds the positions
+    where a hit starts, and one optional named group per topic (in priority
+    order) captures that topic's term there, so every topic starting at a
+    position is reported, not only the first.
+    """
+
+    def __init__(self, topics: dict, default: str = "general"):
+        self.topics = list(topics)
+        self.default = default
+        self.priority = {topic: i for i, topic in enumerate(self.topics)}
+        # (?!) never matches, for a topic without terms
+        alternations = ["|".join(re.escape(term) for term in terms) or "(?!)" for terms in topics.values()]
+        groups = "".join(f"(?:(?=(?P<t{i}>{terms})))?" for i, terms in enumerate(alternations))
+        self.pattern = re.compile(f"(?={'|'.join(alternations)}){groups}", re.IGNORECASE)
+
+    @classmethod
+    def from_config(cls, path: Path = TOPICS_PATH) -> "TopicMatcher":
+        with open(path) as f:
+            config = json.load(f)
+        topics = {t["name"]: t["terms"] for t in config["topics"]}
+        return cls(topics, default=config.get("default", "general"))
+
+    def _matches(self, text: str):
+        """(match, topic index) for every topic hit, in text order, then topic priority."""
+        for match in self.pattern.finditer(text):
+            for i in range(len(self.topics)):
+                if match.group(f"t{i}") is not None:
+                    yield match, i
+
+    def _hit(self, match, i: int, offset: int = 0) -> dict:
+        term = match.group(f"t{i}")
+        return {
+            "topic": self.topics[i],
+            "term": term,
+            "start": match.start() - offset,
+            "end": match.start() - offset + len(term),
+        }
+
+    def find_all(self, text: str) -> list:
+        """Every topic hit in text as {topic, term, start, end}, in text order."""
+        return [self._hit(match, i) for match, i in self._matches(text)]
+
+    def find_all_batch(self, texts: list) -> list:
+        """find_all() for a batch of texts in one pass over their concatenation."""
+        starts = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + len(BATCH_SEPARATOR)
+
+        hits = [[] for _ in texts]
+        for match, i in self._matches(BATCH_SEPARATOR.join(texts)):
+            index = bisect.bisect_right(starts, match.start()) - 1
+            hits[index].append(self._hit(match, i, offset=starts[index]))
+        return hits
+
+    def best_topic(self, hits: list) -> str:
+        """Highest priority topic among hits, or the default topic."""
+        if not hits:
+            return self.default
+        return min((h["topic"] for h in hits), key=self.priority.__getitem__)
+
+    def classify(self, text: str) -> str:
+        return self.best_topic(self.find_all(text))
+
+    def classify_batch(self, texts: list) -> list:
+        return [self.best_topic(hits) for hits in self.find_all_batch(texts)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--field", required=True, help="Text field to classify in each input object")
+    parser.add_argument("--config", type=Path, default=TOPICS_PATH, help="Topics config file")
+    parser.add_argument("--hits", action="store_true", help="Also add every hit as topic_hits")
+    args = parser.parse_args()
+
+    # Reads a JSON array of objects on stdin and writes it back with a topic field
+    records = json.load(sys.stdin)
+    matcher = TopicMatcher.from_config(args.config)
+    all_hits = matcher.find_all_batch([r.get(args.field) or "" for r in records])
+    for record, hits in zip(records, all_hits):
+        record["topic"] = matcher.best_topic(hits)
+        if args.hits:
+            record["topic_hits"] = hits
+    json.dump(records, sys.stdout)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())